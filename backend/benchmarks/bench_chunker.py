@@ -0,0 +1,105 @@
+"""
+Benchmark: character chunker vs token chunker
+File: benchmarks/bench_chunker.py
+
+Chunks synthetic documents of 1, 10 and 50 MB (headings, paragraphs of
+varying length, the odd very long paragraph) with:
+
+    chars:   the character chunker rag_tool used before (500 characters, 50 overlap)
+    tokens:  chunk_text_by_tokens in rag/chunker.py (RAG_CHUNK_TOKENS, overlap)
+
+and reports throughput plus the token-size spread of the chunks, which is
+what the embedding model and the prompt budget actually see.
+
+Run from the backend directory:
+    python benchmarks/bench_chunker.py --sizes 1 10 50
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_NAME", "devmate_bench")
+
+from src.rag.chunker import chunk_text_by_tokens, get_encoding  # noqa: E402
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from or an which "
+    "gradient entropy protein theorem matrix enzyme orbital lattice vector kernel "
+    "hypothesis catalyst integral momentum genome spectrum polymer tensor"
+).split()
+
+
+_SENTENCE_END = re.compile(r"[.!?]+")
+
+
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> list:
+    """The previous sentence/character chunker, kept here as the baseline"""
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(current) + len(sentence) > chunk_size and current:
+            chunks.append(current.strip())
+            # Overlap: keep the last words of the finished chunk
+            words = current.split()
+            current = (" ".join(words[-overlap:]) if len(words) > overlap else current) + " " + sentence
+        else:
+            current += " " + sentence
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+def build_text(megabytes: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    parts = []
+    size = 0
+    section = 0
+    while size < target:
+        if rng.random() < 0.08:
+            section += 1
+            parts.append(f"## {section}. Section {section}")
+        else:
+            sentences = rng.randint(1, 60 if rng.random() < 0.02 else 8)
+            parts.append(" ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                for _ in range(sentences)
+            ))
+        size += len(parts[-1]) + 2
+    return "\n\n".join(parts)
+
+
+def measure(label: str, chunker, text: str, encoding) -> None:
+    start = time.perf_counter()
+    chunks = chunker(text)
+    elapsed = time.perf_counter() - start
+    sample = chunks[:: max(len(chunks) // 2000, 1)]
+    sizes = sorted(len(encoding.encode_ordinary(chunk)) for chunk in sample)
+    mb = len(text) / (1024 * 1024)
+    print(f"{label:<8} {elapsed:>8.2f} {mb / elapsed:>8.1f} {len(chunks):>9} "
+          f"{sizes[0]:>6} {sizes[len(sizes) // 2]:>6} {sizes[-1]:>6}")
+
+
+def main(sizes) -> None:
+    encoding = get_encoding()
+    for megabytes in sizes:
+        text = build_text(megabytes)
+        print(f"\n{megabytes:g} MB text")
+        print(f"{'chunker':<8} {'s':>8} {'MB/s':>8} {'chunks':>9} {'min':>6} {'p50':>6} {'max':>6}  (tokens per chunk)")
+        measure("chars", chunk_text, text, encoding)
+        measure("tokens", chunk_text_by_tokens, text, encoding)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+    main(args.sizes)
@@ -0,0 +1,132 @@
+"""
+Benchmark: concurrent /run-style requests with blocking vs async LLM calls
+File: benchmarks/bench_concurrency.py
+
+Builds the same graph as DevGraph (StudyAgent <-> ToolNode) around a stub
+chat model with a fixed latency and one document-style tool that makes its
+own LLM call, like query_documents. Each request is one agent turn that
+calls the tool, the tool's LLM call, and a final agent turn.
+
+    blocking:  the agent node and the tool call `llm.invoke` (the old code);
+               the tool's call runs on the event loop and stalls every request
+    async:     StudyAgent.run and the tool `await llm.ainvoke`
+
+Throughput is reported for several numbers of requests in flight.
+
+Run from the backend directory:
+    python benchmarks/bench_concurrency.py --latency 0.2 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from langchain_core.tools import tool  # noqa: E402
+from langgraph.graph import MessagesState, StateGraph  # noqa: E402
+from langgraph.prebuilt import ToolNode  # noqa: E402
+
+from src.agents.study_agent import StudyAgent  # noqa: E402
+
+
+class StubChat(BaseChatModel):
+    """Fixed-latency model: asks for the tool on a user turn, answers otherwise"""
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> AIMessage:
+        if isinstance(messages[-1], HumanMessage):
+            return AIMessage(content="", tool_calls=[
+                {"name": "lookup", "args": {"question": messages[-1].content}, "id": f"call-{id(messages)}"}
+            ])
+        return AIMessage(content="answer")
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+
+class BlockingStudyAgent(StudyAgent):
+    """StudyAgent as it was: a sync node calling llm.invoke"""
+
+    def run(self, state):
+        messages = state["messages"]
+        response = self.llm.invoke([self.system_message] + messages)
+        return {"messages": messages + [response]}
+
+
+def build_graph(llm: StubChat, blocking: bool):
+    if blocking:
+        @tool
+        async def lookup(question: str) -> str:
+            """Answer a question from documents"""
+            return llm.invoke([HumanMessage(content=question)]).content
+        agent = BlockingStudyAgent(llm)
+    else:
+        @tool
+        async def lookup(question: str) -> str:
+            """Answer a question from documents"""
+            return (await llm.ainvoke([HumanMessage(content=question)])).content
+        agent = StudyAgent(llm)
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("study_agent", agent.run)
+    graph.add_node("tool_node", ToolNode([lookup]))
+    graph.set_entry_point("study_agent")
+    graph.add_conditional_edges("study_agent", agent.route, {"tools": "tool_node", "end": "__end__"})
+    graph.add_edge("tool_node", "study_agent")
+    return graph.compile()
+
+
+async def measure(compiled, concurrency: int, requests: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with limit:
+            await compiled.ainvoke({"messages": [HumanMessage(content=f"question {i}")]})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main(latency: float, levels: List[int], rounds: int) -> None:
+    llm = StubChat(latency=latency)
+    graphs = {"blocking": build_graph(llm, blocking=True), "async": build_graph(llm, blocking=False)}
+    print(f"Stub LLM latency {latency * 1000:.0f} ms, 3 LLM calls per request "
+          f"(ideal {1 / (3 * latency):.1f} req/s per request in flight)")
+    print(f"\n{'in flight':>9} {'requests':>9} {'blocking req/s':>15} {'async req/s':>12} {'speedup':>8}")
+    for concurrency in levels:
+        requests = concurrency * rounds
+        rates = {}
+        for label, compiled in graphs.items():
+            rates[label] = requests / await measure(compiled, concurrency, requests)
+        print(f"{concurrency:>9} {requests:>9} {rates['blocking']:>15.1f} {rates['async']:>12.1f} "
+              f"{rates['async'] / rates['blocking']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stub LLM call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=2, help="requests per slot of concurrency")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.concurrency, args.rounds))
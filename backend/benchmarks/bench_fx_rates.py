@@ -0,0 +1,115 @@
+"""
+Benchmark: currency conversion with a download per call vs the local rate table
+File: benchmarks/bench_fx_rates.py
+
+Starts a local stub rates API (the exchangerate-api /v4/latest answer for
+~160 currencies) that takes --latency-ms per request, and compares:
+
+    download:  the old tool, one rates download (pooled client) per conversion
+    table:     src/fx_rates table lookup, cross rate computed locally
+    batch:     one table.convert call for --amounts amounts x --targets targets
+
+Run from the backend directory:
+    python benchmarks/bench_fx_rates.py --conversions 200 --latency-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("FX_SNAPSHOT_PATH", os.path.join(tempfile.mkdtemp(), "fx_rates.json"))
+
+from src import fx_rates, http_client  # noqa: E402
+
+_rng = random.Random(0)
+CODES = sorted({"USD", "EUR", "INR", "GBP", "JPY"} | {
+    "".join(_rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)) for _ in range(160)
+})
+
+
+async def start_stub(latency_s: float):
+    rng = random.Random(0)
+    body = json.dumps({"base": "USD", "rates": {code: rng.uniform(0.1, 200) for code in CODES}}).encode()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                await asyncio.sleep(latency_s)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v4/latest/{{base}}"
+
+
+async def old_conversion(url: str, source: str, target: str, amount: float) -> float:
+    data = (await http_client.get(url.format(base=source))).json()
+    return amount * data["rates"][target]
+
+
+def report(label: str, samples: list) -> None:
+    samples.sort()
+    print(f"{label:<9} {statistics.median(samples) * 1e6:>12.1f} {samples[int(len(samples) * 0.95) - 1] * 1e6:>12.1f}")
+
+
+async def main(conversions: int, latency_ms: float, amounts: int, targets: int) -> None:
+    server, url = await start_stub(latency_ms / 1000)
+    fx_rates.RATES_URL = url
+    pairs = [(random.choice(CODES), random.choice(CODES), random.uniform(1, 1000)) for _ in range(conversions)]
+    print(f"Stub rates API: {len(CODES)} currencies, {latency_ms:g} ms per request; {conversions} conversions")
+    print(f"\n{'path':<9} {'p50 us':>12} {'p95 us':>12}")
+
+    samples = []
+    for source, target, amount in pairs:
+        start = time.perf_counter()
+        await old_conversion(url, source, target, amount)
+        samples.append(time.perf_counter() - start)
+    report("download", samples)
+
+    await fx_rates.refresh()
+    samples = []
+    for source, target, amount in pairs:
+        start = time.perf_counter()
+        table = await fx_rates.get_table()
+        table.convert([amount], source, [target])
+        samples.append(time.perf_counter() - start)
+    report("table", samples)
+
+    table = await fx_rates.get_table()
+    batch_amounts = [random.uniform(1, 1000) for _ in range(amounts)]
+    batch_targets = random.sample(CODES, targets)
+    samples = []
+    for _ in range(conversions):
+        start = time.perf_counter()
+        table.convert(batch_amounts, "EUR", batch_targets)
+        samples.append(time.perf_counter() - start)
+    report("batch", samples)
+    print(f"(batch = {amounts} amounts x {targets} targets per call)")
+
+    server.close()
+    await http_client.close_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversions", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=40, help="simulated rates API latency")
+    parser.add_argument("--amounts", type=int, default=10)
+    parser.add_argument("--targets", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.conversions, args.latency_ms, args.amounts, args.targets))
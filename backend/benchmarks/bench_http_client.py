@@ -0,0 +1,143 @@
+"""
+Benchmark: outbound tool HTTP calls with and without connection reuse
+File: benchmarks/bench_http_client.py
+
+Starts a local stub HTTP/1.1 server (keep-alive, small JSON answers) that
+counts the connections it accepts. Each new connection is delayed by
+--connect-ms before its first answer, standing in for the DNS/TCP/TLS
+setup a real upstream costs. Each request then takes --latency-ms.
+
+    requests:  requests.get per call on a thread pool (the old tools)
+    fresh:     a new httpx.AsyncClient per call
+    shared:    src/http_client.get (pooled, keep-alive)
+
+Run from the backend directory:
+    python benchmarks/bench_http_client.py --requests 400 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import requests  # noqa: E402
+
+from src import http_client  # noqa: E402
+
+BODY = b'{"rates": {"INR": 83.2, "EUR": 0.92}}'
+
+
+class StubServer:
+    """Minimal keep-alive HTTP server on its own thread and event loop"""
+
+    def __init__(self, connect_ms: float, latency_ms: float):
+        self.connect_s = connect_ms / 1000
+        self.latency_s = latency_ms / 1000
+        self.connections = 0
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.connect_s)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(self.latency_s)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(BODY)).encode() + b"\r\nConnection: keep-alive\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v4/latest/USD"
+
+
+async def run_requests(url: str, total: int, concurrency: int) -> list:
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def one():
+        start = time.perf_counter()
+        requests.get(url).json()
+        return time.perf_counter() - start
+
+    samples = await asyncio.gather(*(loop.run_in_executor(pool, one) for _ in range(total)))
+    pool.shutdown()
+    return list(samples)
+
+
+async def run_async(url: str, total: int, concurrency: int, shared: bool) -> list:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with limit:
+            start = time.perf_counter()
+            if shared:
+                (await http_client.get(url)).json()
+            else:
+                async with httpx.AsyncClient() as client:
+                    (await client.get(url)).json()
+            return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(one() for _ in range(total))))
+
+
+async def main(total: int, concurrency: int, connect_ms: float, latency_ms: float) -> None:
+    server = StubServer(connect_ms, latency_ms)
+    print(f"Stub upstream: {connect_ms:g} ms connection setup, {latency_ms:g} ms per request; "
+          f"{total} requests, {concurrency} in flight")
+    print(f"\n{'client':<9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'connections':>12}")
+    runs = (
+        ("requests", lambda: run_requests(server.url, total, concurrency)),
+        ("fresh", lambda: run_async(server.url, total, concurrency, shared=False)),
+        ("shared", lambda: run_async(server.url, total, concurrency, shared=True)),
+    )
+    for label, run in runs:
+        before = server.connections
+        start = time.perf_counter()
+        samples = await run()
+        wall = time.perf_counter() - start
+        samples.sort()
+        print(f"{label:<9} {total / wall:>8.0f} {statistics.median(samples) * 1000:>8.1f} "
+              f"{samples[int(len(samples) * 0.95) - 1] * 1000:>8.1f} {server.connections - before:>12}")
+    await http_client.close_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--connect-ms", type=float, default=30, help="simulated connection setup per new connection")
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.connect_ms, args.latency_ms))
@@ -0,0 +1,99 @@
+"""
+Benchmark: event-loop stall while extracting a large PDF
+File: benchmarks/bench_pdf_ingest.py
+
+Generates a multi-page PDF with reportlab, then extracts it twice while a
+heartbeat coroutine ticks every few milliseconds on the same event loop:
+
+    inline:  extract_text_from_pdf called directly in the coroutine (old path)
+    pool:    iter_pdf_pages, pages extracted in the process pool (new path)
+
+The heartbeat's lateness is what every other request on the server would
+experience during the upload.
+
+Run from the backend directory:
+    python benchmarks/bench_pdf_ingest.py --pages 300
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_NAME", "devmate_bench")
+os.environ.setdefault("RAG_EMBEDDER", "hashing")
+
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from src.rag.extraction import get_pdf_pool, iter_pdf_pages, shutdown_pdf_pool  # noqa: E402
+from src.tools.rag_tool import extract_text_from_pdf  # noqa: E402
+
+TICK = 0.005
+
+
+def build_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        for line in range(60):
+            pdf.drawString(40, 800 - line * 12, f"Page {page} line {line}: the quick brown fox jumps over the lazy dog.")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+async def heartbeat(stop: asyncio.Event, lateness: list) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lateness.append(max(loop.time() - expected, 0.0))
+
+
+async def measure(label: str, extract) -> None:
+    stop = asyncio.Event()
+    lateness: list = []
+    beat = asyncio.create_task(heartbeat(stop, lateness))
+    await asyncio.sleep(TICK * 4)
+
+    start = time.perf_counter()
+    characters = await extract()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    lateness.sort()
+    p99 = lateness[int(len(lateness) * 0.99) - 1] if lateness else 0.0
+    print(f"{label:<8} {elapsed:>8.2f} {max(lateness) * 1000:>12.1f} {p99 * 1000:>10.1f} {characters:>10}")
+
+
+async def main(pages: int) -> None:
+    data = build_pdf(pages)
+    print(f"PDF: {pages} pages, {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    # Start the worker processes outside the measured window
+    pool = get_pdf_pool()
+    if pool is not None:
+        await asyncio.get_running_loop().run_in_executor(pool, int, 0)
+
+    async def inline():
+        return len(extract_text_from_pdf(data))
+
+    async def pooled():
+        return sum([len(page) + 1 async for page in iter_pdf_pages(data)])
+
+    print(f"\n{'path':<8} {'total s':>8} {'max stall ms':>12} {'p99 ms':>10} {'chars':>10}")
+    await measure("inline", inline)
+    await measure("pool", pooled)
+    shutdown_pdf_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main(args.pages))
@@ -0,0 +1,106 @@
+"""
+Benchmark: embedding top-k retrieval vs. the legacy substring scorer
+File: benchmarks/bench_retrieval.py
+
+Builds a synthetic document with 10k+ chunks, plants "needle" chunks that
+answer known questions, and measures per-query latency and recall@k of
+`simple_similarity_search` against HashingEmbedder + vectorized top-k.
+
+Run from the backend directory:
+    python benchmarks/bench_retrieval.py --chunks 12000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_NAME", "devmate_bench")
+os.environ.setdefault("RAG_EMBEDDER", "hashing")
+
+from src.rag.embeddings import HashingEmbedder  # noqa: E402
+from src.rag.vector_index import top_k as vector_top_k  # noqa: E402
+from src.tools.rag_tool import simple_similarity_search  # noqa: E402
+
+FILLER = "the a of and to in is that for on with as was by this are be from at or it".split()
+
+
+def pseudo_word(rng: random.Random) -> str:
+    consonants, vowels = "bcdfghklmnprstvwz", "aeiou"
+    return "".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+
+
+def build_corpus(n_chunks: int, n_needles: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocab = list({pseudo_word(rng) for _ in range(6000)})
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+
+    chunks = []
+    for _ in range(n_chunks):
+        words = rng.choices(vocab, weights=weights, k=60) + rng.choices(FILLER, k=20)
+        rng.shuffle(words)
+        chunks.append(" ".join(words) + ".")
+
+    # Needles carry distinctive topic words that the rest of the corpus does
+    # not use; questions mention them in a slightly different surface form.
+    known = set(vocab)
+    topics = []
+    while len(topics) < n_needles * 3:
+        word = pseudo_word(rng) + "x"
+        if word not in known:
+            known.add(word)
+            topics.append(word)
+
+    needles = []
+    for i, position in enumerate(rng.sample(range(n_chunks), n_needles)):
+        topic = topics[i * 3:(i + 1) * 3]
+        words = chunks[position].split()
+        words[5:5] = topic
+        chunks[position] = " ".join(words)
+        question = f"What does the report say about the {topic[0]}s, {topic[1]} and {topic[2]}?"
+        needles.append((position, question))
+    return chunks, needles
+
+
+def run(n_chunks: int, n_queries: int, k: int) -> None:
+    chunks, needles = build_corpus(n_chunks, n_queries)
+    embedder = HashingEmbedder()
+
+    start = time.perf_counter()
+    matrix = embedder.embed_documents(chunks)
+    embed_seconds = time.perf_counter() - start
+    print(f"corpus: {len(chunks)} chunks, matrix {matrix.shape} ({matrix.nbytes / 1e6:.1f} MB)")
+    print(f"one-off ingest embedding: {embed_seconds:.2f}s")
+
+    results = {}
+    for label in ("substring", "vector"):
+        latencies, hits = [], 0
+        for position, question in needles:
+            start = time.perf_counter()
+            if label == "substring":
+                found = simple_similarity_search(chunks, question, top_k=k)
+            else:
+                indices, _ = vector_top_k(matrix, embedder.embed_query(question), k)
+                found = [chunks[i] for i in indices]
+            latencies.append(time.perf_counter() - start)
+            hits += chunks[position] in found
+        results[label] = (latencies, hits / len(needles))
+
+    print(f"\n{'scorer':<10} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(k):>10}")
+    for label, (latencies, recall) in results.items():
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        print(f"{label:<10} {p50:>8.2f} {p95:>8.2f} {recall:>10.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=12000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    run(args.chunks, args.queries, args.k)
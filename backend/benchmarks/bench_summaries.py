@@ -0,0 +1,129 @@
+"""
+Benchmark: summary requests with and without a precomputed summary tree
+File: benchmarks/bench_summaries.py
+
+Uses a stub chat model whose latency follows a simple cost model (fixed
+overhead + prompt tokens at a prefill rate + answer tokens at a decode
+rate), so the numbers reflect prompt and answer sizes rather than network
+noise. For one synthetic document it measures:
+
+    truncated:  the old path, first 10 chunks / 8000 characters -> full summary
+    lookup:     "summarize my file" answered from the stored tree (no LLM call)
+    tree:       a specific summary question over the stored section summaries
+
+plus the one-time cost of building the tree in the background.
+
+Run from the backend directory:
+    python benchmarks/bench_summaries.py --chunks 400 --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_NAME", "devmate_bench")
+
+from src.rag import summaries  # noqa: E402
+from src.rag.chunker import get_encoding  # noqa: E402
+
+OVERHEAD_S = 0.35
+PREFILL_TOKENS_PER_S = 4000
+DECODE_TOKENS_PER_S = 60
+SUMMARY_TOKENS = 120  # answer length of one tree node
+ANSWER_TOKENS = 400  # answer length of a user-facing summary
+
+
+class StubLLM:
+    """Chat model stand-in: sleeps for the modeled latency, echoes a short text"""
+    model_name = "stub"
+
+    def __init__(self, answer_tokens: int):
+        self.answer_tokens = answer_tokens
+        self.encoding = get_encoding()
+        self.calls = 0
+
+    def latency(self, prompt: str) -> float:
+        prompt_tokens = len(self.encoding.encode_ordinary(prompt))
+        return OVERHEAD_S + prompt_tokens / PREFILL_TOKENS_PER_S + self.answer_tokens / DECODE_TOKENS_PER_S
+
+    async def ainvoke(self, prompt: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency(prompt))
+        return type("Response", (), {"content": "summary " * self.answer_tokens})()
+
+
+def build_chunks(n_chunks: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = "model data result method study effect analysis value system process sample rate".split()
+    return [
+        " ".join(rng.choice(words) for _ in range(150)) + "."
+        for _ in range(n_chunks)
+    ]
+
+
+def truncated_prompt(chunks) -> str:
+    # Mirrors the fallback summary path of query_documents
+    context = "\n\n".join(chunks[:10])
+    if len(context) > 8000:
+        context = context[:8000] + "..."
+    return f"Please provide a comprehensive summary of the following document.\n\n{context}\n\nSummary:"
+
+
+async def timed(requests: int, call) -> list:
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(n_chunks: int, requests: int) -> None:
+    chunks = build_chunks(n_chunks)
+
+    builder = StubLLM(SUMMARY_TOKENS)
+    start = time.perf_counter()
+    text, sections, levels = await summaries.build_summary_tree(chunks, builder)
+    build_seconds = time.perf_counter() - start
+    print(f"Document: {n_chunks} chunks")
+    print(f"Tree build (background, once): {builder.calls} LLM calls, {levels} levels, "
+          f"{len(sections)} sections, {build_seconds:.1f} s wall at concurrency {summaries.CONCURRENCY}")
+
+    stored = {"status": "ready", "text": text, "sections": sections}
+    answerer = StubLLM(ANSWER_TOKENS)
+    encoding = get_encoding()
+
+    async def truncated():
+        await answerer.ainvoke(truncated_prompt(chunks))
+
+    async def lookup():
+        if summaries.is_plain_summary_request("Summarize my file"):
+            return stored["text"]
+
+    async def tree():
+        await answerer.ainvoke(summaries.summary_prompt("What are the main results?", "bench.txt", stored))
+
+    prompts = {
+        "truncated": truncated_prompt(chunks),
+        "lookup": "",
+        "tree": summaries.summary_prompt("What are the main results?", "bench.txt", stored),
+    }
+    print(f"\n{'path':<10} {'p50 ms':>9} {'max ms':>9} {'prompt tokens':>14}")
+    for label, call in (("truncated", truncated), ("lookup", lookup), ("tree", tree)):
+        samples = await timed(requests, call)
+        print(f"{label:<10} {statistics.median(samples) * 1000:>9.1f} {max(samples) * 1000:>9.1f} "
+              f"{len(encoding.encode_ordinary(prompts[label])):>14}")
+    print("\nThe truncated path only ever sees the first 10 chunks; both tree paths cover the whole document.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.chunks, args.requests))
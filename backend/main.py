@@ -1,15 +1,20 @@
 from fastapi import FastAPI, HTTPException, Depends, Body, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, EmailStr
 from src.auth import hash_password, verify_password, create_access_token, decode_access_token
 from bson import ObjectId
 import json
-import base64
+import os
+import asyncio
+from typing import Optional, Tuple
 
 # Centralized DB client
 from src.db import users_collection, sessions_collection, conversations_collection, create_indexes
 from src.graph import sync_graph  # your LangGraph instance
+from src import conversations, memory
+from src.conversations import ConversationNotFound
 from datetime import datetime
 
 
@@ -42,6 +47,41 @@ async def startup_event():
     """Initialize database indexes on startup"""
     await create_indexes()
 
+    # Move RAG documents with inline chunks to rag_chunks without delaying startup
+    if os.getenv("RAG_MIGRATE_ON_STARTUP", "true").lower() == "true":
+        from src.rag.chunk_store import migrate_all
+        asyncio.create_task(migrate_all())
+
+    # Background workers that process queued uploads
+    from src.rag.jobs import start_workers
+    start_workers()
+
+    # Exchange rates: last snapshot now, fresh table in the background
+    from src.fx_rates import start_refresher
+    await start_refresher()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background worker pools"""
+    from src.rag.jobs import stop_workers
+    await stop_workers()
+
+    from src.fx_rates import stop_refresher
+    await stop_refresher()
+
+    from src.rag.extraction import shutdown_pdf_pool
+    shutdown_pdf_pool()
+
+    from src.tool_executor import shutdown_tool_pool
+    shutdown_tool_pool()
+
+    from src.llm_registry import close_clients
+    await close_clients()
+
+    from src import http_client
+    await http_client.close_clients()
+
 # ---------------------------
 # Schemas
 # ---------------------------
@@ -163,40 +203,39 @@ async def chat(req: MessageRequest, user=Depends(get_current_user)):
 # ---------------------------
 # File Upload Endpoint (FIXED)
 # ---------------------------
-@app.post("/upload")
+@app.post("/upload", status_code=202)
 async def upload_file(
     file: UploadFile = File(...),
     user=Depends(get_current_user)
 ):
     """
-    Upload a file and process it using RAG tool.
-    The file will be processed and stored in MongoDB for later querying.
+    Upload a file for processing by the RAG pipeline.
+    The upload is streamed into memory once, size-checked while reading,
+    and queued for a background ingestion worker. The response carries a
+    job_id to poll at /uploads/{job_id} (or follow at /uploads/{job_id}/events).
     """
+    from src.rag.uploads import read_upload, UploadTooLarge
+    from src.rag.jobs import enqueue
+
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Convert to base64
-        base64_data = base64.b64encode(file_content).decode('utf-8')
-        
-        # Get user_id as string
-        user_id = str(user["_id"])
-        
-        # Directly import and call the tool
-        from src.tools.rag_tool import process_and_store_file
-        
-        # Call the tool directly (it's already async)
-        result = await process_and_store_file.ainvoke({
-            "file_data": base64_data,
-            "file_name": file.filename,
-            "file_type": file.content_type or "application/octet-stream",
-            "user_id": user_id
-        })
+        # Stream the upload, hashing it and enforcing the size limit
+        file_content, content_hash = await read_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        job = await enqueue(
+            str(user["_id"]),
+            file.filename,
+            file.content_type or "application/octet-stream",
+            file_content,
+            content_hash,
+        )
         
-        # Result is a string message from the tool
         return {
-            "status": "success",
-            "message": result,  # This is the string response from the tool
+            "status": "queued",
+            "job_id": job["job_id"],
+            "message": f"⏳ File '{file.filename}' received and queued for processing.",
             "file_name": file.filename,
             "file_type": file.content_type,
             "file_size": len(file_content)
@@ -208,40 +247,111 @@ async def upload_file(
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------
+# Upload Job Status Endpoints
+# ---------------------------
+@app.get("/uploads/{job_id}")
+async def get_upload_status(job_id: str, user=Depends(get_current_user)):
+    """Status and current stage of an ingestion job."""
+    from src.rag.jobs import get_job
+
+    job = await get_job(str(user["_id"]), job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job
+
+@app.get("/uploads/{job_id}/events")
+async def stream_upload_status(job_id: str, user=Depends(get_current_user)):
+    """Server-sent events with the job status on every stage change, until it finishes."""
+    from src.rag.jobs import get_job, watch_job
+
+    user_id = str(user["_id"])
+    if not await get_job(user_id, job_id):
+        raise HTTPException(status_code=404, detail="Upload job not found")
+
+    async def events():
+        async for view in watch_job(user_id, job_id):
+            yield f"event: {view['status']}\ndata: {json.dumps(view)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # ---------------------------
 # Run Graph Endpoint (/run)
 # ---------------------------
 from fastapi import Request
 
+def normalize_run_messages(payload: dict) -> list:
+    """Messages of a /run payload as role/content dicts"""
+    # Accept either {"message": "..."} or {"messages": [...]}
+    if "messages" in payload and isinstance(payload["messages"], list):
+        messages_in = payload["messages"]
+    elif "message" in payload:
+        messages_in = [{"role": "user", "content": payload["message"]}]
+    else:
+        raise HTTPException(status_code=422, detail="Payload must include 'message' or 'messages'")
+
+    # Ensure all messages have role and content
+    formatted_messages = []
+    for msg in messages_in:
+        if isinstance(msg, dict) and "role" in msg and "content" in msg:
+            formatted_messages.append(msg)
+        elif isinstance(msg, dict) and "content" in msg:
+            # Add default role if missing
+            formatted_messages.append({"role": "user", "content": msg["content"]})
+        else:
+            # Skip invalid messages
+            continue
+
+    if not formatted_messages:
+        raise HTTPException(status_code=422, detail="No valid messages found")
+    return formatted_messages
+
+
+async def prepare_run(user, payload: dict) -> Tuple[list, Optional[list]]:
+    """
+    Graph input for a /run payload, and the turn to append to the conversation.
+
+    {"message": ..., "conversation_id": ...} continues a stored conversation:
+    its history is loaded server-side and only the new turn is appended.
+    {"messages": [...]} is the older form where the client sends the whole
+    history, which then replaces the stored one; the turn is None for it.
+    """
+    formatted_messages = normalize_run_messages(payload)
+    if isinstance(payload.get("messages"), list):
+        return formatted_messages, None
+
+    conversation_id = payload.get("conversation_id")
+    context = []
+    if conversation_id:
+        try:
+            conversation = await conversations.load(user["_id"], conversation_id)
+        except ConversationNotFound:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        # Older turns are passed as their stored summary
+        context = memory.build_context(conversation["messages"], conversation["memory"])
+    return context + formatted_messages, formatted_messages
+
+
+async def save_run(user, conversation_id, messages: list, append: bool) -> str:
+    """Append a turn (or store the full history) and return the conversation id"""
+    try:
+        if append:
+            conversation_id = await conversations.append_messages(user, conversation_id, messages)
+            # Fold turns that left the recent window into the summary, off the request path
+            memory.schedule_update(user["_id"], conversation_id)
+            return conversation_id
+        return await conversations.replace_messages(user, conversation_id, messages)
+    except ConversationNotFound:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+
 @app.post("/run")
 async def run_graph(request: Request, user=Depends(get_current_user), payload: dict = Body(...)):
     """Invoke LangGraph with flexible payload and pass user_id for RAG operations."""
     try:
         # Get conversation_id from payload (if continuing existing conversation)
         conversation_id = payload.get("conversation_id")
-        
-        # Accept either {"message": "..."} or {"messages": [...]}
-        if "messages" in payload and isinstance(payload["messages"], list):
-            messages_in = payload["messages"]
-        elif "message" in payload:
-            messages_in = [{"role": "user", "content": payload["message"]}]
-        else:
-            raise HTTPException(status_code=422, detail="Payload must include 'message' or 'messages'")
-
-        # Ensure all messages have role and content
-        formatted_messages = []
-        for msg in messages_in:
-            if isinstance(msg, dict) and "role" in msg and "content" in msg:
-                formatted_messages.append(msg)
-            elif isinstance(msg, dict) and "content" in msg:
-                # Add default role if missing
-                formatted_messages.append({"role": "user", "content": msg["content"]})
-            else:
-                # Skip invalid messages
-                continue
-
-        if not formatted_messages:
-            raise HTTPException(status_code=422, detail="No valid messages found")
+        formatted_messages, turn = await prepare_run(user, payload)
 
         # Pass user_id to sync_graph for RAG operations
         user_id = str(user["_id"])
@@ -253,6 +363,12 @@ async def run_graph(request: Request, user=Depends(get_current_user), payload: d
             "username": user.get("username")
         })
 
+        if turn is not None:
+            # Only this turn is appended and returned; the client already has the rest
+            turn = turn + (result.get("new_messages") or [])
+            conversation_id = await save_run(user, conversation_id, turn, append=True)
+            return {"messages": turn, "conversation_id": conversation_id}
+
         # Normalize messages into JSON-safe list
         messages = []
         raw_msgs = []
@@ -275,29 +391,8 @@ async def run_graph(request: Request, user=Depends(get_current_user), payload: d
                 messages.append({"role": role, "content": content})
 
         # Update or create conversation in MongoDB
-        if conversation_id:
-            # Update existing conversation
-            await conversations_collection.update_one(
-                {"_id": ObjectId(conversation_id), "user_id": user["_id"]},
-                {
-                    "$set": {
-                        "messages": messages,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            return {"messages": messages, "conversation_id": conversation_id}
-        else:
-            # Create new conversation
-            result = await conversations_collection.insert_one({
-                "user_id": user["_id"],
-                "username": user["username"],
-                "email": user["email"],
-                "messages": messages,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            })
-            return {"messages": messages, "conversation_id": str(result.inserted_id)}
+        conversation_id = await save_run(user, conversation_id, messages, append=False)
+        return {"messages": messages, "conversation_id": conversation_id}
             
     except HTTPException:
         raise
@@ -307,6 +402,62 @@ async def run_graph(request: Request, user=Depends(get_current_user), payload: d
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------
+# Streaming Run Endpoint (/run/stream)
+# ---------------------------
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/run/stream")
+async def run_graph_stream(user=Depends(get_current_user), payload: dict = Body(...)):
+    """
+    Same payload as /run, answered as server-sent events:
+    tool_start / tool_end around every tool call, token for each piece of
+    the assistant's answer, then done with the final messages and the
+    conversation_id once the conversation has been saved (or error).
+    """
+    conversation_id = payload.get("conversation_id")
+    formatted_messages, turn = await prepare_run(user, payload)
+    user_id = str(user["_id"])
+
+    async def events():
+        try:
+            messages = new_messages = None
+            async for event in sync_graph.stream({
+                "messages": formatted_messages,
+                "user_id": user_id,
+                "username": user.get("username")
+            }):
+                if event["type"] == "final":
+                    messages, new_messages = event["messages"], event["new_messages"]
+                else:
+                    yield sse_event(event["type"], event)
+
+            if messages is None:
+                # The run ended without an answer: keep the stored conversation as it was
+                yield sse_event("error", {"detail": "The run ended without a final answer; nothing was saved."})
+                return
+
+            # Persist only once the run has completed
+            if turn is not None:
+                messages = turn + (new_messages or [])
+                saved_id = await save_run(user, conversation_id, messages, append=True)
+            else:
+                saved_id = await save_run(user, conversation_id, messages, append=False)
+            yield sse_event("done", {"messages": messages, "conversation_id": saved_id})
+        except Exception as e:
+            import traceback
+            print(f"Error in /run/stream endpoint: {str(e)}")
+            print(traceback.format_exc())
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------------------------
 # Get Conversations Endpoint
 # ---------------------------
@@ -361,6 +512,7 @@ async def delete_conversation(conversation_id: str, user=Depends(get_current_use
             "user_id": user["_id"]
         })
         
+        conversations.forget(user["_id"], conversation_id)
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
@@ -370,6 +522,15 @@ async def delete_conversation(conversation_id: str, user=Depends(get_current_use
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------
+# Metrics Endpoint
+# ---------------------------
+@app.get("/metrics")
+async def get_metrics(user=Depends(get_current_user)):
+    """In-process counters and latency stats (cache hit rates, etc.)"""
+    from src.metrics import metrics
+    return metrics.snapshot()
+
 # ---------------------------
 # Get User's Uploaded Files
 # ---------------------------
@@ -377,10 +538,12 @@ async def delete_conversation(conversation_id: str, user=Depends(get_current_use
 async def get_user_files(user=Depends(get_current_user)):
     """Get all files uploaded by the current user."""
     try:
-        from src.tools.rag_tool import list_user_files
+        from src.tools.rag_tool import list_user_files, set_user_context
         
+        # The RAG tools read the user from context; only metadata is fetched
         user_id = str(user["_id"])
-        result = await list_user_files.ainvoke({"user_id": user_id})
+        set_user_context(user_id)
+        result = await list_user_files.ainvoke({})
         
         return {"files": result}
     except Exception as e:
@@ -393,13 +556,11 @@ async def get_user_files(user=Depends(get_current_user)):
 async def delete_file(file_name: str, user=Depends(get_current_user)):
     """Delete a specific file for the current user."""
     try:
-        from src.tools.rag_tool import delete_user_file
+        from src.tools.rag_tool import delete_user_file, set_user_context
         
         user_id = str(user["_id"])
-        result = await delete_user_file.ainvoke({
-            "user_id": user_id,
-            "file_name": file_name
-        })
+        set_user_context(user_id)
+        result = await delete_user_file.ainvoke({"file_name": file_name})
         
         return {"message": result}
     except Exception as e:
@@ -1,14 +1,24 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from src.llm_registry import get_chat_model
+from src.memory import fit_to_budget
+from langchain_core.messages import HumanMessage, SystemMessage
 
 
 class CodeAgent:
     def __init__(self, model_name):
-        self.llm = ChatOpenAI(model=model_name, temperature=0.3)
+        self.llm = get_chat_model(model_name, temperature=0.3)
+        self.system_message = SystemMessage(content="""You are a coding assistant.
+Write correct, idiomatic code with short explanations. Use fenced code blocks with the language name.
+When fixing or reviewing code, point out the problem before showing the fix.""")
 
-    def handle_code_task(self, query: str) -> str:
+    async def run(self, state):
+        """Graph node: answer a coding request with the conversation as context (no tools)"""
+        messages = state["messages"]
+        response = await self.llm.ainvoke(fit_to_budget([self.system_message] + messages))
+        return {"messages": messages + [response]}
+
+    async def handle_code_task(self, query: str) -> str:
         prompt = f"You are a coding assistant.\nTask: {query}"
-        result = self.llm.invoke([HumanMessage(content=prompt)])
+        result = await self.llm.ainvoke([HumanMessage(content=prompt)])
 
         # Normalize different possible return shapes from various LLM wrappers
         #  - Some libraries return a message-like object with `.content`.
@@ -1,15 +1,110 @@
+import re
+from typing import Optional, Tuple
+
+from src import fx_rates
+
+# Routes
+TIME = "time"
+CALCULATOR = "calculator"
+CURRENCY = "currency"
+CODE_AGENT = "code_agent"
+STUDY_AGENT = "study_agent"
+
+# Routes answered by calling one tool directly, without an LLM round-trip
+DIRECT_TOOLS = {
+    TIME: "current_time_tool",
+    CALCULATOR: "calculator_tool",
+    CURRENCY: "currency_converter",
+}
+
+_TIME_RE = re.compile(
+    r"^(?:what(?:'s| is)? (?:the )?(?:current )?time(?: is it)?(?: now)?|what time is it(?: now)?|current time|time now)[\s?.!]*$"
+)
+_CALC_RE = re.compile(
+    r"^(?:(?:what(?:'s| is)|calculate|compute|evaluate|solve)\s+)?([0-9+\-*/().% ]+?)\s*(?:=\s*)?[?.!]*$"
+)
+_CURRENCY_RE = re.compile(
+    r"^(?:convert\s+)?(\d+(?:\.\d+)?)\s*([a-z]{3})\s+(?:to|in|into)\s+([a-z]{3})[\s?.!]*$"
+)
+_OPERATOR_RE = re.compile(r"\d\s*(?:[+\-*/%]|\*\*)\s*[\d(]")
+# Dates and phone numbers look like subtraction/division but are not arithmetic
+_NOT_ARITHMETIC_RE = re.compile(
+    r"^(?:\d{4}[-/]\d{1,2}[-/]\d{1,2}"  # 2024-01-15, 2024/1/15
+    r"|\d{1,2}[-/]\d{1,2}[-/]\d{2,4}"  # 15-01-2024, 1/15/24
+    r"|\+?\d{1,3}[ -]\d{3}[ -]\d{3}[ -]\d{4}"  # +1 555 123 4567
+    r"|\(?\d{3}\)?[ -]?\d{3}-\d{4}"  # (555) 123-4567, 555-123-4567
+    r"|\d{3}-\d{4})$"  # 555-1234
+)
+
+# Code tasks: a code block, or a coding verb next to code context. Words that
+# also have everyday meanings ("class", "java", "rust", "script") only count
+# next to a source file name or a programming noun; "function" and "method"
+# only next to a source file name, a call like foo() or a language name.
+_CODE_BLOCK_RE = re.compile(r"```|\bdef \w+\(|\bclass \w+[:(]|\bfunction \w+\(|=>|#include\b")
+_CODE_VERBS_RE = re.compile(r"\b(?:write|fix|debug|refactor|implement|optimize|review|explain|convert)\b")
+_CODE_WORDS_RE = re.compile(
+    r"(?<!\w)(?:code|bug|regex|sql query|algorithm|stack trace|traceback|"
+    r"compiler? error|unit tests?|source file)(?!\w)"
+)
+_SOURCE_FILE_RE = re.compile(r"\b\w+\.(?:py|js|jsx|ts|tsx|java|rs|go|c|cpp|h|hpp|cs|rb|php|kt|swift|sql|sh)\b")
+_ROUTINE_WORDS_RE = re.compile(r"\b(?:functions?|methods?)\b")
+_CALL_RE = re.compile(r"\b\w+\(\)")
+_LANGUAGE_RE = re.compile(r"(?<!\w)(?:python|javascript|typescript|java|c\+\+|c#|rust|golang|kotlin|swift|ruby|php|sql)(?!\w)")
+_LANGUAGE_CODE_RE = re.compile(
+    r"(?<!\w)(?:python|javascript|typescript|java|c\+\+|rust|golang|react)\s+"
+    r"(?:script|program|class|snippet|component|app|module|library|exception)s?\b"
+)
+# Requests about the user's files need the RAG or file tools, so they stay with the study agent
+_DOCUMENT_RE = re.compile(r"\b(?:my|the|this|uploaded) (?:document|file|pdf|upload|notes)s?\b")
+_FILE_IO_RE = re.compile(
+    r"\b(?:sav(?:e|ing)|writ(?:e|ing)|read(?:ing)?|stor(?:e|ing)|open(?:ing)?)\b.*\b(?:file|files|disk)\b"
+    r"|\bsave (?:it|this|that|them)\b"
+)
+
+
 class Orchestrator:
     """
     Routes the user request to the correct agent.
+
+    Classification is rule based, so it costs microseconds: only requests
+    that match a rule exactly are taken off the tool-calling agent.
     """
 
-    def route(self, query: str) -> str:
-        q = query.lower()
+    def classify(self, query: str) -> Tuple[str, Optional[dict]]:
+        """
+        Returns:
+            (route, tool arguments) - arguments only for DIRECT_TOOLS routes
+        """
+        q = " ".join(query.lower().split())
+
+        if _TIME_RE.match(q):
+            return TIME, {}
+
+        match = _CURRENCY_RE.match(q)
+        if match and fx_rates.is_known_currency(match.group(2)) and fx_rates.is_known_currency(match.group(3)):
+            amount, source, target = match.groups()
+            return CURRENCY, {"from_currency": source.upper(), "to_currency": target.upper(), "amount": float(amount)}
 
-        if "study" in q or "plan" in q or "notes" in q:
-            return "study_agent"
+        match = _CALC_RE.match(q)
+        if match and _OPERATOR_RE.search(match.group(1)) and not _NOT_ARITHMETIC_RE.match(match.group(1).strip()):
+            return CALCULATOR, {"expression": match.group(1).strip()}
 
-        if "code" in q or "bug" in q or "function" in q:
-            return "code_agent"
+        if self._is_code_task(query, q):
+            return CODE_AGENT, None
 
-        return "study_agent"   # fallback
+        return STUDY_AGENT, None
+
+    @staticmethod
+    def _is_code_task(query: str, q: str) -> bool:
+        if _DOCUMENT_RE.search(q) or _FILE_IO_RE.search(q):
+            return False
+        if _CODE_BLOCK_RE.search(query):
+            return True
+        source_file = _SOURCE_FILE_RE.search(q)
+        has_context = _CODE_WORDS_RE.search(q) or source_file or _LANGUAGE_CODE_RE.search(q) or (
+            _ROUTINE_WORDS_RE.search(q) and (source_file or _CALL_RE.search(q) or _LANGUAGE_RE.search(q))
+        )
+        return bool(_CODE_VERBS_RE.search(q) and has_context)
+
+    def route(self, query: str) -> str:
+        return self.classify(query)[0]
@@ -1,36 +1,36 @@
 # src/agents/study_agent.py
 
+from typing import Iterable, Optional
+
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-
-class StudyAgent:
-    def __init__(self, llm):
-        self.llm = llm
-        # Add system message with RAG capabilities
-        self.system_message = SystemMessage(content="""You are a helpful AI assistant with access to various tools.
-
-**Available Tools:**
-1. **File Management Tools:**
-   - write_file: Save content to a file
-   - read_file: Read content from a file
-
-2. **Information Tools:**
-   - current_time_tool: Get current date and time
-   - tavily_search_tool: Search the web for information
-   - youtube_summary_tool: Summarize YouTube videos
-   - weather_tool: Get weather information
-   - stock_price_tool: Get stock prices
-   - calculator_tool: Perform calculations
-   - currency_converter: Convert currencies
-
-3. **📄 RAG Document Tools:**
-   - process_and_store_file: Process uploaded documents (PDF, images, text) and store for querying
-   - query_documents: Answer questions based on uploaded documents
-   - list_user_files: Show all files uploaded by the user
-   - delete_user_file: Delete a specific file
-   - delete_all_user_files: Delete all files (requires confirmation)
-
-**RAG Tool Usage Guidelines:**
+from src.memory import fit_to_budget
+
+# One line per tool in the "Available Tools" section, grouped as listed there
+TOOL_SECTIONS = [
+    ("File Management Tools", [
+        ("write_file", "Save content to a file"),
+        ("read_file", "Read content from a file"),
+    ]),
+    ("Information Tools", [
+        ("current_time_tool", "Get current date and time"),
+        ("tavily_search_tool", "Search the web for information"),
+        ("youtube_summary_tool", "Summarize YouTube videos"),
+        ("weather_tool", "Get weather information"),
+        ("stock_price_tool", "Get stock prices"),
+        ("calculator_tool", "Perform calculations"),
+        ("currency_converter", "Convert currencies"),
+    ]),
+    ("📄 RAG Document Tools", [
+        ("process_and_store_file", "Process uploaded documents (PDF, images, text) and store for querying"),
+        ("query_documents", "Answer questions based on uploaded documents (searches all files, or one file via file_name)"),
+        ("list_user_files", "Show all files uploaded by the user"),
+        ("delete_user_file", "Delete a specific file"),
+        ("delete_all_user_files", "Delete all files (requires confirmation)"),
+    ]),
+]
+
+RAG_GUIDELINES = """**RAG Tool Usage Guidelines:**
 
 When users ask questions about their documents:
 1. If they mention uploading a file or ask about "my document", use `query_documents`
@@ -58,25 +58,58 @@ User: "Delete the file named report.pdf"
 **Important Notes:**
 - RAG tools automatically use the user's ID from the authenticated session
 - Users can only access their own files (enforced by the system)
-- Always use the latest uploaded file when answering questions
+- query_documents searches all of the user's files; pass file_name when the user asks about a specific file
+- Summaries use the latest uploaded file unless a file_name is given
 - Provide clear, helpful responses with source citations
 - If a user hasn't uploaded a file yet, tell them to upload one first
 
-**General Guidelines:**
+"""
+
+GENERAL_GUIDELINES = """**General Guidelines:**
 - Use tools when you need specific information or to perform actions
 - Be concise and helpful in your responses
 - If you don't know something, use tavily_search_tool to find it
 - Always confirm before performing destructive actions (like deleting files)
-- When answering from documents, cite the source file name""")
+- When answering from documents, cite the source file name"""
+
 
-    def run(self, state):
+def build_system_prompt(tool_names: Optional[Iterable[str]] = None) -> str:
+    """System prompt describing `tool_names` (all tools when None)"""
+    names = None if tool_names is None else set(tool_names)
+    sections = []
+    for title, tools in TOOL_SECTIONS:
+        lines = [f"   - {name}: {text}" for name, text in tools if names is None or name in names]
+        if lines:
+            sections.append(f"{len(sections) + 1}. **{title}:**\n" + "\n".join(lines))
+    prompt = "You are a helpful AI assistant with access to various tools.\n\n"
+    if sections:
+        prompt += "**Available Tools:**\n" + "\n\n".join(sections) + "\n\n"
+    if names is None or "query_documents" in names:
+        prompt += RAG_GUIDELINES
+    return prompt + GENERAL_GUIDELINES
+
+
+class StudyAgent:
+    def __init__(self, llm, tool_selector=None):
+        self.llm = llm
+        # Picks the tools (and the matching prompt) per request when given
+        self.tool_selector = tool_selector
+        # Add system message with RAG capabilities
+        self.system_message = SystemMessage(content=build_system_prompt())
+
+    async def run(self, state):
         messages = state["messages"]
 
-        # Prepend system message to every conversation
-        messages_with_system = [self.system_message] + messages
+        llm, system_message = self.llm, self.system_message
+        groups = state.get("tool_groups")
+        if self.tool_selector is not None and groups is not None:
+            llm, system_message = self.tool_selector.bound(groups)
+
+        # Prepend system message to every conversation, keeping the prompt within budget
+        messages_with_system = fit_to_budget([system_message] + messages)
 
-        # Call the model
-        response = self.llm.invoke(messages_with_system)
+        # Call the model without blocking the event loop
+        response = await llm.ainvoke(messages_with_system)
         return {"messages": messages + [response]}
 
     def route(self, state):
@@ -0,0 +1,165 @@
+"""
+Two-tier TTL cache
+File: src/cache.py
+
+`LRUCache` is a per-process, thread-safe LRU with a time-to-live and an
+entry limit. `TieredCache` puts it in front of an optional shared tier in
+MongoDB (the cache_entries collection), so processes behind a load
+balancer can reuse each other's results. Expired shared entries are
+removed by a TTL index on `expires_at`.
+
+Entries can carry tags (e.g. a user id) so that everything derived from
+some data can be dropped at once when that data changes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from src.metrics import metrics
+
+
+def make_key(*parts: Any) -> str:
+    """Stable hex key for any JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (expires_at monotonic, value, tags)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, tag: str) -> int:
+        """Drop every entry carrying `tag`; returns how many were dropped"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class TieredCache:
+    """
+    In-process LRU in front of an optional MongoDB tier.
+
+    Keys are strings (see make_key) and values must be BSON-serializable
+    when the shared tier is on. Hit and miss counters are reported to
+    metrics as cache.<name>.hit_local / hit_shared / miss.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, shared: bool = False):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.local = LRUCache(max_entries, ttl_seconds)
+
+    @property
+    def _collection(self):
+        from src.db import cache_entries_collection
+        return cache_entries_collection
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            metrics.incr(f"cache.{self.name}.hit_local")
+            return value
+
+        if self.shared:
+            try:
+                entry = await self._collection.find_one(
+                    {"namespace": self.name, "key": key, "expires_at": {"$gt": datetime.utcnow()}},
+                    {"value": 1, "tags": 1, "expires_at": 1},
+                )
+            except Exception as e:
+                print(f"⚠️ Shared cache '{self.name}' unavailable: {e}")
+                entry = None
+            if entry is not None:
+                remaining = (entry["expires_at"] - datetime.utcnow()).total_seconds()
+                self.local.set(key, entry["value"], entry.get("tags", ()), ttl_seconds=remaining)
+                metrics.incr(f"cache.{self.name}.hit_shared")
+                return entry["value"]
+
+        metrics.incr(f"cache.{self.name}.miss")
+        return None
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        tags = list(tags)
+        self.local.set(key, value, tags, ttl_seconds=ttl)
+        if self.shared:
+            try:
+                await self._collection.update_one(
+                    {"namespace": self.name, "key": key},
+                    {"$set": {
+                        "value": value,
+                        "tags": tags,
+                        "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                print(f"⚠️ Shared cache '{self.name}' unavailable: {e}")
+
+    async def invalidate(self, tag: str) -> None:
+        """Drop every entry carrying `tag`, in both tiers"""
+        dropped = self.local.invalidate(tag)
+        if self.shared:
+            result = await self._collection.delete_many({"namespace": self.name, "tags": tag})
+            dropped += result.deleted_count
+        metrics.incr(f"cache.{self.name}.invalidated", dropped)
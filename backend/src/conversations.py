@@ -0,0 +1,157 @@
+"""
+Server-side conversation history
+File: src/conversations.py
+
+`/run` only needs the new user message and the conversation_id: the
+history is loaded here and each turn is appended with `$push`, so request
+size and Mongo writes stay proportional to the turn rather than to the
+whole conversation.
+
+Recently used conversations are kept in an in-process LRU (keyed by user
+and conversation id), so an active conversation is read from Mongo once.
+Appends go to Mongo first and are then applied to the cached copy. With
+several server processes, a turn written by another process is only seen
+here once the cached copy expires (CONVERSATION_CACHE_TTL_SECONDS).
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from src.cache import LRUCache
+from src.db import conversations_collection
+from src.metrics import metrics
+
+CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "1000"))
+CACHE_TTL_SECONDS = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "600"))
+
+_cache = LRUCache(CACHE_SIZE, CACHE_TTL_SECONDS)
+
+
+class ConversationNotFound(Exception):
+    """The conversation does not exist or belongs to another user"""
+
+
+def _object_id(conversation_id: str) -> ObjectId:
+    try:
+        return ObjectId(conversation_id)
+    except (InvalidId, TypeError):
+        raise ConversationNotFound(conversation_id)
+
+
+def _key(user_id, conversation_id: str) -> tuple:
+    return (str(user_id), str(conversation_id))
+
+
+async def load(user_id, conversation_id: str) -> dict:
+    """
+    Stored messages (oldest first) and memory of a conversation.
+
+    Returns:
+        {"messages": [...], "memory": {...}}; treat it as read-only, it is
+        shared with the cache
+
+    Raises:
+        ConversationNotFound: if the user has no such conversation
+    """
+    cached = _cache.get(_key(user_id, conversation_id))
+    if cached is not None:
+        metrics.incr("conversations.cache_hit")
+        return cached
+
+    metrics.incr("conversations.cache_miss")
+    conversation = await conversations_collection.find_one(
+        {"_id": _object_id(conversation_id), "user_id": user_id},
+        {"messages": 1, "memory": 1},
+    )
+    if not conversation:
+        raise ConversationNotFound(conversation_id)
+    entry = {"messages": conversation.get("messages") or [], "memory": conversation.get("memory") or {}}
+    _cache.set(_key(user_id, conversation_id), entry)
+    return entry
+
+
+async def load_messages(user_id, conversation_id: str) -> List[dict]:
+    """Stored messages of a conversation, oldest first (see load)"""
+    return list((await load(user_id, conversation_id))["messages"])
+
+
+async def create(user, messages: List[dict]) -> str:
+    """Store a new conversation and return its id"""
+    now = datetime.utcnow()
+    result = await conversations_collection.insert_one({
+        "user_id": user["_id"],
+        "username": user["username"],
+        "email": user["email"],
+        "messages": messages,
+        "created_at": now,
+        "updated_at": now,
+    })
+    conversation_id = str(result.inserted_id)
+    _cache.set(_key(user["_id"], conversation_id), {"messages": list(messages), "memory": {}})
+    return conversation_id
+
+
+async def append_messages(user, conversation_id: Optional[str], messages: List[dict]) -> str:
+    """
+    Append one turn to a conversation, creating it when conversation_id is empty.
+
+    Returns:
+        The conversation id
+
+    Raises:
+        ConversationNotFound: if the user has no such conversation
+    """
+    if not conversation_id:
+        return await create(user, messages)
+
+    result = await conversations_collection.update_one(
+        {"_id": _object_id(conversation_id), "user_id": user["_id"]},
+        {
+            "$push": {"messages": {"$each": messages}},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+    )
+    key = _key(user["_id"], conversation_id)
+    if result.matched_count == 0:
+        _cache.delete(key)
+        raise ConversationNotFound(conversation_id)
+
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.set(key, {**cached, "messages": cached["messages"] + messages})
+    return conversation_id
+
+
+async def replace_messages(user, conversation_id: Optional[str], messages: List[dict]) -> str:
+    """Overwrite the whole history (clients that still send every message)"""
+    if not conversation_id:
+        return await create(user, messages)
+
+    result = await conversations_collection.update_one(
+        {"_id": _object_id(conversation_id), "user_id": user["_id"]},
+        {"$set": {"messages": messages, "updated_at": datetime.utcnow()}, "$unset": {"memory": ""}},
+    )
+    if result.matched_count:
+        _cache.set(_key(user["_id"], conversation_id), {"messages": list(messages), "memory": {}})
+    return conversation_id
+
+
+async def set_memory(user_id, conversation_id: str, memory: dict) -> None:
+    """Store the conversation's long-term memory (see src/memory.py)"""
+    await conversations_collection.update_one(
+        {"_id": _object_id(conversation_id), "user_id": user_id},
+        {"$set": {"memory": memory}},
+    )
+    key = _key(user_id, conversation_id)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.set(key, {**cached, "memory": memory})
+
+
+def forget(user_id, conversation_id: str) -> None:
+    """Drop the cached copy, e.g. after the conversation was deleted"""
+    _cache.delete(_key(user_id, conversation_id))
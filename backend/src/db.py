@@ -1,4 +1,4 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
 import os
 from dotenv import load_dotenv
 
@@ -16,6 +16,13 @@ users_collection = db["users"]
 sessions_collection = db["sessions"]
 conversations_collection = db["conversations"]
 rag_documents_collection = db["rag_documents"]  # New collection for RAG
+rag_chunks_collection = db["rag_chunks"]  # One record per RAG document chunk
+rag_vectors_collection = db["rag_vectors"]  # Chunk embedding matrices for RAG
+rag_postings_collection = db["rag_postings"]  # BM25 inverted index for RAG
+rag_extraction_cache_collection = db["rag_extraction_cache"]  # Extraction results by content hash
+rag_ingest_jobs_collection = db["rag_ingest_jobs"]  # Background upload ingestion jobs
+cache_entries_collection = db["cache_entries"]  # Shared tier of src/cache.py caches
+rag_uploads_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="rag_uploads")  # Bytes of queued uploads
 
 
 # Optional: Create indexes for better performance
@@ -33,6 +40,44 @@ async def create_indexes():
         await rag_documents_collection.create_index([("user_id", 1), ("is_latest", -1)])
         await rag_documents_collection.create_index([("user_id", 1), ("uploaded_at", -1)])
         await rag_documents_collection.create_index([("user_id", 1), ("file_name", 1)])
+
+        # RAG chunks collection indexes
+        await rag_chunks_collection.create_index(
+            [("user_id", 1), ("doc_id", 1), ("ordinal", 1)], unique=True
+        )
+        await rag_chunks_collection.create_index([("doc_id", 1), ("ordinal", 1)])
+
+        # RAG vectors collection indexes
+        await rag_vectors_collection.create_index([("doc_id", 1), ("block", 1)])
+        await rag_vectors_collection.create_index("user_id")
+
+        # RAG inverted index collection indexes
+        await rag_postings_collection.create_index([("user_id", 1), ("term", 1)])
+        await rag_postings_collection.create_index("doc_id")
+
+        # RAG extraction cache indexes (TTL evicts entries unused for N days)
+        from src.rag.extraction_cache import TTL_SECONDS
+        await rag_extraction_cache_collection.create_index(
+            [("scope", 1), ("content_hash", 1), ("file_type", 1), ("chunker", 1)], unique=True
+        )
+        await rag_extraction_cache_collection.create_index(
+            "last_used_at", expireAfterSeconds=TTL_SECONDS
+        )
+
+        # RAG ingestion job indexes (TTL removes finished jobs after N hours)
+        from src.rag.jobs import JOB_TTL_SECONDS
+        await rag_ingest_jobs_collection.create_index([("status", 1), ("available_at", 1)])
+        await rag_ingest_jobs_collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        await rag_ingest_jobs_collection.create_index([("user_id", 1), ("created_at", -1)])
+        await rag_ingest_jobs_collection.create_index([("kind", 1), ("doc_id", 1)])
+        await rag_ingest_jobs_collection.create_index(
+            "finished_at", expireAfterSeconds=JOB_TTL_SECONDS
+        )
+
+        # Shared cache tier (entries expire at their own expires_at)
+        await cache_entries_collection.create_index([("namespace", 1), ("key", 1)], unique=True)
+        await cache_entries_collection.create_index([("namespace", 1), ("tags", 1)])
+        await cache_entries_collection.create_index("expires_at", expireAfterSeconds=0)
         
         print("✅ Database indexes created successfully")
     except Exception as e:
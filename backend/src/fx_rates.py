@@ -0,0 +1,249 @@
+"""
+Local exchange-rate table
+File: src/fx_rates.py
+
+Instead of downloading a full rates table from exchangerate-api for every
+conversion, one table (all currencies against FX_BASE_CURRENCY) is
+refreshed in the background every FX_REFRESH_SECONDS and kept in memory as
+a numpy array indexed by currency code. Any cross rate is then
+
+    rate(A -> B) = units of B per base / units of A per base
+
+computed locally, and a batch of amounts times a set of target currencies
+is one outer product.
+
+Every refresh is written to a snapshot file (FX_SNAPSHOT_PATH), which is
+loaded on startup: conversions keep working from the last known rates when
+the rates API cannot be reached.
+
+Metrics: fx.refresh timing and fx.refresh.errors, fx.snapshot.loaded, and
+fx.table_age_seconds (recorded on every refresh attempt).
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src import http_client
+from src.metrics import metrics
+from src.singleflight import SingleFlight
+
+BASE_CURRENCY = os.getenv("FX_BASE_CURRENCY", "USD").upper()
+RATES_URL = os.getenv("FX_RATES_URL", "https://api.exchangerate-api.com/v4/latest/{base}")
+REFRESH_SECONDS = float(os.getenv("FX_REFRESH_SECONDS", "3600"))
+RETRY_SECONDS = float(os.getenv("FX_RETRY_SECONDS", "60"))
+SNAPSHOT_PATH = os.getenv("FX_SNAPSHOT_PATH", "data/fx_rates.json")
+
+# Active ISO 4217 codes, for recognizing currencies before a table is loaded
+ISO_CODES = frozenset("""
+    AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL
+    BSD BTN BWP BYN BZD CAD CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP
+    ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR
+    IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT LAK LBP LKR LRD LSL
+    LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR
+    NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD
+    SHP SLE SLL SOS SRD SSP STN SVC SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH
+    UGX USD UYU UZS VES VND VUV WST XAF XCD XOF XPF YER ZAR ZMW ZWL
+""".split())
+
+
+class UnknownCurrency(KeyError):
+    """A currency code that is not in the rate table"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+    def __str__(self) -> str:
+        return f"Unknown currency '{self.code}'"
+
+
+class RateTable:
+    """Rates of every currency against one base, as a float64 array"""
+
+    def __init__(self, base: str, rates: Dict[str, float], updated_at: float):
+        self.base = base
+        self.codes = tuple(sorted(code.upper() for code in rates))
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        upper = {code.upper(): value for code, value in rates.items()}
+        self.rates = np.array([upper[code] for code in self.codes], dtype=np.float64)
+        self.updated_at = updated_at
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.updated_at
+
+    def position(self, code: str) -> int:
+        try:
+            return self.index[code.strip().upper()]
+        except KeyError:
+            raise UnknownCurrency(code.strip().upper()) from None
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """Units of to_currency per unit of from_currency"""
+        return float(self.rates[self.position(to_currency)] / self.rates[self.position(from_currency)])
+
+    def convert(self, amounts: Iterable[float], from_currency: str, to_currencies: Sequence[str]) -> np.ndarray:
+        """
+        Convert several amounts into several currencies at once.
+
+        Returns:
+            Array of shape (len(amounts), len(to_currencies))
+        """
+        targets = self.rates[[self.position(code) for code in to_currencies]]
+        factors = targets / self.rates[self.position(from_currency)]
+        return np.outer(np.asarray(list(amounts), dtype=np.float64), factors)
+
+    def to_snapshot(self) -> dict:
+        return {
+            "base": self.base,
+            "updated_at": self.updated_at,
+            "rates": dict(zip(self.codes, self.rates.tolist())),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "RateTable":
+        return cls(snapshot["base"], snapshot["rates"], float(snapshot["updated_at"]))
+
+
+_table: Optional[RateTable] = None
+_refresher: Optional[asyncio.Task] = None
+_refresh_flight = SingleFlight("fx.refresh")
+
+
+def _read_snapshot() -> Optional[RateTable]:
+    try:
+        with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+            return RateTable.from_snapshot(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Ignoring unreadable FX snapshot {SNAPSHOT_PATH}: {e}")
+        return None
+
+
+async def _load_snapshot() -> Optional[RateTable]:
+    table = await asyncio.to_thread(_read_snapshot)
+    if table is not None:
+        metrics.incr("fx.snapshot.loaded")
+    return table
+
+
+def _write_snapshot(table: RateTable) -> None:
+    directory = os.path.dirname(SNAPSHOT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{SNAPSHOT_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table.to_snapshot(), f)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+
+async def _fetch() -> RateTable:
+    response = await http_client.get(RATES_URL.format(base=BASE_CURRENCY))
+    response.raise_for_status()
+    data = response.json()
+    rates = {code: float(value) for code, value in data["rates"].items() if value}
+    rates[BASE_CURRENCY] = 1.0
+    # Age counts from our download: the provider itself only updates the rates about daily
+    return RateTable(BASE_CURRENCY, rates, time.time())
+
+
+async def refresh() -> RateTable:
+    """Download a fresh table, install it and persist it as the snapshot"""
+
+    async def load():
+        global _table
+        try:
+            with metrics.timer("fx.refresh"):
+                table = await _fetch()
+        except Exception:
+            metrics.incr("fx.refresh.errors")
+            raise
+        _table = table
+        try:
+            await asyncio.to_thread(_write_snapshot, table)
+        except OSError as e:
+            print(f"⚠️ Could not write FX snapshot {SNAPSHOT_PATH}: {e}")
+        return table
+
+    return await _refresh_flight.do("refresh", load)
+
+
+async def get_table() -> RateTable:
+    """
+    The current rate table. Loaded from the snapshot, or downloaded, if
+    nothing is in memory yet; a stale table is refreshed in place unless
+    the background refresher is running.
+
+    Raises:
+        Exception: if there is no table in memory or on disk and the download fails
+    """
+    global _table
+    if _table is None:
+        _table = await _load_snapshot()
+    if _table is None:
+        return await refresh()
+    if _refresher is None and _table.age_seconds > REFRESH_SECONDS:
+        try:
+            return await refresh()
+        except Exception as e:
+            print(f"⚠️ FX refresh failed, using rates from {_table.age_seconds / 3600:.1f} h ago: {e}")
+    return _table
+
+
+async def _refresh_loop() -> None:
+    while True:
+        # A recent snapshot (or refresh) is good until it is REFRESH_SECONDS old
+        if _table is not None and _table.age_seconds < REFRESH_SECONDS:
+            await asyncio.sleep(REFRESH_SECONDS - _table.age_seconds)
+        try:
+            await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ FX refresh failed, retrying in {RETRY_SECONDS:g} s: {e}")
+            await asyncio.sleep(RETRY_SECONDS)
+        if _table is not None:
+            metrics.record("fx.table_age_seconds", _table.age_seconds)
+
+
+async def start_refresher() -> None:
+    """Load the snapshot and refresh the table on the running loop every REFRESH_SECONDS"""
+    global _table, _refresher
+    if _refresher is not None:
+        return
+    if _table is None:
+        _table = await _load_snapshot()
+    _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_refresher() -> None:
+    global _refresher
+    if _refresher is None:
+        return
+    _refresher.cancel()
+    await asyncio.gather(_refresher, return_exceptions=True)
+    _refresher = None
+
+
+def is_known_currency(code: str) -> bool:
+    """Whether `code` is in the current rate table (or, before one is loaded, in ISO 4217)"""
+    code = code.strip().upper()
+    if _table is not None:
+        return code in _table.index
+    return code in ISO_CODES
+
+
+def parse_codes(value) -> List[str]:
+    """'EUR, inr' or ['EUR', 'INR'] -> ['EUR', 'INR']"""
+    if isinstance(value, str):
+        value = value.replace(",", " ").split()
+    return [str(code).strip().upper() for code in value if str(code).strip()]
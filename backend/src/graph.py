@@ -15,11 +15,19 @@ from src.tools.rag_tool import (
     delete_all_user_files
 )
 from src.agents.study_agent import StudyAgent
-from langchain_openai import ChatOpenAI
+from src.agents.code_agent import CodeAgent
+from src.agents.orchestrator import Orchestrator, DIRECT_TOOLS, STUDY_AGENT, CODE_AGENT
+from src.metrics import metrics
+from src.tool_executor import ParallelToolNode
+from src import tool_selection
+from src.llm_registry import get_chat_model
+from src.memory import TOOL_RESULT_MARKER
 from langgraph.graph import StateGraph, MessagesState
-from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 import os
+import time
+import uuid
+from typing import Optional, Tuple
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -43,7 +51,7 @@ def format_messages_for_api(messages):
                 formatted.append({"role": "system", "content": msg.content})
         elif isinstance(msg, ToolMessage):
             # Skip tool messages or include them as system messages
-            formatted.append({"role": "system", "content": f"Tool result: {'tool called'}"})
+            formatted.append({"role": "system", "content": TOOL_RESULT_MARKER})
         elif isinstance(msg, dict):
             # Already a dict, ensure it has role and content
             if "role" in msg and "content" in msg and msg["content"]:  # Check if content is not empty
@@ -78,12 +86,46 @@ def convert_api_messages_to_langchain(messages):
     return langchain_messages
 
 
+# Characters of a tool result included in streamed tool_end events
+TOOL_OUTPUT_PREVIEW_CHARS = 500
+
+# Model for coding requests (the tool-calling agent uses the DevGraph model)
+CODE_AGENT_MODEL = os.getenv("CODE_AGENT_MODEL", "gpt-4o")
+
+# Nodes whose LLM output is the answer, streamed as tokens
+ANSWER_NODES = ("study_agent", "code_agent")
+
+# Direct tool results that mean the tool could not answer; the agent takes over
+DIRECT_FAILURES = ("Invalid", "Calculation error", "Conversion failed")
+DIRECT_CALL_PREFIX = "direct-"
+
+
+class DevState(MessagesState):
+    user_id: Optional[str]
+    route: str
+    route_args: Optional[dict]
+    # Tool groups bound for the study agent (None = all tools)
+    tool_groups: Optional[Tuple[str, ...]]
+
+
+def last_user_text(messages) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else ""
+    return ""
+
+
+def direct_answer_text(route: str, args: dict, result: str) -> str:
+    if route == "time":
+        return f"The current time is {result}."
+    if route == "calculator":
+        return f"{args['expression']} = {result}"
+    return result
+
+
 class DevGraph:
     def __init__(self, model_name: str = "gpt-4o-mini"):
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self.llm = get_chat_model(model_name)
         
         # Add RAG tools to the tools list
         self.tools = [
@@ -111,7 +153,15 @@ class DevGraph:
             # If binding fails (different runtime versions), fall back to raw llm
             self.llm_with_tools = self.llm
 
-        self.tool_node = ToolNode(self.tools)
+        # Runs a turn's tool calls concurrently, with per-tool deadlines
+        self.tool_node = ParallelToolNode(self.tools)
+
+        # Binds only the tools a request needs; variants are cached per subset
+        self.tool_selector = tool_selection.ToolSelector(self.llm, self.tools)
+
+        # Cheap rule-based routing at the graph entry
+        self.orchestrator = Orchestrator()
+        self.code_agent = CodeAgent(CODE_AGENT_MODEL)
         
         # Build graph once during initialization (thread-safe, stateless)
         self.compiled_graph = self._build()
@@ -119,20 +169,63 @@ class DevGraph:
         # Store user_id for context (thread-local)
         self.current_user_id = None
 
+    async def _route(self, state):
+        """Entry node: classify the latest user message"""
+        route, args = self.orchestrator.classify(last_user_text(state["messages"]))
+        groups = None
+        if route == STUDY_AGENT and tool_selection.ENABLED:
+            groups = await tool_selection.select_groups(state["messages"], state.get("user_id"))
+        return {"route": route, "route_args": args, "tool_groups": groups}
+
+    async def _direct_call(self, state):
+        """Ask for the routed tool as if the agent had, without an LLM call"""
+        route = state["route"]
+        call = {"name": DIRECT_TOOLS[route], "args": state["route_args"] or {},
+                "id": f"{DIRECT_CALL_PREFIX}{uuid.uuid4().hex}"}
+        return {"messages": [AIMessage(content="", tool_calls=[call])]}
+
+    def _after_tools(self, state):
+        """Direct calls that succeeded are answered as is; everything else goes back to the agent"""
+        messages = state["messages"]
+        result = messages[-1]
+        call_message = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        direct = call_message is not None and any(
+            c["id"].startswith(DIRECT_CALL_PREFIX) for c in call_message.tool_calls
+        )
+        if (direct and isinstance(result, ToolMessage) and result.status != "error"
+                and not str(result.content).startswith(DIRECT_FAILURES)):
+            return "direct_answer"
+        return "study_agent"
+
+    async def _direct_answer(self, state):
+        result = state["messages"][-1]
+        text = direct_answer_text(state["route"], state["route_args"] or {}, str(result.content))
+        return {"messages": [AIMessage(content=text)]}
+
     def _build(self):
         """Build the graph once - reused for all requests"""
         # pass the class, not an instance
-        graph = StateGraph(MessagesState)
+        graph = StateGraph(DevState)
 
         # Agents
         # Give the agent the tool-aware LLM when available
-        study_agent = StudyAgent(self.llm_with_tools)
+        study_agent = StudyAgent(self.llm_with_tools, tool_selector=self.tool_selector)
 
         # Nodes
+        graph.add_node("router", self._route)
+        graph.add_node("direct_call", self._direct_call)
+        graph.add_node("direct_answer", self._direct_answer)
+        graph.add_node("code_agent", self.code_agent.run)
         graph.add_node("study_agent", study_agent.run)
-        graph.add_node("tool_node", self.tool_node)
+        graph.add_node("tool_node", self.tool_node.run)
+
+        graph.set_entry_point("router")
 
-        graph.set_entry_point("study_agent")
+        # Trivial requests call their tool directly, code goes to the code agent,
+        # everything else to the tool-calling agent
+        routes = {route: "direct_call" for route in DIRECT_TOOLS}
+        routes.update({CODE_AGENT: "code_agent", STUDY_AGENT: "study_agent"})
+        graph.add_conditional_edges("router", lambda state: state["route"], routes)
 
         graph.add_conditional_edges(
             "study_agent",
@@ -143,7 +236,14 @@ class DevGraph:
             },
         )
 
-        graph.add_edge("tool_node", "study_agent")
+        graph.add_edge("direct_call", "tool_node")
+        graph.add_conditional_edges(
+            "tool_node",
+            self._after_tools,
+            {"direct_answer": "direct_answer", "study_agent": "study_agent"},
+        )
+        graph.add_edge("direct_answer", "__end__")
+        graph.add_edge("code_agent", "__end__")
         return graph.compile()
     
     async def invoke(self, input_data):
@@ -164,15 +264,72 @@ class DevGraph:
         
         # Invoke the compiled graph (each call gets its own state)
         # The graph is stateless - all data flows through input_data
+        input_count = len(input_data.get("messages") or [])
+        start = time.perf_counter()
         result = await self.compiled_graph.ainvoke(input_data)
+        metrics.observe(f"route.{result.get('route', STUDY_AGENT)}", time.perf_counter() - start)
         
-        # Convert output messages back to API format
+        # Convert output messages back to API format; new_messages are the
+        # ones this run added after the input (tool results, the answer)
         if isinstance(result, dict) and "messages" in result:
+            result["new_messages"] = format_messages_for_api(result["messages"][input_count:])
             result["messages"] = format_messages_for_api(result["messages"])
         
         return result
 
 
+    async def stream(self, input_data):
+        """Stream a graph run as simple event dicts
+
+        Yields, in order of arrival:
+            {"type": "tool_start", "name", "input"}
+            {"type": "tool_end", "name", "output"}
+            {"type": "token", "content"}      (assistant text, as generated)
+            {"type": "final", "messages", "new_messages"}
+                                              (once, API-format messages; new_messages
+                                               are the ones added after the input)
+        """
+        user_id = input_data.get("user_id")
+        if user_id:
+            from src.tools.rag_tool import set_user_context
+            set_user_context(user_id)
+
+        if "messages" in input_data:
+            input_data["messages"] = convert_api_messages_to_langchain(input_data["messages"])
+        input_count = len(input_data.get("messages") or [])
+        start = time.perf_counter()
+
+        async for event in self.compiled_graph.astream_events(input_data, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                # Only the agents' own answers; LLM calls made inside tools are not streamed
+                if event.get("metadata", {}).get("langgraph_node") not in ANSWER_NODES:
+                    continue
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield {"type": "token", "content": content}
+            elif kind == "on_tool_start":
+                yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                output = event["data"].get("output")
+                output = getattr(output, "content", output)
+                yield {"type": "tool_end", "name": event["name"], "output": str(output)[:TOOL_OUTPUT_PREVIEW_CHARS]}
+            elif kind == "on_chain_end" and event["name"] == "direct_answer":
+                # Direct answers come from a tool, not a model: send them as one token
+                for message in (event["data"].get("output") or {}).get("messages", []):
+                    yield {"type": "token", "content": message.content}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # End of the whole graph run
+                output = event["data"].get("output") or {}
+                metrics.observe(f"route.{output.get('route', STUDY_AGENT)}", time.perf_counter() - start)
+                messages = output.get("messages", [])
+                yield {
+                    "type": "final",
+                    "messages": format_messages_for_api(messages),
+                    "new_messages": format_messages_for_api(messages[input_count:]),
+                }
+
+
 # Create single instance - safe for multiple concurrent users
 # because each invoke() call gets its own state from input_data
 dev_graph = DevGraph()
@@ -0,0 +1,140 @@
+"""
+Shared outbound HTTP client for the tools
+File: src/http_client.py
+
+Every upstream host (weather, exchange rates, search, Supabase storage, ...)
+gets one long-lived httpx.AsyncClient, so connections are kept alive and
+reused across tool calls instead of being opened (with DNS, TCP and TLS
+setup) per request. Requests have timeouts and are retried on connection
+errors, timeouts and 429/5xx answers, with exponential backoff and full
+jitter.
+
+Per upstream host, metrics get http.<host>.requests / .errors / .retries
+counters and an http.<host> latency timing.
+"""
+
+import asyncio
+import os
+import random
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.metrics import metrics
+
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+# Below the number of requests in flight, released connections get closed and reopened
+MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "20"))
+KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.2"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_MAX_SECONDS", "2"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+_lock = threading.Lock()
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Pooled client for the host of `url`"""
+    origin = _origin(url)
+    client = _clients.get(origin)
+    if client is None:
+        with _lock:
+            client = _clients.get(origin)
+            if client is None:
+                client = _clients[origin] = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS_PER_HOST,
+                        max_keepalive_connections=MAX_KEEPALIVE_PER_HOST,
+                        keepalive_expiry=KEEPALIVE_SECONDS,
+                    ),
+                    timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                )
+    return client
+
+
+def backoff_seconds(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff; honours a numeric Retry-After up to the cap"""
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_BACKOFF_SECONDS * 2 ** attempt, RETRY_BACKOFF_MAX_SECONDS))
+
+
+async def request(method: str, url: str, *, retries: Optional[int] = None, idempotent: Optional[bool] = None,
+                  **kwargs) -> httpx.Response:
+    """
+    Send a request through the shared pool of the url's host.
+
+    Args:
+        method: HTTP method
+        url: Absolute URL
+        retries: Retry attempts after the first (default HTTP_RETRIES)
+        idempotent: Whether the request may be retried; defaults to True
+            for GET/HEAD/OPTIONS/PUT/DELETE
+        **kwargs: Passed to httpx (params, json, headers, timeout, ...)
+
+    Returns:
+        The last response; retryable statuses are returned once retries run out
+
+    Raises:
+        httpx.HTTPError: if the request still fails after the retries
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    attempts = (1 + (RETRIES if retries is None else retries)) if idempotent else 1
+    host = urlsplit(url).hostname or "unknown"
+    client = get_client(url)
+
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        metrics.incr(f"http.{host}.requests")
+        try:
+            with metrics.timer(f"http.{host}"):
+                response = await client.request(method, url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException):
+            metrics.incr(f"http.{host}.errors")
+            if last:
+                raise
+            delay = backoff_seconds(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            metrics.incr(f"http.{host}.errors")
+            if last:
+                return response
+            delay = backoff_seconds(attempt, response.headers.get("Retry-After"))
+        metrics.incr(f"http.{host}.retries")
+        await asyncio.sleep(delay)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+async def close_clients() -> None:
+    """Close every pooled client (on shutdown)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,233 @@
+"""
+Shared OpenAI clients
+File: src/llm_registry.py
+
+One place that hands out long-lived model clients instead of building a
+ChatOpenAI (and with it a fresh connection pool and TLS handshake) on
+every call:
+
+  - `get_chat_model(model, **options)`: a ChatOpenAI per (model, options),
+    created once and reused; supports invoke/ainvoke/stream/bind_tools
+  - `get_openai_client()`: an AsyncOpenAI client for the non-chat APIs
+    (transcription, text to speech)
+  - `get_http_client()` / `get_async_http_client()`: the pooled httpx
+    clients behind all of the above, for other OpenAI wrappers such as
+    OpenAIEmbeddings
+
+All clients share one sync and one async httpx pool, with keep-alive and
+HTTP/2 (LLM_HTTP2; the `h2` package comes with httpx[http2] in
+requirements.txt). Requests, errors and latency are counted per model in
+metrics as llm.<model>.requests / .errors and the llm.<model> timing.
+
+Async, non-streaming chat calls with the same model settings, messages
+and bound tools that overlap in time are sent once (src/singleflight.py);
+joined calls are counted as singleflight.llm.<model>.coalesced and do not
+add to the token counters. Streamed calls always go upstream, since each
+caller needs its own token stream.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_openai import ChatOpenAI
+
+from src.cache import make_key
+from src.metrics import metrics
+from src.singleflight import SingleFlight
+
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_openai_client = None
+_chat_models: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], ChatOpenAI] = {}
+_flights: Dict[str, SingleFlight] = {}
+
+
+def _http2_available() -> bool:
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("⚠️ LLM_HTTP2 is on but the h2 package is not installed; using HTTP/1.1")
+        return False
+
+
+def _client_options() -> dict:
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        ),
+        "timeout": httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(**_client_options())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(**_client_options())
+        return _async_http_client
+
+
+@contextmanager
+def track(model: str):
+    """Count and time one request to `model` (for calls made without a chat model)"""
+    metrics.incr(f"llm.{model}.requests")
+    try:
+        with metrics.timer(f"llm.{model}"):
+            yield
+    except Exception:
+        metrics.incr(f"llm.{model}.errors")
+        raise
+
+
+class ModelMetricsCallback(BaseCallbackHandler):
+    """Records requests, errors, latency and token usage of one chat model"""
+
+    # Cheap and thread-safe: no need to hop to an executor in async runs
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        metrics.incr(f"llm.{self.model}.requests")
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            metrics.observe(f"llm.{self.model}", time.perf_counter() - start)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens"):
+            metrics.incr(f"llm.{self.model}.prompt_tokens", usage["prompt_tokens"])
+        if usage.get("completion_tokens"):
+            metrics.incr(f"llm.{self.model}.completion_tokens", usage["completion_tokens"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+        metrics.incr(f"llm.{self.model}.errors")
+
+
+def _message_key(message: BaseMessage) -> tuple:
+    # Message ids differ per run and do not change the answer
+    return (
+        message.type, message.content, getattr(message, "tool_calls", None),
+        getattr(message, "tool_call_id", None), message.name,
+    )
+
+
+class CoalescingChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose identical concurrent (non-streaming) requests share one API call"""
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        generate = super()._agenerate
+        if not COALESCE or self.streaming:
+            return await generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        flight = _flights.get(self.model_name)
+        if flight is None:
+            flight = _flights.setdefault(self.model_name, SingleFlight(f"llm.{self.model_name}"))
+        key = make_key(self._default_params, [_message_key(m) for m in messages], stop, kwargs)
+        leader = []
+
+        async def call():
+            leader.append(True)
+            return await generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        result = await flight.do(key, call)
+        # Every caller gets its own copy: LangChain sets run ids on the messages
+        result = result.model_copy(deep=True)
+        if not leader and result.llm_output:
+            result.llm_output = {**result.llm_output, "token_usage": {}}
+        return result
+
+
+def get_chat_model(model: str = "gpt-4o-mini", **options: Any) -> ChatOpenAI:
+    """
+    Shared chat model for `model` and `options` (e.g. temperature).
+
+    Args:
+        model: OpenAI model name
+        **options: Extra ChatOpenAI fields; each distinct set gets its own instance
+
+    Returns:
+        A ChatOpenAI that reuses the pooled HTTP clients
+    """
+    key = (model, tuple(sorted(options.items())))
+    chat_model = _chat_models.get(key)
+    if chat_model is not None:
+        return chat_model
+
+    http_client = get_http_client()
+    async_http_client = get_async_http_client()
+    with _lock:
+        chat_model = _chat_models.get(key)
+        if chat_model is None:
+            chat_model = CoalescingChatOpenAI(
+                model=model,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                http_async_client=async_http_client,
+                callbacks=[ModelMetricsCallback(model)],
+                **options,
+            )
+            _chat_models[key] = chat_model
+        return chat_model
+
+
+def get_openai_client():
+    """Shared AsyncOpenAI client for the audio and other non-chat endpoints"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+
+        http_client = get_async_http_client()
+        with _lock:
+            if _openai_client is None:
+                _openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    return _openai_client
+
+
+async def close_clients() -> None:
+    """Close the shared HTTP pools (on shutdown)"""
+    global _http_client, _async_http_client, _openai_client
+    with _lock:
+        http_client, async_http_client = _http_client, _async_http_client
+        _http_client = _async_http_client = _openai_client = None
+        _chat_models.clear()
+    if http_client is not None:
+        http_client.close()
+    if async_http_client is not None:
+        await async_http_client.aclose()
@@ -0,0 +1,264 @@
+"""
+Conversation memory: recent turns verbatim, older turns summarized
+File: src/memory.py
+
+A turn is a user message and everything that follows it up to the next
+user message. For each run:
+
+  - `build_context` gives the graph the stored summary of the older turns
+    (as a system message) followed by the last RECENT_TURNS turns verbatim;
+  - after the turn is saved, `schedule_update` folds the turns that left
+    the window into the summary in the background, with one small LLM call
+    over the previous summary and just those turns. The summary is stored
+    on the conversation as memory = {summary, summarized_count, ...};
+  - before every LLM call, `fit_to_budget` trims the prompt to
+    PROMPT_TOKENS (tiktoken count): the oldest turns are dropped first and
+    the current turn's tool results are cut last.
+
+Turns that have left the window but are not summarized yet (the update is
+still running, or failed) are passed verbatim, so nothing is lost.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src import conversations
+from src.cache import LRUCache
+from src.llm_registry import get_chat_model
+from src.metrics import metrics
+from src.rag.chunker import get_encoding
+
+RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "6"))
+PROMPT_TOKENS = int(os.getenv("MEMORY_PROMPT_TOKENS", "8000"))
+SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", "300"))
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Characters of one message included in the summarization prompt
+TRANSCRIPT_MESSAGE_CHARS = 2000
+# Tool results are never cut below this many tokens
+MIN_TOOL_RESULT_TOKENS = 64
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+# Stored in place of each tool result (see graph.format_messages_for_api); it
+# only tells the UI a tool ran and is left out of the model's context
+TOOL_RESULT_MARKER = "Tool result: tool called"
+TRUNCATION_MARK = " ...[truncated]"
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a user and an AI assistant.
+Update the summary with the new messages below. Keep facts, decisions, user preferences,
+names, numbers, file names and open questions; drop small talk. Use at most {words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+_updates: Dict[str, asyncio.Task] = {}
+
+
+# ---------------------------------------------------------
+# Turns and the context window
+# ---------------------------------------------------------
+def turn_starts(messages: List[dict]) -> List[int]:
+    """Indices of the user messages that start each turn"""
+    return [i for i, m in enumerate(messages) if m.get("role") == "user"]
+
+
+def window_start(messages: List[dict], recent_turns: int = RECENT_TURNS) -> int:
+    """Index of the first message of the last `recent_turns` turns"""
+    starts = turn_starts(messages)
+    if len(starts) <= recent_turns:
+        return 0
+    return starts[len(starts) - recent_turns]
+
+
+def is_tool_marker(message: dict) -> bool:
+    return message.get("role") == "system" and message.get("content") == TOOL_RESULT_MARKER
+
+
+def build_context(history: List[dict], memory: Optional[dict], recent_turns: int = RECENT_TURNS) -> List[dict]:
+    """
+    Messages to send to the graph in place of the full history.
+
+    Args:
+        history: Stored messages, oldest first
+        memory: The conversation's stored memory (may be empty)
+
+    Returns:
+        The summary as a system message (if there is one) and the messages
+        after what it covers, but at least the last `recent_turns` turns,
+        without the tool result markers
+    """
+    memory = memory or {}
+    summary = memory.get("summary")
+    start = 0
+    context = []
+    if summary:
+        start = min(memory.get("summarized_count", 0), window_start(history, recent_turns))
+        context.append({"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"})
+    return context + [m for m in history[start:] if not is_tool_marker(m)]
+
+
+# ---------------------------------------------------------
+# Prompt budget
+# ---------------------------------------------------------
+# Token counts of recently seen texts, keyed by digest and length so that
+# the cache does not keep large tool results and excerpts alive
+_token_counts = LRUCache(max_entries=4096, ttl_seconds=24 * 3600)
+
+
+def _text_tokens(text: str) -> int:
+    key = (hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(), len(text))
+    count = _token_counts.get(key)
+    if count is None:
+        count = len(get_encoding().encode_ordinary(text))
+        _token_counts.set(key, count)
+    return count
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = MESSAGE_OVERHEAD_TOKENS + _text_tokens(content)
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += _text_tokens(call["name"] + json.dumps(call.get("args", {})))
+    return tokens
+
+
+def _cut_tool_results(turn: List[BaseMessage], room: int) -> List[BaseMessage]:
+    """Shorten the largest tool results of `turn` until it fits `room` tokens"""
+    turn = list(turn)
+    excess = sum(message_tokens(m) for m in turn) - room
+    order = sorted(
+        (i for i, m in enumerate(turn) if isinstance(m, ToolMessage) and isinstance(m.content, str)),
+        key=lambda i: message_tokens(turn[i]), reverse=True,
+    )
+    encoding = get_encoding()
+    mark_tokens = _text_tokens(TRUNCATION_MARK)
+    for i in order:
+        if excess <= 0:
+            break
+        tokens = encoding.encode_ordinary(turn[i].content)
+        keep = max(len(tokens) - excess - mark_tokens, MIN_TOOL_RESULT_TOKENS)
+        if keep >= len(tokens):
+            continue
+        turn[i] = turn[i].model_copy(update={"content": encoding.decode(tokens[:keep]) + TRUNCATION_MARK})
+        excess -= len(tokens) - keep - mark_tokens
+    return turn
+
+
+def fit_to_budget(messages: List[BaseMessage], budget: int = PROMPT_TOKENS) -> List[BaseMessage]:
+    """
+    Trim a prompt to `budget` tokens.
+
+    Leading system messages (instructions, the memory summary) and the
+    current turn are always kept; earlier turns are kept newest first while
+    they fit. If the current turn alone is too large, its longest tool
+    results are cut.
+    """
+    lead = 0
+    while lead < len(messages) and isinstance(messages[lead], SystemMessage):
+        lead += 1
+    head, rest = messages[:lead], messages[lead:]
+
+    turns: List[List[BaseMessage]] = []
+    for message in rest:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    if not turns:
+        return list(messages)
+
+    remaining = budget - sum(message_tokens(m) for m in head)
+    current = turns[-1]
+    current_tokens = sum(message_tokens(m) for m in current)
+    if current_tokens > remaining:
+        current = _cut_tool_results(current, remaining)
+        current_tokens = sum(message_tokens(m) for m in current)
+    remaining -= current_tokens
+
+    kept: List[List[BaseMessage]] = []
+    for turn in reversed(turns[:-1]):
+        tokens = sum(message_tokens(m) for m in turn)
+        if tokens > remaining:
+            break
+        kept.append(turn)
+        remaining -= tokens
+    dropped = len(turns) - 1 - len(kept)
+
+    if dropped:
+        metrics.incr("memory.turns_dropped", dropped)
+    metrics.record("memory.prompt_tokens", budget - remaining)
+    return head + [m for turn in reversed(kept) for m in turn] + current
+
+
+# ---------------------------------------------------------
+# Rolling summary
+# ---------------------------------------------------------
+def _transcript(messages: List[dict]) -> str:
+    lines = []
+    for message in messages:
+        role = message.get("role")
+        if role not in ("user", "assistant"):
+            continue  # tool markers carry nothing worth keeping
+        content = str(message.get("content", ""))[:TRANSCRIPT_MESSAGE_CHARS]
+        lines.append(f"{'User' if role == 'user' else 'Assistant'}: {content}")
+    return "\n".join(lines)
+
+
+async def update_summary(user_id, conversation_id: str, llm=None) -> Optional[dict]:
+    """
+    Fold the turns that have left the recent window into the stored summary.
+
+    Returns:
+        The new memory, or None if there was nothing to fold
+    """
+    conversation = await conversations.load(user_id, conversation_id)
+    messages, memory = conversation["messages"], conversation["memory"] or {}
+    done = memory.get("summarized_count", 0)
+    end = window_start(messages)
+    if end <= done:
+        return None
+
+    transcript = _transcript(messages[done:end])
+    summary = memory.get("summary") or ""
+    if transcript:
+        llm = llm or get_chat_model(SUMMARY_MODEL)
+        with metrics.timer("memory.summary"):
+            response = await llm.ainvoke(SUMMARY_PROMPT.format(
+                words=SUMMARY_WORDS, summary=summary or "(none yet)", transcript=transcript,
+            ))
+        summary = response.content.strip()
+
+    memory = {"summary": summary, "summarized_count": end, "updated_at": datetime.utcnow()}
+    await conversations.set_memory(user_id, conversation_id, memory)
+    metrics.incr("memory.summary_updates")
+    return memory
+
+
+def schedule_update(user_id, conversation_id: str) -> None:
+    """Run update_summary in the background, at most once at a time per conversation"""
+    running = _updates.get(conversation_id)
+    if running is not None and not running.done():
+        return
+
+    async def run():
+        try:
+            await update_summary(user_id, conversation_id)
+        except Exception as e:
+            metrics.incr("memory.summary_errors")
+            print(f"⚠️ Could not update memory of conversation {conversation_id}: {e}")
+        finally:
+            _updates.pop(conversation_id, None)
+
+    _updates[conversation_id] = asyncio.create_task(run())
@@ -0,0 +1,82 @@
+"""
+In-process counters and latency statistics
+File: src/metrics.py
+
+Lightweight instrumentation shared by the backend modules. Values are
+per process and reset on restart; `/metrics` in main.py exposes a snapshot.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._values: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Add `value` to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration sample"""
+        with self._lock:
+            stats = self._timings.get(name)
+            if stats is None:
+                stats = self._timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+
+    def record(self, name: str, value: float) -> None:
+        """Record one sample of a per-request quantity, e.g. prompt tokens"""
+        with self._lock:
+            stats = self._values.get(name)
+            if stats is None:
+                stats = self._values[name] = {"count": 0, "total": 0.0, "max": value}
+            stats["count"] += 1
+            stats["total"] += value
+            stats["max"] = max(stats["max"], value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time the enclosed block with `observe`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """Counters, count / avg_ms / max_ms for every timing and count / avg / max for every value"""
+        with self._lock:
+            timings = {
+                name: {
+                    "count": int(stats["count"]),
+                    "avg_ms": round(stats["total"] / stats["count"] * 1000, 2) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max"] * 1000, 2),
+                }
+                for name, stats in self._timings.items()
+            }
+            values = {
+                name: {
+                    "count": int(stats["count"]),
+                    "avg": round(stats["total"] / stats["count"], 2) if stats["count"] else 0.0,
+                    "max": stats["max"],
+                }
+                for name, stats in self._values.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings, "values": values}
+
+
+metrics = Metrics()
@@ -0,0 +1,159 @@
+"""
+Persistent per-user BM25 inverted index over document chunks
+File: src/rag/bm25.py
+
+Index layout in MongoDB (rag_postings):
+    one record per (user_id, doc_id, term). `postings` is a packed int32
+    array of (ordinal, tf, chunk_length) rows.
+    one record per (user_id, doc_id) under DOC_STATS_TERM with the
+    document's chunk and token counts, used for IDF and average length.
+
+A document's index is only its own records, so storing or removing it is
+one insert or one delete, and the corpus totals are summed from the stats
+records at query time: there is no running total that a crash or a
+duplicate write could leave wrong.
+
+Ranking only touches the postings of the query terms, never chunk text.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+from bson import Binary
+
+from src.db import rag_postings_collection
+from src.rag.embeddings import STOPWORDS
+
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Term of the per-document stats records; tokens are never empty
+DOC_STATS_TERM = ""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def build_postings(chunks: List[str]) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Build term -> (n, 3) int32 postings for a list of chunks.
+
+    Returns the postings and the total token count of the chunks.
+    """
+    raw: Dict[str, List[Tuple[int, int, int]]] = {}
+    total = 0
+    for ordinal, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        length = len(tokens)
+        total += length
+        for term, tf in Counter(tokens).items():
+            raw.setdefault(term, []).append((ordinal, tf, length))
+    postings = {term: np.asarray(rows, dtype=np.int32) for term, rows in raw.items()}
+    return postings, total
+
+
+async def store_postings(user_id: str, doc_id, postings: Dict[str, np.ndarray], chunk_count: int, total_tokens: int) -> None:
+    """
+    Index one document's postings (from `build_postings`), replacing any
+    it already had, so re-running it after an interrupted attempt is safe.
+    """
+    records = [
+        {
+            "user_id": user_id,
+            "doc_id": doc_id,
+            "term": term,
+            "df": int(rows.shape[0]),
+            "postings": Binary(rows.tobytes()),
+        }
+        for term, rows in postings.items()
+    ]
+    records.append({
+        "user_id": user_id,
+        "doc_id": doc_id,
+        "term": DOC_STATS_TERM,
+        "chunk_count": chunk_count,
+        "total_tokens": total_tokens,
+    })
+    await rag_postings_collection.delete_many({"doc_id": doc_id})
+    await rag_postings_collection.insert_many(records, ordered=False)
+
+
+async def remove_document(doc_id) -> None:
+    """Remove one document from the index"""
+    await rag_postings_collection.delete_many({"doc_id": doc_id})
+
+
+async def remove_user(user_id: str) -> None:
+    """Drop the whole index of a user"""
+    await rag_postings_collection.delete_many({"user_id": user_id})
+
+
+async def search(user_id: str, query: str, doc_sizes: Dict, top_k: int = 5) -> List[Tuple[object, int, float]]:
+    """
+    Rank chunks of the given documents against `query` with BM25.
+
+    Args:
+        user_id: Owner of the index
+        query: Free-text query
+        doc_sizes: {doc_id: chunk_count} of the documents to score
+        top_k: Number of results
+
+    Returns:
+        List of (doc_id, ordinal, score), best first
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not doc_sizes:
+        return []
+
+    # Document frequency is taken over the user's whole corpus, so postings
+    # of every document are read for the (few) query terms, together with
+    # every document's stats record.
+    cursor = rag_postings_collection.find(
+        {"user_id": user_id, "term": {"$in": terms + [DOC_STATS_TERM]}},
+        {"_id": 0, "doc_id": 1, "term": 1, "df": 1, "postings": 1, "chunk_count": 1, "total_tokens": 1},
+    )
+    records = await cursor.to_list(length=None)
+    stats = [r for r in records if r["term"] == DOC_STATS_TERM]
+    records = [r for r in records if r["term"] != DOC_STATS_TERM]
+
+    n_chunks = sum(r["chunk_count"] for r in stats)
+    if n_chunks <= 0:
+        return []
+    avg_length = max(sum(r["total_tokens"] for r in stats) / n_chunks, 1.0)
+
+    df: Dict[str, int] = {}
+    for record in records:
+        df[record["term"]] = df.get(record["term"], 0) + record["df"]
+
+    scores: Dict[object, np.ndarray] = {}
+    for record in records:
+        doc_id = record["doc_id"]
+        if doc_id not in doc_sizes:
+            continue
+        rows = np.frombuffer(record["postings"], dtype=np.int32).reshape(-1, 3)
+        ordinals, tf, length = rows[:, 0], rows[:, 1].astype(np.float32), rows[:, 2]
+        term_df = df[record["term"]]
+        idf = np.log(1.0 + (n_chunks - term_df + 0.5) / (term_df + 0.5))
+        norm = K1 * (1.0 - B + B * length / avg_length)
+        doc_scores = scores.get(doc_id)
+        if doc_scores is None:
+            doc_scores = scores[doc_id] = np.zeros(doc_sizes[doc_id], dtype=np.float32)
+        # Ordinals are unique within one posting list, so fancy-index add is safe
+        valid = ordinals < doc_scores.shape[0]
+        doc_scores[ordinals[valid]] += (idf * tf * (K1 + 1.0) / (tf + norm))[valid]
+
+    results: List[Tuple[object, int, float]] = []
+    for doc_id, doc_scores in scores.items():
+        k = min(top_k, doc_scores.shape[0])
+        if k == 0:
+            continue
+        best = np.argpartition(doc_scores, -k)[-k:]
+        results.extend((doc_id, int(i), float(doc_scores[i])) for i in best if doc_scores[i] > 0)
+    results.sort(key=lambda r: r[2], reverse=True)
+    return results[:top_k]
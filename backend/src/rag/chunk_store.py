@@ -0,0 +1,141 @@
+"""
+Chunk storage for RAG documents
+File: src/rag/chunk_store.py
+
+Each chunk is its own record in `rag_chunks`, keyed by
+(user_id, doc_id, ordinal). `rag_documents` only keeps metadata plus a
+short text preview, so listing files never transfers document text and a
+large PDF can no longer exceed the 16 MB BSON limit.
+
+Documents written before this layout kept `chunks` and `extracted_text`
+inline; `migrate_document` / `migrate_all` move them over.
+
+Run the migration by hand with:
+    python -m src.rag.chunk_store
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+
+from src.db import rag_chunks_collection, rag_documents_collection
+
+# Marks documents whose chunks live in rag_chunks
+CHUNK_STORAGE = "collection"
+
+# Characters of extracted text kept inline for short-document summaries
+PREVIEW_CHARS = 8000
+
+INSERT_BATCH = 1000
+
+
+def document_text_fields(extracted_text: str) -> dict:
+    """Inline text fields stored on the rag_documents record"""
+    return {
+        "text_preview": extracted_text[:PREVIEW_CHARS],
+        "text_length": len(extracted_text),
+        "chunk_storage": CHUNK_STORAGE,
+    }
+
+
+async def store_chunks(user_id: str, doc_id, chunks: List[str]) -> None:
+    """Insert one record per chunk"""
+    for start in range(0, len(chunks), INSERT_BATCH):
+        await rag_chunks_collection.insert_many(
+            [
+                {"user_id": user_id, "doc_id": doc_id, "ordinal": start + i, "text": text}
+                for i, text in enumerate(chunks[start:start + INSERT_BATCH])
+            ],
+            ordered=False,
+        )
+
+
+async def load_all(doc_ids: List) -> Dict[object, List[str]]:
+    """Load every chunk of the given documents, in order"""
+    result: Dict[object, List[str]] = {doc_id: [] for doc_id in doc_ids}
+    cursor = rag_chunks_collection.find(
+        {"doc_id": {"$in": doc_ids}}, {"_id": 0, "doc_id": 1, "ordinal": 1, "text": 1}
+    ).sort([("doc_id", 1), ("ordinal", 1)])
+    async for record in cursor:
+        result[record["doc_id"]].append(record["text"])
+    return result
+
+
+async def load_first(doc_id, count: int) -> List[str]:
+    """Load the first `count` chunks of a document"""
+    cursor = rag_chunks_collection.find(
+        {"doc_id": doc_id, "ordinal": {"$lt": count}}, {"_id": 0, "text": 1}
+    ).sort("ordinal", 1)
+    return [record["text"] async for record in cursor]
+
+
+async def load_selected(user_id: str, hits: Iterable[Tuple[object, int]]) -> Dict[Tuple[object, int], str]:
+    """Load only the requested (doc_id, ordinal) chunks"""
+    hits = list(hits)
+    if not hits:
+        return {}
+    cursor = rag_chunks_collection.find(
+        {"user_id": user_id, "$or": [{"doc_id": d, "ordinal": o} for d, o in hits]},
+        {"_id": 0, "doc_id": 1, "ordinal": 1, "text": 1},
+    )
+    return {(r["doc_id"], r["ordinal"]): r["text"] async for r in cursor}
+
+
+async def delete_chunks(query: dict) -> None:
+    """Delete chunk records matching a filter such as {"doc_id": ...}"""
+    await rag_chunks_collection.delete_many(query)
+
+
+# ---------------------------------------------------------
+# Migration from inline chunks
+# ---------------------------------------------------------
+async def migrate_document(doc_id) -> bool:
+    """
+    Move one legacy document's inline chunks into rag_chunks.
+
+    Safe to re-run: chunks are replaced, and the inline fields are only
+    removed once the chunk records are written. Returns False if the
+    document was already migrated.
+    """
+    document = await rag_documents_collection.find_one(
+        {"_id": doc_id, "chunk_storage": {"$ne": CHUNK_STORAGE}},
+        {"user_id": 1, "chunks": 1, "extracted_text": 1},
+    )
+    if not document:
+        return False
+
+    chunks = document.get("chunks") or []
+    await rag_chunks_collection.delete_many({"doc_id": doc_id})
+    await store_chunks(document["user_id"], doc_id, chunks)
+    await rag_documents_collection.update_one(
+        {"_id": doc_id},
+        {
+            "$set": {**document_text_fields(document.get("extracted_text", "")), "chunk_count": len(chunks)},
+            "$unset": {"chunks": "", "extracted_text": ""},
+        },
+    )
+    return True
+
+
+async def migrate_all() -> int:
+    """Migrate every legacy document; returns the number migrated"""
+    cursor = rag_documents_collection.find(
+        {"chunk_storage": {"$ne": CHUNK_STORAGE}}, {"_id": 1}
+    )
+    doc_ids = [doc["_id"] async for doc in cursor]
+    migrated = 0
+    for doc_id in doc_ids:
+        migrated += await migrate_document(doc_id)
+    return migrated
+
+
+async def ensure_migrated(documents: List[dict]) -> None:
+    """Migrate any legacy documents in a metadata list before they are queried"""
+    for document in documents:
+        if document.get("chunk_storage") != CHUNK_STORAGE:
+            await migrate_document(document["_id"])
+            document["chunk_storage"] = CHUNK_STORAGE
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate_all())
+    print(f"✅ Migrated {count} document(s) to rag_chunks")
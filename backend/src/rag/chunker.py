@@ -0,0 +1,165 @@
+"""
+Token-aware streaming chunker
+File: src/rag/chunker.py
+
+Chunks are measured in model tokens (tiktoken) rather than characters, so
+every chunk fits an exact token budget and consecutive chunks share an
+exact number of overlap tokens. Text is processed in one pass:
+
+  * paragraphs (blank-line separated) are packed greedily into chunks;
+  * a heading always starts a new chunk, so sections are not split
+    across a heading;
+  * a paragraph larger than the budget is split at line breaks, then at
+    sentence ends, and only as a last resort at a token boundary.
+
+Each piece of text is encoded once (oversized paragraphs at most once per
+split level) and each chunk is decoded once, so cost is linear in the
+input size. Text can be fed piece by piece, e.g. one PDF page at a time.
+"""
+
+import os
+import re
+from typing import List
+
+import tiktoken
+
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "30"))
+ENCODING_NAME = "cl100k_base"
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_LINE_BREAK = re.compile(r"(?<=\n)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])(?=\s)")
+_HEADING = re.compile(
+    r"^(#{1,6}\s+\S.*"  # markdown heading
+    r"|(\d+(\.\d+)*\.?|[IVX]+\.)\s+[A-Z][^\n]{0,80}"  # numbered heading: "2.1 Results"
+    r"|[A-Z][A-Z0-9 ,:&/()-]{2,80})$"  # ALL CAPS line
+)
+
+# Without a paragraph break, pending text is flushed at this size so
+# memory stays bounded and chunks keep streaming out
+_MAX_PENDING_CHARS = 64 * 1024
+
+_encoding = None
+
+
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(ENCODING_NAME)
+    return _encoding
+
+
+def chunker_name(max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> str:
+    """Identifier of a chunker configuration, stored with documents and cache entries"""
+    return f"tiktoken-{ENCODING_NAME}-{max_tokens}-{overlap_tokens}"
+
+
+def is_heading(paragraph: str) -> bool:
+    first_line = paragraph.strip().split("\n", 1)[0]
+    return bool(first_line) and len(first_line) <= 100 and bool(_HEADING.match(first_line))
+
+
+class TokenChunker:
+    """Incremental chunker with exact token budgets; see module docstring"""
+
+    def __init__(self, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.name = chunker_name(max_tokens, overlap_tokens)
+        self._encoding = get_encoding()
+        self._pending = ""
+        self._tokens: List[int] = []  # tokens of the chunk being built
+        self._fresh = 0  # tokens in _tokens that are not overlap carried over
+
+    # -----------------------------
+    # Chunk assembly
+    # -----------------------------
+    def _emit(self, out: List[str]) -> None:
+        if self._fresh == 0:
+            return
+        text = self._encoding.decode_bytes(self._tokens).decode("utf-8", errors="ignore").strip()
+        # Pieces encoded separately can merge into a different tokenization once
+        # joined; trim so the emitted text itself stays within the budget
+        tokens = self._encoding.encode_ordinary(text)
+        if len(tokens) > self.max_tokens:
+            text = self._encoding.decode(tokens[:self.max_tokens]).strip()
+        if text:
+            out.append(text)
+        self._tokens = self._tokens[-self.overlap_tokens:] if self.overlap_tokens else []
+        self._fresh = 0
+
+    def _add(self, tokens: List[int], out: List[str]) -> None:
+        """Append a piece that fits the budget on its own"""
+        if len(self._tokens) + len(tokens) > self.max_tokens:
+            self._emit(out)
+            # The overlap tail always leaves room for a piece of max_tokens - overlap
+            if len(self._tokens) + len(tokens) > self.max_tokens:
+                self._tokens = self._tokens[len(self._tokens) + len(tokens) - self.max_tokens:]
+        self._tokens.extend(tokens)
+        self._fresh += len(tokens)
+
+    def _add_text(self, text: str, out: List[str], splitters: List[re.Pattern]) -> None:
+        tokens = self._encoding.encode_ordinary(text)
+        if len(tokens) <= self.max_tokens - self.overlap_tokens or (
+            len(tokens) <= self.max_tokens and len(self._tokens) + len(tokens) <= self.max_tokens
+        ):
+            self._add(tokens, out)
+            return
+
+        if splitters:
+            pieces = [p for p in splitters[0].split(text) if p]
+            if len(pieces) > 1:
+                for piece in pieces:
+                    self._add_text(piece, out, splitters[1:])
+                return
+
+        # No natural boundary left: cut at token boundaries
+        step = self.max_tokens - self.overlap_tokens
+        for start in range(0, len(tokens), step):
+            self._add(tokens[start:start + step], out)
+
+    def _add_paragraph(self, paragraph: str, out: List[str]) -> None:
+        if not paragraph.strip():
+            return
+        if is_heading(paragraph):
+            # Start the section in a fresh chunk, without overlap from the last one
+            self._emit(out)
+            self._tokens = []
+        self._add_text(paragraph, out, [_LINE_BREAK, _SENTENCE_END])
+
+    # -----------------------------
+    # Streaming API
+    # -----------------------------
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the chunks completed by it"""
+        out: List[str] = []
+        self._pending += text
+        parts = _PARAGRAPH_BREAK.split(self._pending)
+        self._pending = parts.pop()
+        for paragraph in parts:
+            self._add_paragraph(paragraph + "\n\n", out)
+
+        if len(self._pending) > _MAX_PENDING_CHARS:
+            cut = self._pending.rfind("\n") + 1 or len(self._pending)
+            self._add_text(self._pending[:cut], out, [_LINE_BREAK, _SENTENCE_END])
+            self._pending = self._pending[cut:]
+        return out
+
+    def close(self) -> List[str]:
+        """Flush and return the remaining chunks"""
+        out: List[str] = []
+        self._add_paragraph(self._pending, out)
+        self._pending = ""
+        self._emit(out)
+        self._tokens = []
+        return out
+
+
+def chunk_text_by_tokens(text: str, max_tokens: int = CHUNK_TOKENS,
+                         overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Split text into token-budgeted chunks in one pass"""
+    chunker = TokenChunker(max_tokens, overlap_tokens)
+    return chunker.feed(text) + chunker.close()
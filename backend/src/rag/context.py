@@ -0,0 +1,201 @@
+"""
+Token-budgeted context assembly for RAG prompts
+File: src/rag/context.py
+
+Turns ranked chunk hits into the context block of a question-answering
+prompt:
+
+  1. hits that are adjacent in the same document are merged back into one
+     span, and the text shared by overlapping chunks is kept only once;
+  2. spans are picked by maximal marginal relevance (MMR): rank relevance
+     traded off against similarity to the spans already picked, using the
+     stored chunk embeddings;
+  3. picked spans fill a token budget (tiktoken counts, including the
+     "[file name]" labels); the span that does not fit is cut at a token
+     boundary so the budget is used exactly.
+
+The result also carries the token count of the context query_documents
+sent before packing (the top BASELINE_HITS chunks joined as is), so
+callers can report the tokens saved against it.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.rag.chunker import get_encoding
+
+CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))
+CANDIDATES = int(os.getenv("RAG_CONTEXT_CANDIDATES", "12"))
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Chunks query_documents used to send unpacked; the baseline for tokens saved
+BASELINE_HITS = 5
+# Spans this similar to one already picked (or contained in it) are dropped as duplicates
+DUPLICATE_SIMILARITY = 0.95
+
+# Spans left with fewer tokens than this after cutting are dropped
+MIN_SPAN_TOKENS = 32
+# Longest chunk overlap searched for when merging neighbours
+MAX_OVERLAP_CHARS = 2000
+_OVERLAP_PROBE_CHARS = 24
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class Span:
+    doc_id: object
+    first: int  # ordinal of the first chunk
+    last: int  # ordinal of the last chunk
+    text: str
+    relevance: float
+    label: str = ""
+    vector: Optional[np.ndarray] = None
+
+    def render(self) -> str:
+        return f"[{self.label}]\n{self.text}" if self.label else self.text
+
+
+@dataclass
+class PackedContext:
+    text: str
+    spans: List[Span] = field(default_factory=list)
+    tokens: int = 0
+    baseline_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        """Tokens fewer than the baseline context; negative if packing used more"""
+        return self.baseline_tokens - self.tokens
+
+
+def merge_overlapping(left: str, right: str) -> str:
+    """Concatenate two neighbouring chunks, keeping the text they share once"""
+    probe = right[:_OVERLAP_PROBE_CHARS]
+    if len(probe) == _OVERLAP_PROBE_CHARS:
+        position = left.find(probe, max(len(left) - MAX_OVERLAP_CHARS, 0))
+        while position != -1:
+            if right.startswith(left[position:]):
+                return left + right[len(left) - position:]
+            position = left.find(probe, position + 1)
+    return left + "\n" + right
+
+
+def build_spans(hits: List[Tuple[object, int]], texts: Dict[Tuple[object, int], str],
+                labels: Dict[object, str]) -> List[Span]:
+    """
+    Merge ranked (doc_id, ordinal) hits into spans of consecutive chunks.
+
+    A span's relevance is that of its best hit, on a 0..1 scale by rank.
+    """
+    n = len(hits)
+    relevance = {hit: 1.0 - rank / n for rank, hit in enumerate(hits)}
+    spans: List[Span] = []
+    for doc_id, ordinal in sorted((h for h in hits if h in texts), key=lambda h: (str(h[0]), h[1])):
+        text = texts[(doc_id, ordinal)]
+        previous = spans[-1] if spans else None
+        if previous is not None and previous.doc_id == doc_id and previous.last + 1 == ordinal:
+            previous.text = merge_overlapping(previous.text, text)
+            previous.last = ordinal
+            previous.relevance = max(previous.relevance, relevance[(doc_id, ordinal)])
+        else:
+            spans.append(Span(doc_id, ordinal, ordinal, text, relevance[(doc_id, ordinal)],
+                              labels.get(doc_id, "")))
+    return spans
+
+
+def _attach_vectors(spans: List[Span], vectors: Dict[object, np.ndarray]) -> None:
+    for span in spans:
+        matrix = vectors.get(span.doc_id)
+        if matrix is None or span.last >= matrix.shape[0]:
+            continue
+        vector = matrix[span.first:span.last + 1].sum(axis=0)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            span.vector = vector / norm
+
+
+def select_mmr(spans: List[Span], lambda_: float = MMR_LAMBDA) -> List[Span]:
+    """Order spans by maximal marginal relevance, most useful first, without near-duplicates"""
+    remaining = list(spans)
+    selected: List[Span] = []
+    while remaining:
+        redundancy = {}
+        for span in remaining:
+            redundancy[id(span)] = max(
+                (float(span.vector @ other.vector) for other in selected
+                 if span.vector is not None and other.vector is not None),
+                default=0.0,
+            )
+        remaining = [
+            s for s in remaining
+            if redundancy[id(s)] < DUPLICATE_SIMILARITY and not any(s.text in other.text for other in selected)
+        ]
+        if not remaining:
+            break
+        best = max(remaining, key=lambda s: lambda_ * s.relevance - (1.0 - lambda_) * redundancy[id(s)])
+        remaining.remove(best)
+        selected.append(best)
+    return selected
+
+
+def pack_context(hits: List[Tuple[object, int]], texts: Dict[Tuple[object, int], str],
+                 labels: Dict[object, str], vectors: Optional[Dict[object, np.ndarray]] = None,
+                 budget: int = CONTEXT_TOKENS, lambda_: float = MMR_LAMBDA) -> PackedContext:
+    """
+    Assemble the prompt context from ranked hits.
+
+    Args:
+        hits: (doc_id, ordinal) best first
+        texts: Chunk texts by (doc_id, ordinal), e.g. from chunk_store.load_selected
+        labels: Label (file name) per doc_id, printed before each span
+        vectors: Chunk embedding matrices per doc_id, for MMR; spans without
+            vectors are only ranked by relevance
+        budget: Maximum tokens of the returned text
+        lambda_: MMR trade-off, 1.0 = relevance only
+
+    Returns:
+        PackedContext with the text, the spans used and token counts
+    """
+    encoding = get_encoding()
+    baseline = SEPARATOR.join(
+        f"[{labels[doc_id]}]\n{texts[(doc_id, ordinal)]}" if labels.get(doc_id) else texts[(doc_id, ordinal)]
+        for doc_id, ordinal in hits[:BASELINE_HITS] if (doc_id, ordinal) in texts
+    )
+    baseline_tokens = len(encoding.encode_ordinary(baseline))
+
+    spans = build_spans(hits, texts, labels)
+    if vectors:
+        _attach_vectors(spans, vectors)
+
+    separator_tokens = len(encoding.encode_ordinary(SEPARATOR))
+    used: List[Span] = []
+    pieces: List[str] = []
+    remaining = budget
+    for span in select_mmr(spans, lambda_):
+        cost = separator_tokens if pieces else 0
+        tokens = encoding.encode_ordinary(span.render())
+        if cost + len(tokens) <= remaining:
+            pieces.append(span.render())
+            remaining -= cost + len(tokens)
+            used.append(span)
+            continue
+        # Cut the first span that does not fit to the tokens that are left;
+        # if too little is left for that, a later, shorter span may still fit
+        room = remaining - cost
+        if room < MIN_SPAN_TOKENS:
+            continue
+        cut = encoding.decode(tokens[:room]).rstrip()
+        if cut:
+            pieces.append(cut)
+            used.append(span)
+        break
+
+    # Tokens can merge differently across the joins; trim the end if so
+    text = SEPARATOR.join(pieces)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) > budget:
+        text = encoding.decode(tokens[:budget]).rstrip()
+        tokens = encoding.encode_ordinary(text)
+    return PackedContext(text=text, spans=used, tokens=len(tokens), baseline_tokens=baseline_tokens)
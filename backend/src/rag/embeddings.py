@@ -0,0 +1,184 @@
+"""
+Pluggable text embedders for RAG retrieval
+File: src/rag/embeddings.py
+
+Every embedder returns L2-normalised float32 vectors, so a plain dot
+product between a query vector and a chunk matrix is a cosine similarity.
+"""
+
+import os
+import re
+import zlib
+from typing import Dict, List, Protocol, Tuple
+
+import numpy as np
+
+
+class Embedder(Protocol):
+    """Interface shared by all embedders."""
+
+    name: str
+    dim: int
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), dim) float32 matrix."""
+        ...
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query into a (dim,) float32 vector."""
+        ...
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+# ---------------------------------------------------------
+# Hashing embedder (deterministic, offline)
+# ---------------------------------------------------------
+_WORD_RE = re.compile(r"\w+")
+
+# Function words carry no topical signal but appear in every chunk; without
+# corpus-level IDF they would dominate the dot product, so they are dropped.
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers him his how i if
+in into is it its itself just me more most my no nor not now of off on once only
+or other our ours out over own same she should so some such than that the their
+theirs them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your
+""".split())
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing embedder over word unigrams and character n-grams.
+
+    It needs no network access or model download and always produces the
+    same vectors for the same text, which makes it suitable for tests,
+    benchmarks and offline deployments. Character n-grams give it some
+    tolerance to plurals and inflections that exact keyword matching lacks.
+    """
+
+    def __init__(self, dim: int = 1024, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+        self.name = f"hashing-{dim}-{ngram}"
+        # word -> (feature indices, signs); vocabularies are small compared
+        # to the number of tokens, so this removes almost all hashing work.
+        self._word_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+    def _word_features(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._word_cache.get(word)
+        if cached is not None:
+            return cached
+
+        features = ["w:" + word]
+        padded = f"<{word}>"
+        if len(padded) > self.ngram:
+            features.extend(
+                padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1)
+            )
+        hashed = [self._hash(f) for f in features]
+        indices = np.fromiter((i for i, _ in hashed), dtype=np.int64, count=len(hashed))
+        signs = np.fromiter((s for _, s in hashed), dtype=np.float32, count=len(hashed))
+        # Whole-word matches count more than shared sub-word fragments
+        signs[0] *= 2.0
+
+        if len(self._word_cache) < 500_000:
+            self._word_cache[word] = (indices, signs)
+        return indices, signs
+
+    def _embed_into(self, text: str, row: np.ndarray) -> None:
+        counts: Dict[str, int] = {}
+        for word in _WORD_RE.findall(text.lower()):
+            if word not in STOPWORDS:
+                counts[word] = counts.get(word, 0) + 1
+        for word, tf in counts.items():
+            indices, signs = self._word_features(word)
+            # Sublinear term frequency keeps repeated words from dominating
+            np.add.at(row, indices, signs * (1.0 + np.log(tf)))
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self._embed_into(text, matrix[i])
+        return _normalize_rows(matrix)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+
+# ---------------------------------------------------------
+# OpenAI embedder
+# ---------------------------------------------------------
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings API."""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 512, batch_size: int = 512):
+        from langchain_openai import OpenAIEmbeddings
+        from src.llm_registry import get_async_http_client, get_http_client
+
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+        self._client = OpenAIEmbeddings(
+            model=model,
+            dimensions=dim,
+            chunk_size=batch_size,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vectors = self._client.embed_documents(texts)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        vector = np.asarray([self._client.embed_query(text)], dtype=np.float32)
+        return _normalize_rows(vector)[0]
+
+
+_embedder = None
+
+
+def get_embedder() -> Embedder:
+    """
+    Return the process-wide embedder selected by RAG_EMBEDDER.
+
+    RAG_EMBEDDER=openai (default) uses the OpenAI embeddings API,
+    RAG_EMBEDDER=hashing uses the offline HashingEmbedder (tests and
+    benchmarks; it matches words, not meaning).
+
+    Raises:
+        ValueError: if RAG_EMBEDDER names neither
+    """
+    global _embedder
+    if _embedder is None:
+        kind = os.getenv("RAG_EMBEDDER", "openai").strip().lower()
+        dim = int(os.getenv("RAG_EMBEDDING_DIM", "1024"))
+        if kind == "openai":
+            _embedder = OpenAIEmbedder(
+                model=os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small"),
+                dim=dim,
+            )
+        elif kind == "hashing":
+            _embedder = HashingEmbedder(dim=dim)
+        else:
+            raise ValueError(f"Unknown RAG_EMBEDDER '{kind}' (expected 'openai' or 'hashing')")
+    return _embedder
+
+
+def set_embedder(embedder: Embedder) -> None:
+    """Override the process-wide embedder (used by benchmarks and scripts)."""
+    global _embedder
+    _embedder = embedder
@@ -0,0 +1,96 @@
+"""
+Parallel PDF text extraction off the event loop
+File: src/rag/extraction.py
+
+PyPDF2 is pure Python and CPU bound, so running it inside an async tool
+stalls every other request on the uvicorn event loop. Pages are instead
+split into ranges and extracted in a process pool; `iter_pdf_pages`
+yields page texts in order as soon as their range is done, so the caller
+can chunk while later pages are still being extracted.
+
+This module is imported by the pool's worker processes, so it must stay
+free of heavy imports (database clients, LLM SDKs).
+"""
+
+import asyncio
+import io
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+import PyPDF2
+
+# RAG_PDF_WORKERS=0 falls back to a thread, for environments without fork/spawn
+PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 2)))
+# Smallest page range handed to one worker; smaller ranges cost more in
+# re-parsing the PDF structure than they gain in parallelism.
+MIN_PAGES_PER_TASK = int(os.getenv("RAG_PDF_MIN_PAGES_PER_TASK", "8"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    """Lazily create the shared extraction pool"""
+    global _pool
+    if _pool is None and PDF_WORKERS > 0:
+        # spawn, not fork: the server process runs threads (Mongo, HTTP
+        # clients) that must not be duplicated into the workers.
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ---------------------------------------------------------
+# Worker functions (run in the pool)
+# ---------------------------------------------------------
+def count_pdf_pages(data: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+def extract_pdf_page_range(data: bytes, start: int, stop: int) -> List[str]:
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+# ---------------------------------------------------------
+# Async API
+# ---------------------------------------------------------
+async def _run(func, *args):
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    return await loop.run_in_executor(pool, func, *args)
+
+
+async def iter_pdf_pages(data: bytes) -> AsyncIterator[str]:
+    """Yield the text of every page of a PDF, in page order"""
+    data = bytes(data)
+    page_count = await _run(count_pdf_pages, data)
+    if page_count == 0:
+        return
+
+    workers = max(PDF_WORKERS, 1)
+    pages_per_task = max(MIN_PAGES_PER_TASK, math.ceil(page_count / (workers * 2)))
+    tasks = [
+        asyncio.ensure_future(_run(extract_pdf_page_range, data, start, min(start + pages_per_task, page_count)))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    try:
+        for task in tasks:
+            for page in await task:
+                yield page
+    finally:
+        for task in tasks:
+            task.cancel()
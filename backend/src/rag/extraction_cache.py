@@ -0,0 +1,149 @@
+"""
+Content-addressed cache of extraction results
+File: src/rag/extraction_cache.py
+
+Uploading the same bytes twice should not re-run PDF parsing, OCR or the
+paid vision call. Results are keyed by the SHA-256 of the raw file and
+stored per user; with RAG_EXTRACTION_CACHE_GLOBAL=true they are stored
+once in a shared "global" scope instead, so identical files uploaded by
+different users are only extracted once.
+
+Entries are also keyed by the chunker configuration (see chunker.py), so
+changing the chunk size never serves chunks cut for the old one.
+
+Each entry keeps the extracted text and chunks (zlib-compressed JSON) and,
+when available, the chunk embedding matrix, so a hit also skips
+re-embedding. Entries expire by age through a MongoDB TTL index on
+`last_used_at`, and the collection is trimmed to a total byte budget
+(least recently used first) whenever an entry is added.
+"""
+
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from bson import Binary
+
+from src.db import rag_extraction_cache_collection
+from src.metrics import metrics
+
+GLOBAL_SCOPE = "global"
+
+ENABLED = os.getenv("RAG_EXTRACTION_CACHE", "true").lower() == "true"
+USE_GLOBAL = os.getenv("RAG_EXTRACTION_CACHE_GLOBAL", "false").lower() == "true"
+TTL_SECONDS = int(float(os.getenv("RAG_EXTRACTION_CACHE_TTL_DAYS", "30")) * 86400)
+MAX_TOTAL_BYTES = int(float(os.getenv("RAG_EXTRACTION_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+# Keep entries comfortably below the 16 MB BSON limit
+MAX_ENTRY_BYTES = 12 * 1024 * 1024
+
+
+@dataclass
+class CachedExtraction:
+    extracted_text: str
+    chunks: List[str]
+    embeddings: Optional[np.ndarray]
+    embedder: Optional[str]
+
+
+def _scope(user_id: str) -> str:
+    return GLOBAL_SCOPE if USE_GLOBAL else user_id
+
+
+async def lookup(user_id: str, content_hash: str, file_type: str,
+                 chunker: str) -> Optional[CachedExtraction]:
+    """Return the cached extraction for these bytes and chunker configuration, or None"""
+    if not ENABLED:
+        return None
+
+    scopes = [user_id, GLOBAL_SCOPE] if USE_GLOBAL else [user_id]
+    entry = await rag_extraction_cache_collection.find_one_and_update(
+        {"content_hash": content_hash, "file_type": file_type, "chunker": chunker, "scope": {"$in": scopes}},
+        {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+    )
+    if not entry:
+        metrics.incr("rag.extraction_cache.miss")
+        return None
+
+    metrics.incr("rag.extraction_cache.hit")
+    payload = json.loads(zlib.decompress(entry["payload"]))
+    embeddings = None
+    if entry.get("vectors") is not None:
+        embeddings = np.frombuffer(
+            zlib.decompress(entry["vectors"]), dtype=np.float32
+        ).reshape(len(payload["chunks"]), entry["dim"])
+    return CachedExtraction(
+        extracted_text=payload["text"],
+        chunks=payload["chunks"],
+        embeddings=embeddings,
+        embedder=entry.get("embedder"),
+    )
+
+
+async def store(user_id: str, content_hash: str, file_type: str, chunker: str, extracted_text: str,
+                chunks: List[str], embeddings: Optional[np.ndarray], embedder: Optional[str]) -> None:
+    """Cache an extraction result, then trim the cache to its byte budget"""
+    if not ENABLED:
+        return
+
+    payload = zlib.compress(json.dumps({"text": extracted_text, "chunks": chunks}).encode("utf-8"))
+    vectors = None
+    if embeddings is not None:
+        vectors = zlib.compress(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        if len(payload) + len(vectors) > MAX_ENTRY_BYTES:
+            vectors = None
+    if len(payload) > MAX_ENTRY_BYTES:
+        metrics.incr("rag.extraction_cache.too_large")
+        return
+
+    size = len(payload) + (len(vectors) if vectors else 0)
+    now = datetime.utcnow()
+    await rag_extraction_cache_collection.update_one(
+        {"scope": _scope(user_id), "content_hash": content_hash, "file_type": file_type, "chunker": chunker},
+        {
+            "$set": {
+                "payload": Binary(payload),
+                "vectors": Binary(vectors) if vectors else None,
+                "dim": int(embeddings.shape[1]) if vectors else None,
+                "embedder": embedder if vectors else None,
+                "size": size,
+                "last_used_at": now,
+            },
+            "$setOnInsert": {"created_at": now, "hits": 0},
+        },
+        upsert=True,
+    )
+    await _enforce_size_limit()
+
+
+async def _enforce_size_limit() -> None:
+    totals = await rag_extraction_cache_collection.aggregate(
+        [{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}]
+    ).to_list(length=1)
+    excess = (totals[0]["bytes"] if totals else 0) - MAX_TOTAL_BYTES
+    if excess <= 0:
+        return
+
+    cursor = rag_extraction_cache_collection.find({}, {"_id": 1, "size": 1}).sort("last_used_at", 1)
+    evict = []
+    async for entry in cursor:
+        evict.append(entry["_id"])
+        excess -= entry.get("size", 0)
+        if excess <= 0:
+            break
+    await rag_extraction_cache_collection.delete_many({"_id": {"$in": evict}})
+    metrics.incr("rag.extraction_cache.evicted", len(evict))
+
+
+async def invalidate(user_id: str, content_hash: Optional[str] = None) -> None:
+    """
+    Drop a user's private cache entries, or only the one for content_hash.
+    Global entries are shared between users and are left to expire.
+    """
+    query = {"scope": user_id}
+    if content_hash:
+        query["content_hash"] = content_hash
+    await rag_extraction_cache_collection.delete_many(query)
@@ -0,0 +1,424 @@
+"""
+Background ingestion jobs for uploaded files
+File: src/rag/jobs.py
+
+`/upload` only stores the bytes and enqueues a job; the extract, chunk,
+embed and store pipeline runs here, in a bounded pool of worker tasks
+started with the app. Jobs live in the rag_ingest_jobs collection and
+the uploaded bytes in the rag_uploads GridFS bucket, so any app process
+can pick up any job.
+
+An upload job moves through the stages
+
+    queued -> extracting -> embedding -> indexing -> storing -> done
+
+(status "queued", "running", "done" or "failed"), which `/uploads/{job_id}`
+reports. Once stored, the document gets a lower-priority "summarize" job
+that builds its summary tree (src/rag/summaries.py) on the same workers. A worker claims a job with a lease that it renews while the job
+runs. If the worker dies, the lease runs out and another worker claims the
+job again, up to MAX_ATTEMPTS times; whatever the interrupted attempt had
+stored is discarded first. Files that simply have no usable text fail
+immediately instead of being retried.
+
+Each ingest attempt stores its document under a doc_id of its own
+(recorded on the job), and checks that it still holds the lease before
+every write. A worker that lost its lease stops at its next write and
+discards its attempt; anything it was still writing goes to its own
+doc_id, never to the one the new attempt is building.
+"""
+
+import asyncio
+import io
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Union
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from src.db import rag_ingest_jobs_collection, rag_uploads_bucket
+from src.metrics import metrics
+
+WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("RAG_INGEST_MAX_ATTEMPTS", "3"))
+LEASE_SECONDS = float(os.getenv("RAG_INGEST_LEASE_SECONDS", "120"))
+POLL_SECONDS = float(os.getenv("RAG_INGEST_POLL_SECONDS", "2"))
+JOB_TTL_SECONDS = int(float(os.getenv("RAG_INGEST_JOB_TTL_HOURS", "24")) * 3600)
+RETRY_DELAY_SECONDS = 5
+
+TERMINAL_STATUSES = ("done", "failed")
+
+# Job kinds; workers take higher priority jobs first
+KIND_INGEST = "ingest"
+KIND_SUMMARIZE = "summarize"
+PRIORITY = {KIND_INGEST: 1, KIND_SUMMARIZE: 0}
+
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker; stop without recording anything"""
+
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+def job_view(job: dict) -> dict:
+    """JSON-safe public fields of a job"""
+    def when(value):
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": str(job["_id"]),
+        "kind": job.get("kind", KIND_INGEST),
+        "status": job["status"],
+        "stage": job["stage"],
+        "file_name": job.get("file_name"),
+        "file_type": job.get("file_type"),
+        "file_size": job.get("file_size"),
+        "attempts": job.get("attempts", 0),
+        "message": job.get("message"),
+        "error": job.get("error"),
+        "created_at": when(job.get("created_at")),
+        "updated_at": when(job.get("updated_at")),
+        "finished_at": when(job.get("finished_at")),
+    }
+
+
+# -----------------------------
+# Enqueue and status
+# -----------------------------
+async def enqueue(user_id: str, file_name: str, file_type: str,
+                  file_bytes: Union[bytes, memoryview], content_hash: str) -> dict:
+    """Store the upload and queue it for ingestion; returns the job view"""
+    job_id = ObjectId()
+    payload_id = ObjectId()
+    await rag_uploads_bucket.upload_from_stream_with_id(
+        payload_id, file_name, io.BytesIO(file_bytes),
+        metadata={"user_id": user_id, "job_id": job_id, "content_type": file_type},
+    )
+
+    now = datetime.utcnow()
+    job = {
+        "_id": job_id,
+        "kind": KIND_INGEST,
+        "priority": PRIORITY[KIND_INGEST],
+        "user_id": user_id,
+        "file_name": file_name,
+        "file_type": file_type,
+        "file_size": len(file_bytes),
+        "content_hash": content_hash,
+        "payload_id": payload_id,
+        "doc_id": ObjectId(),  # _id of the resulting rag_documents record
+        "status": "queued",
+        "stage": "queued",
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await rag_ingest_jobs_collection.insert_one(job)
+    metrics.incr("rag.ingest.enqueued")
+    _get_wakeup().set()
+    return job_view(job)
+
+
+async def enqueue_summary(user_id: str, doc_id: ObjectId, file_name: str) -> None:
+    """
+    Queue building the summary tree of a stored document. There is one
+    summarize job per document; storing the document again (e.g. an ingest
+    retry reusing doc_id) re-arms it, whatever state it was left in.
+    """
+    now = datetime.utcnow()
+    await rag_ingest_jobs_collection.update_one(
+        {"kind": KIND_SUMMARIZE, "doc_id": doc_id},
+        {
+            "$set": {
+                "user_id": user_id,
+                "file_name": file_name,
+                "status": "queued",
+                "stage": "queued",
+                "attempts": 0,
+                "available_at": now,
+                "updated_at": now,
+            },
+            "$unset": {
+                "lease_expires_at": "", "lease_token": "", "worker_id": "",
+                "finished_at": "", "message": "", "error": "",
+            },
+            "$setOnInsert": {
+                "priority": PRIORITY[KIND_SUMMARIZE],
+                "payload_id": None,
+                "created_at": now,
+            },
+        },
+        upsert=True,
+    )
+    _get_wakeup().set()
+
+
+async def get_job(user_id: str, job_id: str) -> Optional[dict]:
+    """The user's job as a job view, or None"""
+    try:
+        object_id = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        return None
+    job = await rag_ingest_jobs_collection.find_one({"_id": object_id, "user_id": user_id})
+    return job_view(job) if job else None
+
+
+async def watch_job(user_id: str, job_id: str, interval: float = 0.5) -> AsyncIterator[dict]:
+    """Yield the job view each time its status or stage changes, until it finishes"""
+    last = None
+    while True:
+        view = await get_job(user_id, job_id)
+        if view is None:
+            return
+        if (view["status"], view["stage"], view["attempts"]) != last:
+            last = (view["status"], view["stage"], view["attempts"])
+            yield view
+        if view["status"] in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(interval)
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+async def _claim(worker_id: str) -> Optional[dict]:
+    """
+    Take the oldest runnable job: queued, or running under an expired lease.
+    Every claim gets a new lease_token; updates made for the job afterwards
+    only apply while the token is still the job's, so a worker that lost its
+    lease cannot finish or requeue a job another worker has taken over.
+    """
+    now = datetime.utcnow()
+    return await rag_ingest_jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ],
+            "attempts": {"$lt": MAX_ATTEMPTS},
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_token": ObjectId(),
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", -1), ("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _leased(job: dict) -> dict:
+    """Filter matching `job` only while it is still held under the same lease"""
+    return {"_id": job["_id"], "lease_token": job.get("lease_token")}
+
+
+async def _finish(job: dict, status: str, **fields) -> bool:
+    """Record the outcome; False (and nothing changed) if the lease was lost"""
+    now = datetime.utcnow()
+    result = await rag_ingest_jobs_collection.update_one(
+        _leased(job),
+        {
+            "$set": {"status": status, "updated_at": now, "finished_at": now, **fields},
+            "$unset": {"lease_expires_at": "", "lease_token": "", "worker_id": ""},
+        },
+    )
+    if result.matched_count == 0:
+        print(f"⚠️ Lost the lease on ingestion job {job['_id']}; not recording '{status}'")
+        return False
+    if job.get("payload_id") is not None:
+        try:
+            await rag_uploads_bucket.delete(job["payload_id"])
+        except Exception as e:
+            print(f"⚠️ Could not delete upload payload of job {job['_id']}: {e}")
+    metrics.incr(f"rag.{job.get('kind', KIND_INGEST)}.{status}")
+    return True
+
+
+async def _fail_abandoned() -> None:
+    """Give up on jobs whose last allowed attempt died with its worker"""
+    cursor = rag_ingest_jobs_collection.find(
+        {
+            "status": "running",
+            "lease_expires_at": {"$lt": datetime.utcnow()},
+            "attempts": {"$gte": MAX_ATTEMPTS},
+        },
+        {"_id": 1, "kind": 1, "user_id": 1, "payload_id": 1, "doc_id": 1, "lease_token": 1},
+    )
+    async for job in cursor:
+        from src.tools.rag_tool import discard_document
+
+        failed = await _finish(
+            job, "failed",
+            error=f"Processing was interrupted {MAX_ATTEMPTS} times. Please upload the file again.",
+        )
+        if failed and job.get("kind", KIND_INGEST) == KIND_INGEST:
+            await discard_document(job["user_id"], job["doc_id"])
+
+
+async def _renew_lease(job: dict) -> None:
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        result = await rag_ingest_jobs_collection.update_one(
+            {**_leased(job), "status": "running"},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}},
+        )
+        if result.matched_count == 0:
+            print(f"⚠️ Lost the lease on ingestion job {job['_id']}")
+            return
+
+
+async def _fence(job: dict) -> None:
+    """Raise LeaseLost unless the job is still held under this worker's lease"""
+    held = await rag_ingest_jobs_collection.find_one(
+        {**_leased(job), "status": "running", "lease_expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+    )
+    if held is None:
+        raise LeaseLost(job["_id"])
+
+
+async def _ingest(job: dict, on_stage) -> str:
+    from src.tools.rag_tool import discard_document, ingest_document
+
+    if job["attempts"] > 1:
+        await discard_document(job["user_id"], job["doc_id"])
+
+    # A fresh doc_id per attempt: a previous holder that is still running
+    # can only ever write to its own
+    doc_id = ObjectId()
+    result = await rag_ingest_jobs_collection.update_one(_leased(job), {"$set": {"doc_id": doc_id}})
+    if result.matched_count == 0:
+        raise LeaseLost(job["_id"])
+    job["doc_id"] = doc_id
+
+    stream = await rag_uploads_bucket.open_download_stream(job["payload_id"])
+    file_bytes = await stream.read()
+    return await ingest_document(
+        file_bytes, job["file_name"], job["file_type"], job["user_id"],
+        content_hash=job["content_hash"], on_stage=on_stage, doc_id=doc_id,
+        fence=lambda: _fence(job),
+    )
+
+
+async def _summarize(job: dict, on_stage) -> str:
+    from src.rag.summaries import build_for_document
+
+    summary = await build_for_document(job["user_id"], job["doc_id"], on_stage)
+    return "Summary ready." if summary is not None else "Document no longer exists."
+
+
+async def _run(job: dict) -> None:
+    from src.tools.rag_tool import ExtractionError, discard_document
+
+    kind = job.get("kind", KIND_INGEST)
+
+    async def on_stage(stage: str) -> None:
+        result = await rag_ingest_jobs_collection.update_one(
+            _leased(job), {"$set": {"stage": stage, "updated_at": datetime.utcnow()}},
+        )
+        if result.matched_count == 0:
+            raise LeaseLost(job["_id"])
+
+    lease = asyncio.create_task(_renew_lease(job))
+    try:
+        with metrics.timer(f"rag.{kind}.job"):
+            if kind == KIND_SUMMARIZE:
+                message = await _summarize(job, on_stage)
+            else:
+                message = await _ingest(job, on_stage)
+        done = await _finish(job, "done", stage="done", message=message, error=None)
+        if not done and kind == KIND_INGEST:
+            # Taken over after the last write; the new holder stores its own copy
+            await discard_document(job["user_id"], job["doc_id"])
+
+    except LeaseLost:
+        print(f"⚠️ Lost the lease on {kind} job {job['_id']}; abandoning attempt {job['attempts']}")
+        if kind == KIND_INGEST:
+            await discard_document(job["user_id"], job["doc_id"])
+
+    except ExtractionError as e:
+        # The file itself is the problem; another attempt would fail the same way
+        await _finish(job, "failed", error=str(e))
+
+    except Exception as e:
+        print(f"⚠️ {kind.capitalize()} job {job['_id']} attempt {job['attempts']} failed: {e}")
+        if job["attempts"] >= MAX_ATTEMPTS:
+            failed = await _finish(job, "failed", error=f"Error processing file: {str(e)}")
+            if failed and kind == KIND_INGEST:
+                await discard_document(job["user_id"], job["doc_id"])
+        else:
+            result = await rag_ingest_jobs_collection.update_one(
+                _leased(job),
+                {
+                    "$set": {
+                        "status": "queued",
+                        "stage": "queued",
+                        "error": str(e),
+                        "available_at": datetime.utcnow() + timedelta(seconds=RETRY_DELAY_SECONDS * job["attempts"]),
+                        "updated_at": datetime.utcnow(),
+                    },
+                    "$unset": {"lease_expires_at": "", "lease_token": "", "worker_id": ""},
+                },
+            )
+            if result.matched_count:
+                metrics.incr(f"rag.{kind}.retried")
+
+    finally:
+        lease.cancel()
+
+
+async def _worker(worker_id: str) -> None:
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            wakeup.clear()
+            job = await _claim(worker_id)
+            if job is not None:
+                await _run(job)
+                continue
+
+            await _fail_abandoned()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Ingestion worker {worker_id} error: {e}")
+            await asyncio.sleep(POLL_SECONDS)
+
+
+def start_workers(count: int = WORKERS) -> None:
+    """Start `count` worker tasks on the running event loop"""
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    for _ in range(count - len(_workers)):
+        _workers.append(asyncio.create_task(_worker(f"{prefix}-{len(_workers)}")))
+
+
+async def stop_workers() -> None:
+    """
+    Cancel the worker tasks. Jobs they were running keep their lease and
+    are picked up again once it expires.
+    """
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,187 @@
+"""
+Precomputed document summaries
+File: src/rag/summaries.py
+
+After a document is stored, a background "summarize" job (src/rag/jobs.py)
+builds a map-reduce summary tree over its chunks once:
+
+    chunks --map--> chunk-group summaries --reduce--> section summaries
+           --reduce--> ... --> document summary
+
+Groups of LEAF_CHUNKS consecutive chunks are summarized in parallel, then
+FAN_IN summaries at a time are merged until one is left. The document
+summary and the level below it (the section summaries) are stored on the
+rag_documents record under `summary`, so a "summarize my file" request is a
+lookup, or a small prompt over the section summaries when the question asks
+for something more specific.
+"""
+
+import asyncio
+import os
+import re
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+
+from src.db import rag_documents_collection
+from src.llm_registry import get_chat_model
+from src.metrics import metrics
+from src.rag import chunk_store
+
+ENABLED = os.getenv("RAG_SUMMARY_TREE", "true").lower() == "true"
+MODEL = os.getenv("RAG_SUMMARY_MODEL", "gpt-4o-mini")
+LEAF_CHUNKS = int(os.getenv("RAG_SUMMARY_LEAF_CHUNKS", "12"))
+FAN_IN = int(os.getenv("RAG_SUMMARY_FAN_IN", "8"))
+CONCURRENCY = int(os.getenv("RAG_SUMMARY_CONCURRENCY", "4"))
+
+# Words that only say "summarize this"; a question made of nothing else is
+# answered with the stored summary as is
+_REQUEST_WORDS = frozenset(
+    "summarize summarise summary summaries overview give me my the this that a an of "
+    "document doc file pdf upload uploaded please can could you provide write short "
+    "brief quick what s is it about does say says whats in tell".split()
+)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+MAP_PROMPT = """Summarize the following part of a document in a short paragraph.
+Keep the key facts, figures, names and conclusions; do not add anything that is not in the text.
+
+Text:
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of one document.
+Combine them into a single summary of those parts, keeping the key facts, figures, names and conclusions.
+Organize it with short sections if the parts cover different topics.
+
+Summaries:
+{text}
+
+Combined summary:"""
+
+
+def get_summary_llm():
+    return get_chat_model(MODEL)
+
+
+async def build_summary_tree(chunks: List[str], llm=None,
+                             concurrency: int = CONCURRENCY) -> Tuple[str, List[str], int]:
+    """
+    Map-reduce chunks into a document summary.
+
+    Args:
+        chunks: Document chunks, in order
+        llm: Chat model with `ainvoke` (defaults to get_summary_llm())
+        concurrency: Maximum LLM calls in flight
+
+    Returns:
+        (document summary, section summaries, number of levels)
+    """
+    llm = llm or get_summary_llm()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def summarize(template: str, parts: List[str]) -> str:
+        async with limit:
+            response = await llm.ainvoke(template.format(text="\n\n".join(parts)))
+        metrics.incr("rag.summary.llm_calls")
+        return response.content.strip()
+
+    def groups(items: List[str], size: int) -> List[List[str]]:
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    level = await asyncio.gather(*(summarize(MAP_PROMPT, g) for g in groups(chunks, LEAF_CHUNKS)))
+    levels = 1
+    sections: List[str] = []
+    while len(level) > 1:
+        sections = list(level)
+        level = await asyncio.gather(*(summarize(REDUCE_PROMPT, g) for g in groups(level, FAN_IN)))
+        levels += 1
+    return level[0], sections, levels
+
+
+async def build_for_document(user_id: str, doc_id, on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+                             llm=None) -> Optional[str]:
+    """
+    Build and store the summary of one stored document.
+
+    Returns:
+        The document summary, or None if the document no longer exists
+    """
+    document = await rag_documents_collection.find_one(
+        {"_id": doc_id, "user_id": user_id}, {"_id": 1, "content_hash": 1, "metadata.chunker": 1}
+    )
+    if not document:
+        return None
+
+    # The same bytes, chunked the same way, were summarized before: reuse that
+    if document.get("content_hash"):
+        previous = await rag_documents_collection.find_one(
+            {
+                "user_id": user_id,
+                "content_hash": document["content_hash"],
+                "metadata.chunker": document.get("metadata", {}).get("chunker"),
+                "summary.status": "ready",
+            },
+            {"summary": 1},
+        )
+        if previous:
+            metrics.incr("rag.summary.reused")
+            await rag_documents_collection.update_one(
+                {"_id": doc_id}, {"$set": {"summary": previous["summary"]}}
+            )
+            return previous["summary"]["text"]
+
+    if on_stage is not None:
+        await on_stage("summarizing")
+    chunks = (await chunk_store.load_all([doc_id]))[doc_id]
+    try:
+        with metrics.timer("rag.summary.build"):
+            text, sections, levels = await build_summary_tree(chunks, llm)
+    except Exception:
+        await rag_documents_collection.update_one(
+            {"_id": doc_id}, {"$set": {"summary.status": "failed"}}
+        )
+        raise
+
+    await rag_documents_collection.update_one(
+        {"_id": doc_id},
+        {"$set": {"summary": {
+            "status": "ready",
+            "text": text,
+            "sections": sections,
+            "levels": levels,
+            "model": getattr(llm, "model_name", MODEL),
+            "built_at": datetime.utcnow(),
+        }}},
+    )
+    return text
+
+
+def is_plain_summary_request(question: str) -> bool:
+    """True for "summarize my file"-style questions that ask for nothing more specific"""
+    words = _WORD_RE.findall(question.lower())
+    return bool(words) and all(word in _REQUEST_WORDS for word in words)
+
+
+def summary_prompt(question: str, file_name: str, summary: dict) -> str:
+    """Small final prompt that answers a summary question from the stored tree"""
+    parts = "\n\n".join(
+        f"Part {i + 1}:\n{section}" for i, section in enumerate(summary.get("sections") or [])
+    )
+    if parts:
+        parts = f"Summaries of its parts, in order:\n{parts}\n"
+    return f"""You are given precomputed summaries of a document. Use them to answer the request.
+
+Document Name: {file_name}
+Overall summary:
+{summary["text"]}
+
+{parts}
+Request: {question}
+
+Instructions:
+- Answer based ONLY on the summaries above
+- Keep the structure clear and the answer concise
+
+Answer:"""
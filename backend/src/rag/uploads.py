@@ -0,0 +1,51 @@
+"""
+Streaming reader for uploaded files
+File: src/rag/uploads.py
+
+Reads an UploadFile in fixed-size pieces into a single growable buffer,
+hashing as it goes and rejecting the upload as soon as it exceeds the
+configured limit, so an oversized file is never held in memory in full
+and no base64 copy is ever made.
+"""
+
+import hashlib
+import os
+from typing import Tuple
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("RAG_MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"File is too large. The maximum upload size is {limit / (1024 * 1024):g} MB.")
+
+
+async def read_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[memoryview, str]:
+    """
+    Read an UploadFile (or any object with an async `read(size)`).
+
+    Returns:
+        (memoryview over the file bytes, SHA-256 hex digest of the bytes)
+
+    Raises:
+        UploadTooLarge: as soon as more than max_bytes have been read
+    """
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    while True:
+        piece = await upload.read(READ_CHUNK_BYTES)
+        if not piece:
+            break
+        if len(buffer) + len(piece) > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        buffer += piece
+        digest.update(piece)
+    return memoryview(buffer), digest.hexdigest()
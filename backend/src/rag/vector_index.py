@@ -0,0 +1,197 @@
+"""
+Dense vector storage and top-k search for RAG chunks
+File: src/rag/vector_index.py
+
+Chunk embeddings for a document are kept as one contiguous float32 matrix.
+In MongoDB the matrix is split row-wise into blocks of raw bytes so that
+large documents stay well below the 16 MB BSON document limit.
+"""
+
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import Binary
+
+from src.db import rag_vectors_collection
+
+# 2048 rows * 1024 dims * 4 bytes = 8 MB per block, half the BSON limit
+ROWS_PER_BLOCK = 2048
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (indices, scores) of the k rows of `matrix` most similar to `query`.
+
+    Uses a single matrix-vector product and argpartition, so the cost is
+    O(n * dim) for the scoring plus O(k log k) for ordering the winners.
+    """
+    n = matrix.shape[0]
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    scores = matrix @ query
+    k = min(k, n)
+    if k < n:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(n)
+    order = candidates[np.argsort(scores[candidates])[::-1]]
+    return order, scores[order]
+
+
+def top_k_many(matrices: Dict[object, np.ndarray], query: np.ndarray, k: int) -> List[Tuple[object, int, float]]:
+    """
+    Global top-k over several per-document matrices.
+
+    Each document contributes at most k candidates, which are merged with a
+    heap. Returns (doc_id, ordinal, score) tuples, best first.
+    """
+    candidates = []
+    for doc_id, matrix in matrices.items():
+        indices, scores = top_k(matrix, query, k)
+        candidates.extend((float(s), doc_id, int(i)) for i, s in zip(indices, scores))
+    best = heapq.nlargest(k, candidates, key=lambda c: c[0])
+    return [(doc_id, ordinal, score) for score, doc_id, ordinal in best]
+
+
+class VectorCache:
+    """
+    Byte-bounded LRU of per-document embedding matrices.
+
+    Keeps hot users' matrices in process memory so that a query over
+    hundreds of documents costs one matrix product per document instead of
+    one MongoDB round-trip per document.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[object, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, doc_id, embedder_name: str) -> Optional[np.ndarray]:
+        key = (doc_id, embedder_name)
+        with self._lock:
+            matrix = self._entries.get(key)
+            if matrix is not None:
+                self._entries.move_to_end(key)
+            return matrix
+
+    def put(self, doc_id, embedder_name: str, matrix: np.ndarray) -> None:
+        key = (doc_id, embedder_name)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if matrix.nbytes > self.max_bytes:
+                return
+            self._entries[key] = matrix
+            self._bytes += matrix.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def discard(self, doc_ids: Iterable) -> None:
+        doc_ids = set(doc_ids)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in doc_ids]:
+                self._bytes -= self._entries.pop(key).nbytes
+
+
+vector_cache = VectorCache(int(os.getenv("RAG_VECTOR_CACHE_MB", "512")) * 1024 * 1024)
+
+
+async def store_vectors(user_id: str, doc_id, matrix: np.ndarray, embedder_name: str) -> None:
+    """Persist the chunk embedding matrix of one document."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    rows, dim = matrix.shape
+    blocks = []
+    for block_no, start in enumerate(range(0, rows, ROWS_PER_BLOCK)):
+        part = matrix[start:start + ROWS_PER_BLOCK]
+        blocks.append({
+            "user_id": user_id,
+            "doc_id": doc_id,
+            "block": block_no,
+            "rows": part.shape[0],
+            "dim": dim,
+            "embedder": embedder_name,
+            "data": Binary(part.tobytes()),
+            "created_at": datetime.utcnow(),
+        })
+
+    # Replace any vectors from a previous embedder
+    await rag_vectors_collection.delete_many({"doc_id": doc_id})
+    if blocks:
+        await rag_vectors_collection.insert_many(blocks)
+    vector_cache.put(doc_id, embedder_name, matrix)
+
+
+def _assemble(blocks: List[dict]) -> np.ndarray:
+    blocks.sort(key=lambda b: b["block"])
+    dim = blocks[0]["dim"]
+    parts = [
+        np.frombuffer(b["data"], dtype=np.float32).reshape(b["rows"], dim)
+        for b in blocks
+    ]
+    return parts[0] if len(parts) == 1 else np.vstack(parts)
+
+
+async def load_vectors_many(doc_ids: List, embedder_name: str) -> Dict[object, np.ndarray]:
+    """
+    Load embedding matrices for several documents.
+
+    Served from the in-process cache where possible; all misses are fetched
+    with a single MongoDB query. Documents with no vectors for
+    `embedder_name` are absent from the result, and the caller should
+    re-embed them.
+    """
+    found: Dict[object, np.ndarray] = {}
+    missing = []
+    for doc_id in doc_ids:
+        matrix = vector_cache.get(doc_id, embedder_name)
+        if matrix is not None:
+            found[doc_id] = matrix
+        else:
+            missing.append(doc_id)
+    if not missing:
+        return found
+
+    cursor = rag_vectors_collection.find(
+        {"doc_id": {"$in": missing}, "embedder": embedder_name},
+        {"_id": 0, "doc_id": 1, "block": 1, "rows": 1, "dim": 1, "data": 1},
+    )
+    by_doc: Dict[object, List[dict]] = {}
+    async for block in cursor:
+        by_doc.setdefault(block["doc_id"], []).append(block)
+
+    for doc_id, blocks in by_doc.items():
+        matrix = _assemble(blocks)
+        vector_cache.put(doc_id, embedder_name, matrix)
+        found[doc_id] = matrix
+    return found
+
+
+async def load_vectors(doc_id, embedder_name: str) -> Optional[np.ndarray]:
+    """
+    Load the embedding matrix of a document.
+
+    Returns None if the document has no vectors yet or they were produced by
+    a different embedder, in which case the caller should re-embed.
+    """
+    return (await load_vectors_many([doc_id], embedder_name)).get(doc_id)
+
+
+async def delete_vectors(query: dict, doc_ids: Iterable = ()) -> None:
+    """
+    Delete stored vectors matching a filter such as {"doc_id": ...}.
+
+    `doc_ids` lists the affected documents so they are also dropped from the
+    in-process cache.
+    """
+    await rag_vectors_collection.delete_many(query)
+    vector_cache.discard(doc_ids)
@@ -0,0 +1,67 @@
+"""
+Single-flight coalescing of identical concurrent calls
+File: src/singleflight.py
+
+When a query trends, many requests ask for the same search, quote or
+document answer at the same moment. `SingleFlight.do(key, fn)` runs `fn`
+once per key at a time: the first caller (the leader) starts it, and
+callers arriving while it is in flight await the same task instead of
+going upstream again. The key is forgotten as soon as the call finishes,
+so later calls run fresh (or hit a cache in front of this).
+
+The shared task is shielded: a caller that is cancelled (a tool timeout,
+a closed stream) stops waiting without cancelling the work the others
+are waiting for.
+
+Per group, metrics get singleflight.<name>.leader and .coalesced counters.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from src.metrics import metrics
+
+ENABLED = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key (one event loop)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the outcome as seen even if every waiter has gone
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await `fn()`, sharing one call among concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call (e.g. tool name and normalized arguments)
+            fn: Zero-argument coroutine function doing the work
+
+        Returns:
+            The result of the shared call; its exception is raised to every caller
+        """
+        if not ENABLED:
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        else:
+            metrics.incr(f"singleflight.{self.name}.leader")
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
@@ -0,0 +1,170 @@
+"""
+Batched stock quotes with a per-symbol cache
+File: src/stock_quotes.py
+
+`get_quotes(symbols)` answers a whole list of tickers with one
+yf.download call for the symbols that are not cached, instead of a
+yf.Ticker and a history download per symbol. The latest daily bar of each
+symbol is cached on its own, so "compare AAPL, MSFT, TCS.NS" followed by
+"and AAPL?" costs one upstream call in total.
+
+How long a quote stays fresh depends on its exchange (from the ticker
+suffix; no suffix means a US listing):
+
+  - while the market is open: STOCK_QUOTE_TTL_SECONDS (prices move)
+  - while it is closed: until the next session opens (the last close will
+    not change), capped at STOCK_QUOTE_CLOSED_TTL_SECONDS
+
+Exchange holidays are not modelled; on those days a closed-market quote
+simply expires at the regular opening time and is fetched again.
+
+Metrics: stocks.download timing and stocks.download.errors,
+stocks.symbols_per_download, and the average of stocks.quote_cache_hit
+(1 = hit, 0 = miss) per symbol.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime, time as clock, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytz
+import yfinance as yf
+
+from src.cache import LRUCache
+from src.metrics import metrics
+from src.singleflight import SingleFlight
+
+QUOTE_TTL_SECONDS = float(os.getenv("STOCK_QUOTE_TTL_SECONDS", "60"))
+CLOSED_TTL_SECONDS = float(os.getenv("STOCK_QUOTE_CLOSED_TTL_SECONDS", str(12 * 3600)))
+CACHE_SIZE = int(os.getenv("STOCK_QUOTE_CACHE_SIZE", "5000"))
+# Most symbols one request may ask for
+MAX_SYMBOLS = int(os.getenv("STOCK_QUOTE_MAX_SYMBOLS", "25"))
+
+
+@dataclass(frozen=True)
+class Market:
+    timezone: str
+    opens: clock
+    closes: clock
+
+
+US = Market("America/New_York", clock(9, 30), clock(16, 0))
+MARKETS: Dict[str, Market] = {
+    ".NS": Market("Asia/Kolkata", clock(9, 15), clock(15, 30)),
+    ".BO": Market("Asia/Kolkata", clock(9, 15), clock(15, 30)),
+    ".L": Market("Europe/London", clock(8, 0), clock(16, 30)),
+    ".DE": Market("Europe/Berlin", clock(9, 0), clock(17, 30)),
+    ".PA": Market("Europe/Paris", clock(9, 0), clock(17, 30)),
+    ".T": Market("Asia/Tokyo", clock(9, 0), clock(15, 0)),
+    ".HK": Market("Asia/Hong_Kong", clock(9, 30), clock(16, 0)),
+    ".TO": Market("America/Toronto", clock(9, 30), clock(16, 0)),
+}
+
+
+@dataclass(frozen=True)
+class Quote:
+    symbol: str
+    price: float
+    as_of: datetime
+
+
+def market_for(symbol: str) -> Market:
+    suffix = symbol[symbol.rfind("."):] if "." in symbol else ""
+    return MARKETS.get(suffix.upper(), US)
+
+
+def quote_ttl(symbol: str, now: Optional[datetime] = None) -> float:
+    """Seconds a quote for `symbol` stays fresh, given its market's hours"""
+    market = market_for(symbol)
+    tz = pytz.timezone(market.timezone)
+    local = (now or datetime.now(pytz.utc)).astimezone(tz)
+    is_weekday = local.weekday() < 5
+    if is_weekday and market.opens <= local.time() < market.closes:
+        return QUOTE_TTL_SECONDS
+
+    # Next weekday opening after now
+    day = local.date() if is_weekday and local.time() < market.opens else local.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    opening = tz.localize(datetime.combine(day, market.opens))
+    return max(QUOTE_TTL_SECONDS, min((opening - local).total_seconds(), CLOSED_TTL_SECONDS))
+
+
+def normalize_symbols(tickers) -> List[str]:
+    """'aapl, MSFT tcs.ns' or ['AAPL', 'msft'] -> ['AAPL', 'MSFT', 'TCS.NS'], without duplicates"""
+    if isinstance(tickers, str):
+        tickers = tickers.replace(",", " ").split()
+    return list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+
+
+_quotes = LRUCache(max_entries=CACHE_SIZE, ttl_seconds=QUOTE_TTL_SECONDS)
+_download_flight = SingleFlight("stocks.download")
+
+
+def _download(symbols: Tuple[str, ...]) -> Dict[str, Quote]:
+    """One bulk download of the last few daily bars; symbols without data are left out"""
+    # A few days back, so markets closed today (weekend, holiday) still have a last close
+    data = yf.download(
+        list(symbols), period="5d", interval="1d", group_by="column",
+        auto_adjust=False, progress=False, threads=False,
+    )
+    if data is None or data.empty:
+        return {}
+    closes = data["Close"]
+    quotes: Dict[str, Quote] = {}
+    for symbol in symbols:
+        if hasattr(closes, "columns"):
+            if symbol not in closes.columns:
+                continue
+            series = closes[symbol].dropna()
+        else:
+            series = closes.dropna()
+        if series.empty or not series.iloc[-1]:
+            continue
+        as_of = series.index[-1].to_pydatetime()
+        quotes[symbol] = Quote(symbol, float(series.iloc[-1]), as_of)
+    return quotes
+
+
+async def _fetch(symbols: Tuple[str, ...]) -> Dict[str, Quote]:
+    metrics.record("stocks.symbols_per_download", len(symbols))
+    try:
+        with metrics.timer("stocks.download"):
+            # yfinance is synchronous; keep it off the event loop
+            quotes = await asyncio.to_thread(_download, symbols)
+    except Exception:
+        metrics.incr("stocks.download.errors")
+        raise
+    for quote in quotes.values():
+        _quotes.set(quote.symbol, quote, ttl_seconds=quote_ttl(quote.symbol))
+    return quotes
+
+
+async def get_quotes(symbols: Iterable[str]) -> Dict[str, Quote]:
+    """
+    Latest quotes for `symbols`: cached ones as they are, the rest from one bulk download.
+
+    Args:
+        symbols: Normalized ticker symbols (see normalize_symbols)
+
+    Returns:
+        Quote per symbol; symbols without data are missing
+
+    Raises:
+        Exception: if the download fails
+    """
+    quotes: Dict[str, Quote] = {}
+    missing: List[str] = []
+    for symbol in symbols:
+        quote = _quotes.get(symbol)
+        metrics.record("stocks.quote_cache_hit", 0 if quote is None else 1)
+        if quote is None:
+            missing.append(symbol)
+        else:
+            quotes[symbol] = quote
+    if missing:
+        key = tuple(sorted(missing))
+        quotes.update(await _download_flight.do(key, lambda: _fetch(key)))
+    return quotes
@@ -0,0 +1,110 @@
+"""
+TTL cache for external-data tool results
+File: src/tool_cache.py
+
+Weather, search and time lookups repeat a lot across users within
+minutes. `cached_tool` wraps a tool's coroutine so that a result for the
+same normalized arguments is reused for the tool's TTL:
+
+    current_time_tool     5 s
+    weather_tool          10 min
+    tavily_search_tool    6 h
+
+(each overridable with TOOL_CACHE_TTL_<TOOL_NAME>). currency_converter and
+stock_price_tool keep their own data instead: a local rate table
+(src/fx_rates.py) and per-symbol quotes (src/stock_quotes.py).
+
+Every tool has its own TieredCache (src/cache.py): an in-process LRU, plus
+the shared Mongo tier when TOOL_CACHE_SHARED is on so several workers
+reuse each other's results. A tool reports a failure by raising
+ToolFailure: its message is returned as the tool's answer but never
+cached. On a miss,
+identical calls already in flight are joined rather than repeated
+(src/singleflight.py), so a burst of the same lookup goes upstream once;
+this applies with the cache off too.
+
+Hit rates per tool are in metrics as the average of tools.<name>.cache_hit
+(1 = hit, 0 = miss), next to the tiered cache's hit/miss counters;
+tools.<name>.failures counts ToolFailure answers.
+"""
+
+import functools
+import inspect
+import os
+import unicodedata
+from typing import Any, Dict
+
+from src.cache import TieredCache, make_key
+from src.metrics import metrics
+from src.singleflight import SingleFlight
+
+ENABLED = os.getenv("TOOL_CACHE", "true").lower() == "true"
+CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "2000"))
+SHARED = os.getenv("TOOL_CACHE_SHARED", "false").lower() == "true"
+
+DEFAULT_TTLS: Dict[str, float] = {
+    "current_time_tool": 5,
+    "weather_tool": 600,
+    "tavily_search_tool": 6 * 3600,
+}
+
+
+class ToolFailure(Exception):
+    """Raised by a cached tool that could not answer; the message is shown instead of a result"""
+
+
+def ttl_for(name: str) -> float:
+    return float(os.getenv(f"TOOL_CACHE_TTL_{name.upper()}", DEFAULT_TTLS.get(name, 300)))
+
+
+def normalize_argument(value: Any) -> Any:
+    """Same key for trivially different spellings: case, width, whitespace"""
+    if isinstance(value, str):
+        return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def is_cacheable(result: Any) -> bool:
+    return isinstance(result, str) and bool(result.strip())
+
+
+def cached_tool(name: str):
+    """Decorator for a tool's async function; put it under @tool"""
+
+    def decorate(func):
+        signature = inspect.signature(func)
+        cache = TieredCache(f"tool.{name}", CACHE_SIZE, ttl_for(name), shared=SHARED)
+        flight = SingleFlight(f"tool.{name}")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(name, {k: normalize_argument(v) for k, v in bound.arguments.items()})
+
+            async def load():
+                result = await func(*args, **kwargs)
+                if ENABLED and is_cacheable(result):
+                    await cache.set(key, result)
+                return result
+
+            if ENABLED:
+                result = await cache.get(key)
+                metrics.record(f"tools.{name}.cache_hit", 0 if result is None else 1)
+                if result is not None:
+                    return result
+            try:
+                return await flight.do(key, load)
+            except ToolFailure as e:
+                metrics.incr(f"tools.{name}.failures")
+                return str(e)
+
+        wrapper.cache = cache
+        wrapper.flight = flight
+        return wrapper
+
+    return decorate
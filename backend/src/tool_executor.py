@@ -0,0 +1,143 @@
+"""
+Parallel tool execution node
+File: src/tool_executor.py
+
+Replaces the plain ToolNode in DevGraph. All tool calls of one assistant
+turn run concurrently:
+
+  - async tools run on the event loop: the RAG tools and the weather,
+    currency, stock, search, time and file tools, which make their HTTP
+    calls through the pooled client in src/http_client.py (blocking
+    library calls inside them, such as yfinance or the Supabase upload,
+    are offloaded with asyncio.to_thread);
+  - the remaining sync tools (calculator, YouTube transcripts) run on a
+    bounded thread pool, so a burst of slow calls cannot take over the
+    default executor, with the caller's contextvars (e.g. the RAG user
+    id) copied into the worker thread;
+  - every call gets a deadline (TOOL_TIMEOUT_SECONDS, or a per-tool value
+    from TOOL_TIMEOUTS); a call that misses it is answered with an error
+    ToolMessage while the results of the other calls are kept, so the
+    agent can still answer from partial results.
+
+A sync call that times out keeps its pool thread until the underlying
+request returns; its result is discarded.
+"""
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from src.metrics import metrics
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+# Deadlines for tools that are slower (or faster) than the default
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "current_time_tool": 2,
+    "calculator_tool": 2,
+    "read_file": 5,
+    "write_file": 5,
+    "weather_tool": 10,
+    "currency_converter": 10,
+    "stock_price_tool": 15,
+    "tavily_search_tool": 20,
+    "youtube_summary_tool": 60,
+    "query_documents": 60,
+    "process_and_store_file": 120,
+}
+
+ERROR_TEMPLATE = "Error: {error}\n Please fix your mistakes."
+TIMEOUT_TEMPLATE = "Error: {name} did not finish within {seconds:g} seconds. Answer without this result or try again later."
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_tool_pool() -> ThreadPoolExecutor:
+    """Lazily create the shared pool for sync tools"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+    return _pool
+
+
+def shutdown_tool_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def tool_timeout(name: str) -> float:
+    env = os.getenv(f"TOOL_TIMEOUT_{name.upper()}")
+    if env:
+        return float(env)
+    return TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_SECONDS)
+
+
+class ParallelToolNode:
+    """Graph node running the last AI message's tool calls concurrently"""
+
+    def __init__(self, tools: Sequence[BaseTool]):
+        self.tools_by_name: Dict[str, BaseTool] = {t.name: t for t in tools}
+
+    async def _call(self, tool: BaseTool, call: dict, config: RunnableConfig) -> ToolMessage:
+        tool_input = {**call, "type": "tool_call"}
+        if tool.coroutine is not None:
+            return await tool.ainvoke(tool_input, config)
+        # Run in the caller's context so contextvars (user id) and callbacks carry over
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_tool_pool(), context.run, tool.invoke, tool_input, config)
+
+    async def _run_one(self, call: dict, config: RunnableConfig) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            metrics.incr("tools.unknown")
+            return ToolMessage(
+                content=f"Error: {name} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+                name=name, tool_call_id=call["id"], status="error",
+            )
+
+        seconds = tool_timeout(name)
+        try:
+            with metrics.timer(f"tools.{name}"):
+                message = await asyncio.wait_for(self._call(tool, call, config), timeout=seconds)
+        except asyncio.TimeoutError:
+            metrics.incr(f"tools.{name}.timeout")
+            print(f"⏱️ Tool {name} timed out after {seconds:g}s")
+            return ToolMessage(
+                content=TIMEOUT_TEMPLATE.format(name=name, seconds=seconds),
+                name=name, tool_call_id=call["id"], status="error",
+            )
+        except Exception as e:
+            metrics.incr(f"tools.{name}.error")
+            print(f"❌ Tool {name} failed: {e}")
+            return ToolMessage(
+                content=ERROR_TEMPLATE.format(error=repr(e)),
+                name=name, tool_call_id=call["id"], status="error",
+            )
+
+        if not isinstance(message, ToolMessage):
+            message = ToolMessage(content=str(message), name=name, tool_call_id=call["id"])
+        elif not isinstance(message.content, (str, list)):
+            message.content = str(message.content)
+        return message
+
+    async def run(self, state, config: RunnableConfig):
+        messages = state["messages"]
+        last = messages[-1] if messages else None
+        if not isinstance(last, AIMessage) or not last.tool_calls:
+            return {"messages": []}
+
+        calls: List[dict] = list(last.tool_calls)
+        metrics.record("tools.calls_per_turn", len(calls))
+        results = await asyncio.gather(*(self._run_one(call, config) for call in calls))
+        return {"messages": list(results)}
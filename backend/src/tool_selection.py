@@ -0,0 +1,158 @@
+"""
+Per-request tool subsets
+File: src/tool_selection.py
+
+Binding all tools sends every JSON schema, and a system prompt listing
+them all, with every LLM call. The router instead picks the tool groups a
+request can plausibly need:
+
+    core      time, calculator, web search (always bound)
+    files     write_file / read_file
+    media     YouTube summaries
+    finance   currency converter, stock prices
+    weather   weather
+    rag       the document tools - when the user has stored documents or
+              the request is about a file/document
+
+Groups are chosen from the latest few user messages with keyword rules.
+The LLM bound to a subset, and the prompt describing it, are built once
+per subset and cached. The tokens a subset saves compared with binding
+everything are reported as tools.prompt_tokens_saved.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agents.study_agent import build_system_prompt
+from src.cache import LRUCache
+from src.db import rag_documents_collection
+from src.metrics import metrics
+from src.rag.chunker import get_encoding
+
+ENABLED = os.getenv("TOOL_SELECTION", "true").lower() == "true"
+# User messages (latest first) whose words select groups, so follow-ups keep their tools
+CONTEXT_MESSAGES = int(os.getenv("TOOL_SELECTION_CONTEXT_MESSAGES", "3"))
+
+CORE = "core"
+TOOL_GROUPS: Dict[str, Tuple[str, ...]] = {
+    CORE: ("current_time_tool", "calculator_tool", "tavily_search_tool"),
+    "files": ("write_file", "read_file"),
+    "media": ("youtube_summary_tool",),
+    "finance": ("currency_converter", "stock_price_tool"),
+    "weather": ("weather_tool",),
+    "rag": ("process_and_store_file", "query_documents", "list_user_files",
+            "delete_user_file", "delete_all_user_files"),
+}
+
+GROUP_KEYWORDS = {
+    "files": re.compile(r"\b(?:save|write|read|open|note|notes|file|files|txt)\b"),
+    "media": re.compile(r"youtube|youtu\.be|\bvideo"),
+    "finance": re.compile(
+        r"\b(?:stocks?|shares?|ticker|market|nasdaq|nyse|currenc(?:y|ies)|exchange rate|convert|forex|"
+        r"usd|eur|inr|gbp|jpy|price|dollars?|euros?|rupees?)\b|\$"
+    ),
+    "weather": re.compile(r"\b(?:weather|temperature|forecast|rain(?:ing|y)?|sunny|humid(?:ity)?|wind|snow|climate)\b"),
+    "rag": re.compile(r"\b(?:documents?|docs?|pdfs?|files?|uploads?|uploaded|paper|report|summari[sz]e)\b"),
+}
+
+# Users known to have stored documents; negative answers are not cached so a
+# fresh upload is picked up on the next request
+_has_documents = LRUCache(max_entries=10000, ttl_seconds=600)
+
+
+async def user_has_documents(user_id: Optional[str]) -> bool:
+    if not user_id:
+        return False
+    if _has_documents.get(user_id):
+        return True
+    found = await rag_documents_collection.find_one({"user_id": user_id}, {"_id": 1})
+    if found:
+        _has_documents.set(user_id, True)
+    return bool(found)
+
+
+def _recent_user_text(messages) -> str:
+    texts: List[str] = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            texts.append(message.content.lower())
+            if len(texts) >= CONTEXT_MESSAGES:
+                break
+    return "\n".join(texts)
+
+
+async def select_groups(messages, user_id: Optional[str]) -> Tuple[str, ...]:
+    """Tool groups for a request, sorted (a stable key for the bound-LLM cache)"""
+    text = _recent_user_text(messages)
+    groups = {CORE}
+    for group, pattern in GROUP_KEYWORDS.items():
+        if pattern.search(text):
+            groups.add(group)
+    if "rag" not in groups and await user_has_documents(user_id):
+        groups.add("rag")
+    return tuple(sorted(groups))
+
+
+class ToolSelector:
+    """Caches the LLM bound to each tool subset, with its system prompt"""
+
+    def __init__(self, llm, tools: Iterable):
+        self.llm = llm
+        self.tools = list(tools)
+        self._lock = threading.Lock()
+        self._bound: Dict[Tuple[str, ...], Tuple[object, SystemMessage, Optional[int]]] = {}
+        # Tokens of binding everything; counted on first use, since the
+        # encoding may need a download that must not hold up startup
+        self._full_tokens: Optional[int] = None
+
+    @staticmethod
+    def _prompt_tokens(tools: List, prompt: str) -> Optional[int]:
+        """Tokens of the tool schemas plus prompt, or None if the encoding is unavailable"""
+        try:
+            schemas = json.dumps([convert_to_openai_tool(t) for t in tools])
+            encoding = get_encoding()
+            return len(encoding.encode_ordinary(schemas)) + len(encoding.encode_ordinary(prompt))
+        except Exception as e:
+            print(f"⚠️ Skipping tool prompt token accounting: {e}")
+            return None
+
+    def _tokens_saved(self, tools: List, prompt: str) -> Optional[int]:
+        if self._full_tokens is None:
+            self._full_tokens = self._prompt_tokens(self.tools, build_system_prompt())
+        if self._full_tokens is None:
+            return None
+        subset = self._prompt_tokens(tools, prompt)
+        return None if subset is None else self._full_tokens - subset
+
+    def tools_for(self, groups: Iterable[str]) -> List:
+        names = {name for group in groups for name in TOOL_GROUPS.get(group, ())}
+        return [t for t in self.tools if t.name in names]
+
+    def bound(self, groups: Tuple[str, ...]) -> Tuple[object, SystemMessage]:
+        """LLM bound to the tools of `groups`, and the system prompt listing them"""
+        entry = self._bound.get(groups)
+        if entry is None:
+            with self._lock:
+                entry = self._bound.get(groups)
+                if entry is None:
+                    tools = self.tools_for(groups)
+                    prompt = build_system_prompt(t.name for t in tools)
+                    try:
+                        llm = self.llm.bind_tools(tools)
+                    except Exception:
+                        # If binding fails (different runtime versions), fall back to raw llm
+                        llm = self.llm
+                    saved = self._tokens_saved(tools, prompt)
+                    entry = self._bound[groups] = (llm, SystemMessage(content=prompt), saved)
+                    metrics.incr("tools.bound_variants")
+        llm, system_message, saved = entry
+        if saved is not None:
+            metrics.record("tools.prompt_tokens_saved", saved)
+            metrics.incr("tools.prompt_tokens_saved_total", saved)
+        return llm, system_message
@@ -1,20 +1,35 @@
+from typing import List, Union
 
-import requests
 from langchain.tools import tool
 
+from src import fx_rates
+
 
 # ---------------------------------------------------------
 # 5. Currency Converter Tool
 # ---------------------------------------------------------
 @tool
-def currency_converter(from_currency: str, to_currency: str, amount: float) -> str:
+async def currency_converter(from_currency: str, to_currency: Union[str, List[str]],
+                             amount: Union[float, List[float]]) -> str:
     """
     Converts currency example input: 'USD', 'INR', 10
+    Several targets and amounts can be converted in one call,
+    e.g. 'USD', ['INR', 'EUR'], [10, 250]
     """
     try:
-        url = f"https://api.exchangerate-api.com/v4/latest/{from_currency.upper()}"
-        data = requests.get(url).json()
-        rate = data["rates"][to_currency.upper()]
-        return f"{amount} {from_currency} = {round(amount * rate, 2)} {to_currency}"
+        table = await fx_rates.get_table()
+        targets = fx_rates.parse_codes(to_currency)
+        amounts = amount if isinstance(amount, list) else [amount]
+        if not targets or not amounts:
+            return "Conversion failed: no target currency or amount given."
+        converted = table.convert(amounts, from_currency, targets)
+    except fx_rates.UnknownCurrency as e:
+        return f"Conversion failed: {e}."
     except:
         return "Conversion failed."
+
+    lines = []
+    for value, row in zip(amounts, converted):
+        results = ", ".join(f"{round(float(x), 2)} {code}" for x, code in zip(row, targets))
+        lines.append(f"{value} {from_currency.strip().upper()} = {results}")
+    return "\n".join(lines)
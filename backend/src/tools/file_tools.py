@@ -1,6 +1,7 @@
 # src/tools/file_tools.py
 
 from langchain.tools import tool
+import asyncio
 import os
 import sys
 
@@ -8,10 +9,11 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from src.upload_helper import upload_to_supabase
+from src import http_client
 
 
 @tool
-def write_file(filename: str, content: str, username: str = None) -> str:
+async def write_file(filename: str, content: str, username: str = None) -> str:
     """
     Create a file and upload to Supabase (if not exists already).
     Checks if filename already exists and prevents overwrite.
@@ -32,8 +34,7 @@ def write_file(filename: str, content: str, username: str = None) -> str:
         file_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{filename}"
 
         # Check if file already exists
-        import requests
-        check = requests.get(file_url)
+        check = await http_client.get(file_url)
 
         if check.status_code == 200:
             # File exists already
@@ -47,7 +48,8 @@ def write_file(filename: str, content: str, username: str = None) -> str:
         content_to_write = "" if content is None else str(content)
         file_bytes = content_to_write.encode("utf-8")
 
-        download_url = upload_to_supabase(file_bytes, filename)
+        # The Supabase SDK is synchronous; keep it off the event loop
+        download_url = await asyncio.to_thread(upload_to_supabase, file_bytes, filename)
 
         return f"✅ File created successfully: {filename}. Download link: {download_url}"
 
@@ -55,7 +57,7 @@ def write_file(filename: str, content: str, username: str = None) -> str:
         return f"❌ Error writing file {filename}: {e}"
 
 @tool
-def read_file(filename: str) -> str:
+async def read_file(filename: str) -> str:
     """
     Read content from a file stored in Supabase by fetching it.
     Args:
@@ -69,8 +71,7 @@ def read_file(filename: str) -> str:
         BUCKET_NAME = os.getenv("SUPABASE_BUCKET", "devmate")
         read_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{filename}"
         
-        import requests
-        res = requests.get(read_url)
+        res = await http_client.get(read_url)
         if res.status_code == 200:
             return res.text
         else:
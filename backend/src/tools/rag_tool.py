@@ -3,15 +3,32 @@ RAG Tool for file processing and question answering
 File: src/tools/rag_tool.py
 """
 
+import asyncio
 import base64
+import hashlib
 import io
 import os
 import re
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+import unicodedata
+from typing import Optional, List, Dict, Any, Tuple, Union, Callable, Awaitable
+from datetime import datetime, timedelta
+from bson import ObjectId
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from src.db import rag_documents_collection  # Import from centralized db
+from src.rag.embeddings import get_embedder
+from src.rag.vector_index import top_k_many, store_vectors, load_vectors_many, delete_vectors
+from src.rag import bm25
+from src.rag import chunk_store
+from src.rag.chunker import TokenChunker, chunk_text_by_tokens, chunker_name
+from src.rag.extraction import iter_pdf_pages
+from src.rag import extraction_cache
+from src.rag import jobs, summaries
+from src.rag import context as context_packing
+from src.rag.uploads import MAX_UPLOAD_BYTES, UploadTooLarge
+from src.metrics import metrics
+from src.cache import TieredCache, make_key
+from src.singleflight import SingleFlight
+from src.llm_registry import get_chat_model
 import PyPDF2
 from PIL import Image
 import pytesseract
@@ -23,41 +40,12 @@ current_user_id: ContextVar[Optional[str]] = ContextVar('current_user_id', defau
 
 # Helper Functions
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-    """Split text into overlapping chunks"""
-    chunks = []
-    sentences = re.split(r'[.!?]+', text)
-    
-    current_chunk = ""
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            # Add overlap by keeping last part of chunk
-            words = current_chunk.split()
-            overlap_text = " ".join(words[-overlap:]) if len(words) > overlap else current_chunk
-            current_chunk = overlap_text + " " + sentence
-        else:
-            current_chunk += " " + sentence
-    
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
-
 def extract_text_from_pdf(file_data: bytes) -> str:
     """Extract text from PDF file"""
     try:
         pdf_file = io.BytesIO(file_data)
         pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        return "\n".join(page.extract_text() for page in pdf_reader.pages).strip()
     except Exception as e:
         raise Exception(f"Error extracting PDF text: {str(e)}")
 
@@ -73,15 +61,12 @@ def extract_text_from_image_ocr(file_data: bytes) -> str:
         return ""
 
 
-def extract_text_with_openai_vision(file_data: bytes, file_type: str) -> str:
+async def extract_text_with_openai_vision(file_data: bytes, file_type: str) -> str:
     """Use OpenAI Vision to extract text from images"""
     try:
         base64_data = base64.b64encode(file_data).decode('utf-8')
         
-        llm = ChatOpenAI(
-            model="gpt-4o",  # GPT-4 Vision model
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        llm = get_chat_model("gpt-4o")  # GPT-4 Vision model
         
         from langchain_core.messages import HumanMessage
         
@@ -100,14 +85,14 @@ def extract_text_with_openai_vision(file_data: bytes, file_type: str) -> str:
             ]
         )
         
-        response = llm.invoke([message])
+        response = await llm.ainvoke([message])
         return response.content
     except Exception as e:
         raise Exception(f"Error with OpenAI vision extraction: {str(e)}")
 
 
 def simple_similarity_search(chunks: List[str], query: str, top_k: int = 3) -> List[str]:
-    """Simple keyword-based similarity search"""
+    """Simple keyword-based similarity search (legacy scorer, kept as a benchmark baseline)"""
     query_lower = query.lower()
     query_words = set(query_lower.split())
     # Keep words longer than 2 characters, but also include important short words
@@ -138,8 +123,363 @@ def simple_similarity_search(chunks: List[str], query: str, top_k: int = 3) -> L
         return chunks[:top_k] if len(chunks) >= top_k else chunks
 
 
+async def embed_chunks(chunks: List[str]):
+    """Embed chunks off the event loop and return (matrix, embedder name)"""
+    embedder = get_embedder()
+    matrix = await asyncio.to_thread(embedder.embed_documents, chunks)
+    return matrix, embedder.name
+
+
+# Fields needed to rank and cite a document, without its text
+DOCUMENT_META_FIELDS = {
+    "_id": 1, "user_id": 1, "file_name": 1, "file_type": 1, "file_size": 1,
+    "chunk_count": 1, "index_tokens": 1, "chunk_storage": 1, "is_latest": 1,
+    "uploaded_at": 1, "content_hash": 1, "summary.status": 1,
+}
+
+
+# Answers of query_documents, keyed by the documents' content, the question
+# and ANSWER_PROMPT_VERSION (bump it whenever the prompts change)
+ANSWER_PROMPT_VERSION = "1"
+answer_cache = TieredCache(
+    "rag.answers",
+    max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1000")),
+    ttl_seconds=float(os.getenv("RAG_ANSWER_CACHE_TTL_SECONDS", "86400")),
+    shared=os.getenv("RAG_ANSWER_CACHE_SHARED", "false").lower() == "true",
+)
+# Cache misses for the same key while an answer is being generated wait for it
+answer_flight = SingleFlight("rag.answers")
+
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and spacing-insensitive form of a question"""
+    return " ".join(re.findall(r"\w+", unicodedata.normalize("NFKC", question).lower()))
+
+
+def answer_cache_key(question: str, mode: str, documents: List[Dict[str, Any]]) -> str:
+    """Cache key of an answer over `documents`; changes whenever any of them does"""
+    fingerprint = sorted(
+        (d.get("content_hash") or str(d["_id"]), d["file_name"], (d.get("summary") or {}).get("status") or "")
+        for d in documents
+    )
+    settings = [context_packing.CONTEXT_TOKENS, context_packing.CANDIDATES] if mode == "qa" else []
+    return make_key(ANSWER_PROMPT_VERSION, mode, settings, fingerprint, normalize_question(question))
+
+
+async def load_user_documents(user_id: str, file_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Return metadata of the user's documents, newest first.
+
+    If file_name is given, exact matches win; otherwise documents whose name
+    contains it (case-insensitive) are returned.
+    """
+    cursor = rag_documents_collection.find(
+        {"user_id": user_id}, DOCUMENT_META_FIELDS
+    ).sort("uploaded_at", -1)
+    documents = await cursor.to_list(length=None)
+
+    if file_name:
+        exact = [d for d in documents if d["file_name"] == file_name]
+        if exact:
+            return exact
+        needle = file_name.lower()
+        documents = [d for d in documents if needle in d["file_name"].lower()]
+    return documents
+
+
+async def vector_search(user_id: str, documents: List[Dict[str, Any]], query: str, top_k: int = 5) -> List[Tuple[Any, int]]:
+    """Return (doc_id, ordinal) of the top_k chunks across documents by embedding similarity"""
+    embedder = get_embedder()
+    doc_ids = [d["_id"] for d in documents]
+    matrices = await load_vectors_many(doc_ids, embedder.name)
+
+    missing = [d for d in documents if matrices.get(d["_id"]) is None
+               or matrices[d["_id"]].shape[0] != d.get("chunk_count", 0)]
+    if missing:
+        # Documents stored before vector retrieval (or with another embedder)
+        # are embedded once here and backfilled.
+        chunks_by_doc = await chunk_store.load_all([d["_id"] for d in missing])
+        for doc_id, chunks in chunks_by_doc.items():
+            matrix, embedder_name = await embed_chunks(chunks)
+            await store_vectors(user_id, doc_id, matrix, embedder_name)
+            matrices[doc_id] = matrix
+
+    query_vector = await asyncio.to_thread(embedder.embed_query, query)
+    results = await asyncio.to_thread(top_k_many, matrices, query_vector, top_k)
+    return [(doc_id, ordinal) for doc_id, ordinal, _ in results]
+
+
+async def keyword_search(user_id: str, documents: List[Dict[str, Any]], query: str, top_k: int = 5) -> List[Tuple[Any, int]]:
+    """Return (doc_id, ordinal) of the top_k chunks across documents by BM25"""
+    unindexed = [d for d in documents if d.get("index_tokens") in (None, INDEXING)]
+    if unindexed:
+        # Documents stored before the inverted index existed are indexed once
+        # here, by whichever query claims them first
+        claimed = [d for d in unindexed if await claim_for_indexing(d["_id"])]
+        chunks_by_doc = await chunk_store.load_all([d["_id"] for d in claimed]) if claimed else {}
+        for document in claimed:
+            chunks = chunks_by_doc.get(document["_id"], [])
+            postings, total_tokens = await asyncio.to_thread(bm25.build_postings, chunks)
+            await bm25.store_postings(user_id, document["_id"], postings, len(chunks), total_tokens)
+            await rag_documents_collection.update_one(
+                {"_id": document["_id"]},
+                {"$set": {"index_tokens": total_tokens}, "$unset": {"index_claimed_at": ""}}
+            )
+            document["index_tokens"] = total_tokens
+
+    doc_sizes = {d["_id"]: d.get("chunk_count", 0) for d in documents}
+    results = await bm25.search(user_id, query, doc_sizes, top_k=top_k)
+    return [(doc_id, ordinal) for doc_id, ordinal, _ in results]
+
+
+# index_tokens of a document that a query is indexing right now
+INDEXING = -1
+# A claim older than this is taken to be from a query that died
+INDEX_CLAIM_SECONDS = 300
+
+
+async def claim_for_indexing(doc_id) -> bool:
+    """Whether this caller gets to index the document; at most one does at a time"""
+    now = datetime.utcnow()
+    result = await rag_documents_collection.update_one(
+        {
+            "_id": doc_id,
+            "$or": [
+                {"index_tokens": None},
+                {"index_tokens": INDEXING, "index_claimed_at": {"$lt": now - timedelta(seconds=INDEX_CLAIM_SECONDS)}},
+            ],
+        },
+        {"$set": {"index_tokens": INDEXING, "index_claimed_at": now}},
+    )
+    return result.modified_count == 1
+
+
+def fuse_rankings(rankings: List[List[Any]], top_k: int, k: int = 60) -> List[Any]:
+    """Reciprocal rank fusion of several best-first rankings"""
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+async def hybrid_search(user_id: str, documents: List[Dict[str, Any]], query: str, top_k: int = 5) -> List[Tuple[Any, int]]:
+    """Return (doc_id, ordinal) of the top_k chunks across documents, fusing vector and BM25 rankings"""
+    # Over-fetch from each ranker so fusion has candidates to agree on
+    vector_ranking, keyword_ranking = await asyncio.gather(
+        vector_search(user_id, documents, query, top_k=top_k * 4),
+        keyword_search(user_id, documents, query, top_k=top_k * 4),
+    )
+    return fuse_rankings([vector_ranking, keyword_ranking], top_k)
+
+
+class ExtractionError(Exception):
+    """Raised when no usable text can be extracted from an upload"""
+
+
+async def extract_and_chunk(file_bytes: Union[bytes, memoryview], file_type: str) -> Tuple[str, List[str]]:
+    """
+    Extract text from raw file bytes and split it into chunks.
+
+    Raises:
+        ExtractionError: with a user-facing message if extraction fails
+    """
+    extracted_text = ""
+    chunks = None
+    
+    if file_type == 'application/pdf':
+        # Pages are extracted in a process pool and chunked as they arrive
+        try:
+            pages = []
+            chunker = TokenChunker()
+            chunks = []
+            async for page in iter_pdf_pages(file_bytes):
+                pages.append(page)
+                chunks.extend(chunker.feed(page + "\n"))
+            chunks.extend(chunker.close())
+            extracted_text = "\n".join(pages).strip()
+        except Exception as e:
+            raise ExtractionError(f"Error extracting PDF text: {str(e)}")
+            
+    elif file_type.startswith('image/'):
+        # Use OpenAI Vision for image processing
+        try:
+            extracted_text = await extract_text_with_openai_vision(file_bytes, file_type)
+            if not extracted_text.strip():
+                # Fallback to OCR if vision fails
+                extracted_text = await asyncio.to_thread(extract_text_from_image_ocr, file_bytes)
+        except Exception as e:
+            raise ExtractionError(f"Error extracting image text: {str(e)}")
+        
+    elif file_type.startswith('text/') or file_type == 'application/json':
+        try:
+            extracted_text = str(file_bytes, 'utf-8')
+        except Exception as e:
+            raise ExtractionError(f"Error decoding text file: {str(e)}")
+        
+    else:
+        raise ExtractionError(f"Unsupported file type: {file_type}. Supported types: PDF, images (JPG, PNG), text files, JSON.")
+    
+    if not extracted_text.strip():
+        raise ExtractionError("No text could be extracted from the file. The file might be empty or corrupted.")
+    
+    if chunks is None:
+        chunks = await asyncio.to_thread(chunk_text_by_tokens, extracted_text)
+    return extracted_text, chunks
+
+
 # LangChain Tools
 
+async def ingest_document(file_bytes: Union[bytes, memoryview], file_name: str, file_type: str,
+                          user_id: str, content_hash: Optional[str] = None,
+                          on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+                          doc_id: Optional[ObjectId] = None,
+                          fence: Optional[Callable[[], Awaitable[None]]] = None) -> str:
+    """
+    Extract, chunk, embed, index and store one uploaded file.
+
+    This is the ingestion pipeline shared by the background upload jobs
+    (src/rag/jobs.py) and ingest_file. Unlike ingest_file it raises on
+    failure, so callers can tell a bad file from a transient error.
+    
+    Args:
+        file_bytes: Raw file content
+        file_name: Name of the uploaded file
+        file_type: MIME type of the file
+        user_id: ID of the user uploading the file
+        content_hash: SHA-256 hex digest of file_bytes, if already computed
+        on_stage: Awaited with the name of each stage as it starts
+            ("extracting", "embedding", "indexing", "storing")
+        doc_id: _id to give the document, so a retried job can find and
+            discard a partial earlier attempt (see discard_document)
+        fence: Awaited before each database write; raises to stop a job
+            worker that no longer holds its job
+    
+    Returns:
+        Success message with file information
+
+    Raises:
+        ExtractionError: if the file has no usable text
+    """
+    async def stage(name: str) -> None:
+        if on_stage is not None:
+            await on_stage(name)
+
+    async def check_fence() -> None:
+        if fence is not None:
+            await fence()
+
+    if content_hash is None:
+        content_hash = await asyncio.to_thread(lambda: hashlib.sha256(file_bytes).hexdigest())
+    embedder = get_embedder()
+    
+    # Identical bytes were already extracted: reuse text, chunks and vectors
+    await stage("extracting")
+    cached = await extraction_cache.lookup(user_id, content_hash, file_type, chunker_name())
+    if cached:
+        extracted_text, chunks = cached.extracted_text, cached.chunks
+        if cached.embedder == embedder.name:
+            embeddings, embedder_name = cached.embeddings, cached.embedder
+        else:
+            await stage("embedding")
+            embeddings, embedder_name = await embed_chunks(chunks)
+    else:
+        extracted_text, chunks = await extract_and_chunk(file_bytes, file_type)
+        
+        # Embed the chunks once, at ingest time
+        await stage("embedding")
+        embeddings, embedder_name = await embed_chunks(chunks)
+        await extraction_cache.store(
+            user_id, content_hash, file_type, chunker_name(), extracted_text, chunks,
+            embeddings, embedder_name
+        )
+    
+    # Index the chunks for BM25
+    await stage("indexing")
+    postings, index_tokens = await asyncio.to_thread(bm25.build_postings, chunks)
+    
+    # Create document for MongoDB
+    await stage("storing")
+    document = {
+        "_id": doc_id or ObjectId(),
+        "user_id": user_id,
+        "file_name": file_name,
+        "file_type": file_type,
+        "file_size": len(file_bytes),
+        "content_hash": content_hash,
+        **chunk_store.document_text_fields(extracted_text),
+        "chunk_count": len(chunks),
+        "index_tokens": index_tokens,
+        "uploaded_at": datetime.utcnow(),
+        "is_latest": False,
+        "metadata": {
+            "processed_by": "rag_tool",
+            "version": "1.5",
+            "embedder": embedder_name,
+            "chunker": chunker_name()
+        }
+    }
+    if summaries.ENABLED:
+        document["summary"] = {"status": "pending"}
+    
+    # Chunks, vectors and postings go first: queries only find the document
+    # once its record exists, and by then everything it points to is stored
+    await check_fence()
+    await chunk_store.store_chunks(user_id, document["_id"], chunks)
+    await check_fence()
+    await store_vectors(user_id, document["_id"], embeddings, embedder_name)
+    await check_fence()
+    await bm25.store_postings(user_id, document["_id"], postings, len(chunks), index_tokens)
+    
+    # Mark all previous files as not latest
+    await check_fence()
+    await rag_documents_collection.update_many(
+        {"user_id": user_id, "is_latest": True},
+        {"$set": {"is_latest": False}}
+    )
+    
+    # Insert new document and mark as latest
+    document["is_latest"] = True
+    result = await rag_documents_collection.insert_one(document)
+    
+    # Answers cached before this upload no longer cover all of the user's files
+    await answer_cache.invalidate(user_id)
+    
+    # Build the summary tree in the background, off the upload path
+    if summaries.ENABLED:
+        await jobs.enqueue_summary(user_id, result.inserted_id, file_name)
+    
+    return f"✅ File '{file_name}' processed successfully! Extracted {len(chunks)} chunks of text ({len(extracted_text)} characters). You can now ask questions about this document."
+
+
+async def discard_document(user_id: str, doc_id: ObjectId) -> None:
+    """
+    Remove whatever an interrupted ingest_document call stored for doc_id,
+    whether or not it got as far as the document record. Every step is a
+    no-op for data that was never written.
+    """
+    await rag_documents_collection.delete_one({"_id": doc_id, "user_id": user_id})
+    await chunk_store.delete_chunks({"doc_id": doc_id})
+    await delete_vectors({"doc_id": doc_id}, [doc_id])
+    await bm25.remove_document(doc_id)
+
+
+async def ingest_file(file_bytes: Union[bytes, memoryview], file_name: str, file_type: str,
+                      user_id: str, content_hash: Optional[str] = None) -> str:
+    """
+    Run ingest_document and report the outcome as a message.
+
+    Returns:
+        Success message with file information or error message
+    """
+    try:
+        return await ingest_document(file_bytes, file_name, file_type, user_id, content_hash)
+    except ExtractionError as e:
+        return str(e)
+    except Exception as e:
+        return f"Error processing file: {str(e)}"
+
+
 @tool
 async def process_and_store_file(file_data: str, file_name: str, file_type: str, user_id: str) -> str:
     """
@@ -155,150 +495,86 @@ async def process_and_store_file(file_data: str, file_name: str, file_type: str,
     Returns:
         Success message with file information or error message
     """
+    # Reject oversized payloads before decoding (base64 is 4 chars per 3 bytes)
+    if len(file_data) * 3 // 4 > MAX_UPLOAD_BYTES:
+        return str(UploadTooLarge(MAX_UPLOAD_BYTES))
     try:
-        # Decode file data
         file_bytes = base64.b64decode(file_data)
-        
-        # Extract text based on file type
-        extracted_text = ""
-        
-        if file_type == 'application/pdf':
-            # Try PyPDF2 first
-            try:
-                extracted_text = extract_text_from_pdf(file_bytes)
-            except Exception as e:
-                return f"Error extracting PDF text: {str(e)}"
-                
-        elif file_type.startswith('image/'):
-            # Use OpenAI Vision for image processing
-            try:
-                extracted_text = extract_text_with_openai_vision(file_bytes, file_type)
-                if not extracted_text.strip():
-                    # Fallback to OCR if vision fails
-                    extracted_text = extract_text_from_image_ocr(file_bytes)
-            except Exception as e:
-                return f"Error extracting image text: {str(e)}"
-            
-        elif file_type.startswith('text/') or file_type == 'application/json':
-            try:
-                extracted_text = file_bytes.decode('utf-8')
-            except Exception as e:
-                return f"Error decoding text file: {str(e)}"
-            
-        else:
-            return f"Unsupported file type: {file_type}. Supported types: PDF, images (JPG, PNG), text files, JSON."
-        
-        if not extracted_text.strip():
-            return "No text could be extracted from the file. The file might be empty or corrupted."
-        
-        # Chunk the text
-        chunks = chunk_text(extracted_text)
-        
-        # Create document for MongoDB
-        document = {
-            "user_id": user_id,
-            "file_name": file_name,
-            "file_type": file_type,
-            "file_size": len(file_bytes),
-            "extracted_text": extracted_text,
-            "chunks": chunks,
-            "chunk_count": len(chunks),
-            "uploaded_at": datetime.utcnow(),
-            "is_latest": False,
-            "metadata": {
-                "processed_by": "rag_tool",
-                "version": "1.0"
-            }
-        }
-        
-        # Mark all previous files as not latest
-        await rag_documents_collection.update_many(
-            {"user_id": user_id, "is_latest": True},
-            {"$set": {"is_latest": False}}
-        )
-        
-        # Insert new document and mark as latest
-        document["is_latest"] = True
-        result = await rag_documents_collection.insert_one(document)
-        
-        return f"✅ File '{file_name}' processed successfully! Extracted {len(chunks)} chunks of text ({len(extracted_text)} characters). You can now ask questions about this document."
-        
     except Exception as e:
         return f"Error processing file: {str(e)}"
+    return await ingest_file(file_bytes, file_name, file_type, user_id)
 
 
-@tool
-async def query_documents(question: str) -> str:
+async def answer_from_documents(user_id: str, question: str, documents: List[Dict[str, Any]],
+                                target: Dict[str, Any], is_summary_request: bool, cache_key: str) -> str:
     """
-    Query stored documents to answer questions using RAG (Retrieval Augmented Generation).
-    Use this tool when a user asks questions about their uploaded documents.
-    This tool automatically uses the current user's latest uploaded document.
-    
-    Args:
-        question: The question to answer based on uploaded documents
-    
+    Build the context for a question (or summary) and ask the LLM; the
+    answer is stored in answer_cache under cache_key.
+
     Returns:
-        Answer based on document content or error message
+        Answer with its sources, or a message if the documents have no content
     """
-    try:
-        # Get user_id from context
-        user_id = current_user_id.get()
-        if not user_id:
-            return "Error: User context not available. Please try again."
-        
-        # Retrieve latest document from MongoDB
+    # For summary requests, use more chunks or all chunks if document is small
+    if is_summary_request:
         document = await rag_documents_collection.find_one(
-            {"user_id": user_id, "is_latest": True}
+            {"_id": target["_id"]}, {"text_preview": 1, "text_length": 1, "summary": 1}
         )
-        
-        if not document:
-            return "No document found. Please upload a file first using the file upload feature, then I can answer questions about it."
-        
-        # Get relevant chunks
-        chunks = document.get("chunks", [])
-        if not chunks:
+        if not document or not target.get("chunk_count"):
             return "Document found but no content available. Please try uploading the file again."
-        
-        # Check if user wants a summary
-        question_lower = question.lower()
-        is_summary_request = any(keyword in question_lower for keyword in [
-            "summarize", "summary", "summarise", "overview", "what is this about",
-            "what does this say", "what's in this", "tell me about this"
-        ])
-        
-        # For summary requests, use more chunks or all chunks if document is small
-        if is_summary_request:
-            # Use all chunks for summary, but limit to reasonable size (max 8000 chars)
-            all_text = document.get("extracted_text", "")
-            if len(all_text) > 8000:
-                # If too long, use top 10 chunks or first 8000 chars
-                relevant_chunks = chunks[:10] if len(chunks) > 10 else chunks
-                context = "\n\n".join(relevant_chunks)
-                if len(context) > 8000:
-                    context = context[:8000] + "..."
-            else:
-                context = all_text
-        else:
-            # For specific questions, use similarity search
-            relevant_chunks = simple_similarity_search(chunks, question, top_k=5)
-            
-            if not relevant_chunks:
-                # If no relevant chunks found, try using first few chunks as fallback
-                relevant_chunks = chunks[:3] if len(chunks) >= 3 else chunks
-            
+        sources = [target["file_name"]]
+        
+        # Precomputed summary tree: answer from it instead of the raw text
+        summary = document.get("summary") or {}
+        if summary.get("status") == "ready":
+            metrics.incr("rag.summary.precomputed")
+            if summaries.is_plain_summary_request(question):
+                return f"{summary['text']}\n\n📄 Source: {sources[0]}"
+            llm = get_chat_model("gpt-4o-mini")
+            response = await llm.ainvoke(summaries.summary_prompt(question, sources[0], summary))
+            result = f"{response.content}\n\n📄 Source: {sources[0]}"
+            await answer_cache.set(cache_key, result, tags=[user_id])
+            return result
+        metrics.incr("rag.summary.fallback")
+        
+        # Use the whole text for summary, but limit to reasonable size (max 8000 chars)
+        if document.get("text_length", 0) > chunk_store.PREVIEW_CHARS:
+            # If too long, use the first 10 chunks, capped at 8000 chars
+            relevant_chunks = await chunk_store.load_first(target["_id"], 10)
             context = "\n\n".join(relevant_chunks)
-        
-        # Query LLM with context
-        llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        if is_summary_request:
-            # Special prompt for summaries
-            prompt = f"""Please provide a comprehensive summary of the following document.
+            if len(context) > 8000:
+                context = context[:8000] + "..."
+        else:
+            context = document.get("text_preview", "")
+    else:
+        # For specific questions, fuse vector similarity and BM25 rankings
+        # across every document, then load only the winning chunks
+        hits = await hybrid_search(user_id, documents, question, top_k=context_packing.CANDIDATES)
+        if not hits:
+            # If no relevant chunks found, fall back to the start of the latest document
+            hits = [(documents[0]["_id"], i) for i in range(min(3, documents[0].get("chunk_count", 0)))]
+        
+        # Merge neighbouring chunks, drop redundant ones and fill the token budget
+        texts = await chunk_store.load_selected(user_id, hits)
+        names = {d["_id"]: d["file_name"] for d in documents}
+        vectors = await load_vectors_many(list({doc_id for doc_id, _ in hits}), get_embedder().name)
+        packed = await asyncio.to_thread(context_packing.pack_context, hits, texts, names, vectors)
+        
+        if not packed.spans:
+            return "Document found but no content available. Please try uploading the file again."
+        context = packed.text
+        sources = list(dict.fromkeys(names[span.doc_id] for span in packed.spans))
+        metrics.record("rag.context.tokens", packed.tokens)
+        metrics.record("rag.context.tokens_saved", packed.tokens_saved)
+        metrics.incr("rag.context.tokens_saved_total", packed.tokens_saved)
+    
+    # Query LLM with context
+    llm = get_chat_model("gpt-4o-mini")
+    
+    if is_summary_request:
+        # Special prompt for summaries
+        prompt = f"""Please provide a comprehensive summary of the following document.
 
-Document Name: {document['file_name']}
+Document Name: {sources[0]}
 Document Content:
 {context}
 
@@ -311,11 +587,11 @@ Instructions:
 - If the document is a report or analysis, include main findings and recommendations
 
 Summary:"""
-        else:
-            # Regular question-answering prompt
-            prompt = f"""Based on the following document content, please answer the question accurately and concisely.
+    else:
+        # Regular question-answering prompt
+        prompt = f"""Based on the following document excerpts, please answer the question accurately and concisely.
+Each excerpt starts with the name of the file it comes from in square brackets.
 
-Document Name: {document['file_name']}
 Document Context:
 {context}
 
@@ -324,15 +600,75 @@ User Question: {question}
 Instructions:
 - Answer based ONLY on the information provided in the document context
 - Be specific and cite relevant details from the document
+- When excerpts come from several files, say which file each fact comes from
 - If the answer is not in the document, clearly state that
 - Keep your answer clear and well-structured
 
 Answer:"""
+    
+    response = await llm.ainvoke(prompt)
+    answer = response.content
+    
+    label = "Source" if len(sources) == 1 else "Sources"
+    result = f"{answer}\n\n📄 {label}: {', '.join(sources)}"
+    await answer_cache.set(cache_key, result, tags=[user_id])
+    return result
+
+
+@tool
+async def query_documents(question: str, file_name: Optional[str] = None) -> str:
+    """
+    Query stored documents to answer questions using RAG (Retrieval Augmented Generation).
+    Use this tool when a user asks questions about their uploaded documents.
+    This tool searches across all of the current user's uploaded documents.
+    
+    Args:
+        question: The question to answer based on uploaded documents
+        file_name: Optional file name (or part of it) to restrict the search to
+    
+    Returns:
+        Answer based on document content or error message
+    """
+    try:
+        # Get user_id from context
+        user_id = current_user_id.get()
+        if not user_id:
+            return "Error: User context not available. Please try again."
+        
+        # Retrieve document metadata (no text) from MongoDB
+        documents = await load_user_documents(user_id, file_name)
+        
+        if not documents:
+            if file_name:
+                return f"No uploaded document matches '{file_name}'. Use list_user_files to see your documents."
+            return "No document found. Please upload a file first using the file upload feature, then I can answer questions about it."
+        
+        # Move any documents still using the old inline layout
+        await chunk_store.ensure_migrated(documents)
+        
+        # Check if user wants a summary
+        question_lower = question.lower()
+        is_summary_request = any(keyword in question_lower for keyword in [
+            "summarize", "summary", "summarise", "overview", "what is this about",
+            "what does this say", "what's in this", "tell me about this"
+        ])
         
-        response = llm.invoke(prompt)
-        answer = response.content
+        # Summaries cover one document: the latest upload among the matches
+        target = next((d for d in documents if d.get("is_latest")), documents[0])
         
-        return f"{answer}\n\n📄 Source: {document['file_name']}"
+        # The same question about the same content was answered before
+        cache_key = answer_cache_key(
+            question, "summary" if is_summary_request else "qa",
+            [target] if is_summary_request else documents
+        )
+        cached_answer = await answer_cache.get(cache_key)
+        if cached_answer is not None:
+            return cached_answer
+        
+        # The same question about the same content is being answered right now
+        return await answer_flight.do(
+            cache_key, lambda: answer_from_documents(user_id, question, documents, target, is_summary_request, cache_key)
+        )
         
     except Exception as e:
         return f"Error querying documents: {str(e)}"
@@ -353,8 +689,7 @@ async def list_user_files() -> str:
         if not user_id:
             return "Error: User context not available. Please try again."
         
-        cursor = rag_documents_collection.find({"user_id": user_id}).sort("uploaded_at", -1)
-        files = await cursor.to_list(length=None)
+        files = await load_user_documents(user_id)
         
         if not files:
             return "You haven't uploaded any files yet. Upload a document to get started!"
@@ -397,14 +732,21 @@ async def delete_user_file(file_name: str) -> str:
             return "Error: User context not available. Please try again."
         
         # Delete specific file
-        result = await rag_documents_collection.delete_one({
-            "user_id": user_id,
-            "file_name": file_name
-        })
+        deleted = await rag_documents_collection.find_one_and_delete(
+            {"user_id": user_id, "file_name": file_name},
+            projection={"_id": 1, "content_hash": 1}
+        )
         
-        if result.deleted_count > 0:
+        if deleted:
+            await chunk_store.delete_chunks({"doc_id": deleted["_id"]})
+            if deleted.get("content_hash"):
+                await extraction_cache.invalidate(user_id, deleted["content_hash"])
+            await answer_cache.invalidate(user_id)
+            await delete_vectors({"doc_id": deleted["_id"]}, [deleted["_id"]])
+            await bm25.remove_document(deleted["_id"])
+
             # If deleted file was latest, mark another as latest
-            remaining = await rag_documents_collection.find_one({"user_id": user_id})
+            remaining = await rag_documents_collection.find_one({"user_id": user_id}, {"_id": 1})
             if remaining:
                 await rag_documents_collection.update_one(
                     {"_id": remaining["_id"]},
@@ -440,7 +782,13 @@ async def delete_all_user_files(confirmation: str = "no") -> str:
             count = await rag_documents_collection.count_documents({"user_id": user_id})
             return f"⚠️ You have {count} file(s). To delete all files, please confirm by saying 'yes, delete all my files'."
         
+        doc_ids = [d["_id"] for d in await rag_documents_collection.find({"user_id": user_id}, {"_id": 1}).to_list(length=None)]
         result = await rag_documents_collection.delete_many({"user_id": user_id})
+        await chunk_store.delete_chunks({"user_id": user_id})
+        await extraction_cache.invalidate(user_id)
+        await answer_cache.invalidate(user_id)
+        await delete_vectors({"user_id": user_id}, doc_ids)
+        await bm25.remove_user(user_id)
         
         if result.deleted_count > 0:
             return f"✅ Successfully deleted {result.deleted_count} file(s)."
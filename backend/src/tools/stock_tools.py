@@ -1,23 +1,45 @@
-import yfinance as yf
+from typing import List, Union
+
 from langchain.tools import tool
 
+from src import stock_quotes
+
+
+def _format_price(symbol: str, price: float) -> str:
+    return f"₹{price:.2f}" if symbol.endswith((".NS", ".BO")) else f"${price:.2f}"
+
+
 @tool("stock_price_tool", return_direct=True)
-def stock_price_tool(ticker: str) -> str:
+async def stock_price_tool(ticker: Union[str, List[str]]) -> str:
     """
-    Returns the current stock price for a given ticker.
+    Returns the current stock price for a given ticker, or for several
+    tickers at once (a list, or comma separated) to compare them.
     Example Input:
     'AAPL'  -> Apple
     'TSLA'  -> Tesla
     'RELIANCE.NS' -> Reliance Industries (NSE)
     'TCS.NS' -> Tata Consultancy Services (NSE)
+    ['AAPL', 'MSFT', 'TCS.NS'] -> all three in one call
     """
+    symbols = stock_quotes.normalize_symbols(ticker)
+    if not symbols:
+        return "Price not found."
+    if len(symbols) > stock_quotes.MAX_SYMBOLS:
+        return f"Error fetching price: at most {stock_quotes.MAX_SYMBOLS} tickers per request."
 
     try:
-        stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"].iloc[-1]
-
-        if price:
-            return f"Current price of {ticker}: ₹{price:.2f}" if ticker.endswith(".NS") else f"Current price of {ticker}: ${price:.2f}"
-        return "Price not found."
+        quotes = await stock_quotes.get_quotes(symbols)
     except Exception as e:
         return f"Error fetching price: {str(e)}"
+
+    if len(symbols) == 1:
+        quote = quotes.get(symbols[0])
+        if quote is None:
+            return "Price not found."
+        return f"Current price of {symbols[0]}: {_format_price(symbols[0], quote.price)}"
+
+    lines = ["Current prices:"]
+    for symbol in symbols:
+        quote = quotes.get(symbol)
+        lines.append(f"- {symbol}: {_format_price(symbol, quote.price)}" if quote else f"- {symbol}: price not found")
+    return "\n".join(lines)
@@ -1,11 +1,14 @@
-import requests
 from langchain.tools import tool
 
+from src import http_client
+from src.tool_cache import cached_tool
+
 @tool
-def current_time_tool() -> str:
+@cached_tool("current_time_tool")
+async def current_time_tool() -> str:
     """
     Returns accurate real world time using WorldTimeAPI.
     """
-    response = requests.get("https://worldtimeapi.org/api/timezone/Asia/Kolkata")
+    response = await http_client.get("https://worldtimeapi.org/api/timezone/Asia/Kolkata")
     data = response.json()
     return data["datetime"]
@@ -1,8 +1,10 @@
 import os
-import requests
 from dotenv import load_dotenv
 from langchain.tools import tool
 
+from src import http_client
+from src.tool_cache import ToolFailure, cached_tool
+
 # Load environment variables
 load_dotenv()
 WEATHER_API_KEY = os.getenv("WEATHERAPI_KEY")   # update your .env
@@ -12,26 +14,32 @@ WEATHER_API_KEY = os.getenv("WEATHERAPI_KEY")   # update your .env
 # Weather Tool (WeatherAPI free, no card needed)
 # ---------------------------------------------------------
 @tool("weather_tool", return_direct=True)
-def weather_tool(city: str) -> str:
+@cached_tool("weather_tool")
+async def weather_tool(city: str) -> str:
     """
     Returns current weather for a city.
     Example input: 'Delhi', 'Mumbai'
     """
     if not WEATHER_API_KEY:
-        return "WEATHERAPI_KEY missing in .env"
+        raise ToolFailure("WEATHERAPI_KEY missing in .env")
 
     try:
-        url = f"http://api.weatherapi.com/v1/current.json?key={WEATHER_API_KEY}&q={city}&aqi=no"
-        response = requests.get(url).json()
+        response = (await http_client.get(
+            "http://api.weatherapi.com/v1/current.json",
+            params={"key": WEATHER_API_KEY, "q": city, "aqi": "no"},
+        )).json()
+    except Exception as e:
+        raise ToolFailure(f"Failed to fetch weather: {str(e)}")
 
-        if "error" in response:
-            return f"Error: {response['error']['message']}"
+    if "error" in response:
+        raise ToolFailure(f"Error: {response['error']['message']}")
 
+    try:
         temp = response["current"]["temp_c"]
         condition = response["current"]["condition"]["text"]
         location = response["location"]["name"]
+    except (KeyError, TypeError) as e:
+        raise ToolFailure(f"Failed to fetch weather: unexpected response ({e})")
 
-        return f"Weather in {location}: {temp}°C, {condition}"
-    except Exception as e:
-        return f"Failed to fetch weather: {str(e)}"
+    return f"Weather in {location}: {temp}°C, {condition}"
 
@@ -1,21 +1,24 @@
 import os
 from dotenv import load_dotenv
-import requests
 from langchain.tools import tool
 
+from src import http_client
+from src.tool_cache import ToolFailure, cached_tool
+
 # Load environment variables from .env
 load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
 @tool
-def tavily_search_tool(query: str) -> str:
+@cached_tool("tavily_search_tool")
+async def tavily_search_tool(query: str) -> str:
     """
     Searches the web using the Tavily Search API and returns the result summary text.
     Provide a search query as the input string.
     """
     if not TAVILY_API_KEY:
-        return "Error: TAVILY_API_KEY not found in environment variables."
+        raise ToolFailure("Error: TAVILY_API_KEY not found in environment variables.")
 
     url = "https://api.tavily.com/search"
     payload = {
@@ -26,10 +29,15 @@ def tavily_search_tool(query: str) -> str:
     }
 
     try:
-        response = requests.post(url, json=payload)
+        # A search has no side effects, so it may be retried
+        response = await http_client.post(url, json=payload, idempotent=True)
         response.raise_for_status()  # Raise error for bad responses
         result = response.json()
-        return result.get("answer") or "No summarized answer available."
-
     except Exception as e:
-        return f"Error occurred while fetching data: {str(e)}"
+        raise ToolFailure(f"Error occurred while fetching data: {str(e)}")
+
+    # An empty answer may be filled in on a later search, so it is not cached either
+    answer = result.get("answer")
+    if not answer:
+        raise ToolFailure("No summarized answer available.")
+    return answer
@@ -8,8 +8,7 @@ from fastapi.websockets import WebSocketDisconnect
 from src.auth import decode_access_token
 from src.graph import sync_graph
 
-from openai import OpenAI
-client = OpenAI()
+from src.llm_registry import get_openai_client, track
 
 router = APIRouter()
 
@@ -71,11 +70,12 @@ async def voice_chat(websocket: WebSocket):
                         # STEP 1 — TRANSCRIBE WEBM AUDIO (forcing English)
                         # ------------------------------------------------------
                         try:
-                            whisper = client.audio.transcriptions.create(
-                                model="gpt-4o-transcribe",
-                                file=("audio.webm", raw_bytes, "audio/webm"),
-                                language="en"
-                            )
+                            with track("gpt-4o-transcribe"):
+                                whisper = await get_openai_client().audio.transcriptions.create(
+                                    model="gpt-4o-transcribe",
+                                    file=("audio.webm", raw_bytes, "audio/webm"),
+                                    language="en"
+                                )
                             transcript = whisper.text
 
                             await websocket.send_json({
@@ -111,11 +111,12 @@ async def voice_chat(websocket: WebSocket):
                         # STEP 3 — CONVERT AI REPLY → SPEECH (TTS PATCH APPLIED)
                         # ------------------------------------------------------
                         try:
-                            speech_response = client.audio.speech.create(
-                                model="gpt-4o-mini-tts",
-                                voice="alloy",
-                                input=ai_reply
-                            )
+                            with track("gpt-4o-mini-tts"):
+                                speech_response = await get_openai_client().audio.speech.create(
+                                    model="gpt-4o-mini-tts",
+                                    voice="alloy",
+                                    input=ai_reply
+                                )
 
                             # MUST call .read() because API returns streaming-like bytes
                             raw_audio = speech_response.read()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_NAME", "devmate_test")
+os.environ.setdefault("RAG_EMBEDDER", "hashing")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def encoding():
+    """The tiktoken encoding; needs network access or a warm TIKTOKEN_CACHE_DIR"""
+    from src.rag.chunker import get_encoding
+
+    try:
+        return get_encoding()
+    except Exception as e:
+        pytest.skip(f"tiktoken encoding unavailable: {e}")
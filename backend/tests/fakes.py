@@ -0,0 +1,145 @@
+"""
+In-memory stand-ins for the Motor collections used by the tests: just the
+queries and update operators the code under test issues.
+"""
+
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def matches(doc, query) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict) and all(op.startswith("$") for op in condition):
+            for op, arg in condition.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op in ("$lt", "$lte", "$gt", "$gte") and value is None:
+                    return False
+                if (op == "$lt" and not value < arg) or (op == "$lte" and not value <= arg):
+                    return False
+                if (op == "$gt" and not value > arg) or (op == "$gte" and not value >= arg):
+                    return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def apply_update(doc, update, inserting=False) -> None:
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                doc[key] = value
+            elif op == "$unset":
+                doc.pop(key, None)
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + value
+
+
+def project(doc, projection):
+    if not projection:
+        return dict(doc)
+    out = {key: doc[key] for key, keep in projection.items() if keep and key in doc}
+    out.setdefault("_id", doc["_id"])
+    return out
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self._docs)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def _sorted(self, query, sort=None):
+        found = [doc for doc in self.docs if matches(doc, query)]
+        for key, direction in reversed(sort or []):
+            found.sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+        return found
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        return SimpleNamespace(inserted_ids=[(await self.insert_one(doc)).inserted_id for doc in docs])
+
+    async def find_one(self, query, projection=None):
+        found = self._sorted(query)
+        return project(found[0], projection) if found else None
+
+    def find(self, query, projection=None):
+        return FakeCursor([project(doc, projection) for doc in self._sorted(query)])
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=False, **kwargs):
+        found = self._sorted(query, sort)
+        if not found:
+            return None
+        before = dict(found[0])
+        apply_update(found[0], update)
+        return dict(found[0]) if return_document else before
+
+    async def update_one(self, query, update, upsert=False):
+        found = self._sorted(query)
+        if found:
+            apply_update(found[0], update)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            apply_update(doc, update, inserting=True)
+            await self.insert_one(doc)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def delete_many(self, query):
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+
+class FakeBucket:
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+        self.deleted = []
+
+    async def open_download_stream(self, file_id):
+        data = self.files[file_id]
+
+        async def read():
+            return data
+
+        return SimpleNamespace(read=read)
+
+    async def delete(self, file_id):
+        self.deleted.append(file_id)
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from tests.fakes import FakeCollection
+from src.rag import bm25, chunk_store
+from src.tools import rag_tool
+
+USER = "user-1"
+
+CHUNKS = {
+    "a": ["the heart pumps blood", "blood carries oxygen to the body"],
+    "b": ["python functions return values", "a regex matches text"],
+}
+
+
+@pytest.fixture
+def postings(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(bm25, "rag_postings_collection", collection)
+    return collection
+
+
+async def index(doc_id, chunks):
+    found, total = bm25.build_postings(chunks)
+    await bm25.store_postings(USER, doc_id, found, len(chunks), total)
+
+
+def test_search_ranks_the_matching_chunk_first(postings):
+    a, b = ObjectId(), ObjectId()
+
+    async def run():
+        await index(a, CHUNKS["a"])
+        await index(b, CHUNKS["b"])
+        return await bm25.search(USER, "oxygen in blood", {a: 2, b: 2}, top_k=3)
+
+    results = asyncio.run(run())
+    assert [(doc, ordinal) for doc, ordinal, _ in results] == [(a, 1), (a, 0)]
+
+
+def test_storing_a_document_again_replaces_its_index(postings):
+    a, b = ObjectId(), ObjectId()
+
+    async def run():
+        await index(a, CHUNKS["a"])
+        await index(b, CHUNKS["b"])
+        first = await bm25.search(USER, "blood", {a: 2, b: 2})
+        await index(a, CHUNKS["a"])
+        return first, await bm25.search(USER, "blood", {a: 2, b: 2})
+
+    first, again = asyncio.run(run())
+    assert first == again
+    assert sum(1 for r in postings.docs if r["term"] == bm25.DOC_STATS_TERM) == 2
+
+
+def test_removed_documents_no_longer_count(postings):
+    a, b = ObjectId(), ObjectId()
+
+    async def run():
+        await index(a, CHUNKS["a"])
+        await index(b, CHUNKS["b"])
+        await bm25.remove_document(a)
+        return await bm25.search(USER, "blood regex", {a: 2, b: 2})
+
+    assert [(doc, ordinal) for doc, ordinal, _ in asyncio.run(run())] == [(b, 1)]
+    assert all(r["doc_id"] == b for r in postings.docs)
+
+
+def test_concurrent_queries_index_a_legacy_document_once(postings, monkeypatch):
+    documents = FakeCollection()
+    monkeypatch.setattr(rag_tool, "rag_documents_collection", documents)
+    doc_id = ObjectId()
+    documents.docs.append({"_id": doc_id, "user_id": USER, "chunk_count": 2})
+    loads = []
+
+    async def load_all(doc_ids):
+        loads.append(doc_ids)
+        await asyncio.sleep(0.01)
+        return {d: CHUNKS["a"] for d in doc_ids}
+
+    monkeypatch.setattr(chunk_store, "load_all", load_all)
+
+    async def query():
+        meta = [dict(documents.docs[0])]
+        return await rag_tool.keyword_search(USER, meta, "blood", top_k=2)
+
+    async def run():
+        return await asyncio.gather(query(), query())
+
+    asyncio.run(run())
+    assert loads == [[doc_id]]
+    assert sum(1 for r in postings.docs if r["term"] == bm25.DOC_STATS_TERM) == 1
+    assert documents.docs[0]["index_tokens"] > 0
+    assert "index_claimed_at" not in documents.docs[0]
+
+
+def test_a_stale_indexing_claim_is_taken_over(monkeypatch):
+    from datetime import datetime, timedelta
+
+    documents = FakeCollection()
+    monkeypatch.setattr(rag_tool, "rag_documents_collection", documents)
+    fresh, stale = ObjectId(), ObjectId()
+    documents.docs += [
+        {"_id": fresh, "index_tokens": rag_tool.INDEXING, "index_claimed_at": datetime.utcnow()},
+        {"_id": stale, "index_tokens": rag_tool.INDEXING,
+         "index_claimed_at": datetime.utcnow() - timedelta(seconds=rag_tool.INDEX_CLAIM_SECONDS + 1)},
+    ]
+
+    async def run():
+        return await rag_tool.claim_for_indexing(fresh), await rag_tool.claim_for_indexing(stale)
+
+    assert asyncio.run(run()) == (False, True)
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src import cache
+from src.cache import LRUCache, TieredCache, make_key
+from tests.fakes import FakeCollection
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_make_key_is_stable_and_order_independent():
+    assert make_key("q", {"a": 1, "b": 2}) == make_key("q", {"b": 2, "a": 1})
+    assert make_key("q", {"a": 1}) != make_key("q", {"a": 2})
+
+
+def test_entries_expire_after_their_ttl(clock):
+    lru = LRUCache(max_entries=10, ttl_seconds=60)
+    lru.set("a", 1)
+    lru.set("b", 2, ttl_seconds=5)
+
+    clock.value += 5.5
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert len(lru) == 1
+
+    clock.value += 60
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    lru = LRUCache(max_entries=2, ttl_seconds=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+
+def test_invalidate_drops_every_entry_with_the_tag(clock):
+    lru = LRUCache(max_entries=10, ttl_seconds=60)
+    lru.set("q1", "x", tags=["user1"])
+    lru.set("q2", "y", tags=["user1", "doc9"])
+    lru.set("q3", "z", tags=["user2"])
+
+    assert lru.invalidate("user1") == 2
+    assert (lru.get("q1"), lru.get("q2"), lru.get("q3")) == (None, None, "z")
+    assert lru.invalidate("doc9") == 0
+    assert lru.invalidate("unknown") == 0
+
+
+def test_overwriting_an_entry_replaces_its_tags(clock):
+    lru = LRUCache(max_entries=10, ttl_seconds=60)
+    lru.set("q", "old", tags=["user1"])
+    lru.set("q", "new", tags=["user2"])
+    assert lru.invalidate("user1") == 0
+    assert lru.get("q") == "new"
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(TieredCache, "_collection", property(lambda self: collection))
+    return collection
+
+
+def test_shared_tier_serves_other_processes(shared, clock):
+    writer = TieredCache("answers", 10, 60, shared=True)
+    reader = TieredCache("answers", 10, 60, shared=True)
+    asyncio.run(writer.set("k", "v", tags=["user1"]))
+
+    assert asyncio.run(reader.get("k")) == "v"
+    assert reader.local.get("k") == "v"
+
+
+def test_expired_shared_entries_are_misses(shared, clock):
+    tiered = TieredCache("answers", 10, 60, shared=True)
+    asyncio.run(tiered.set("k", "v"))
+    shared.docs[0]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    tiered.local.clear()
+    assert asyncio.run(tiered.get("k")) is None
+
+
+def test_invalidate_clears_both_tiers(shared, clock):
+    tiered = TieredCache("answers", 10, 60, shared=True)
+    asyncio.run(tiered.set("k1", "v", tags=["user1"]))
+    asyncio.run(tiered.set("k2", "v", tags=["user2"]))
+
+    asyncio.run(tiered.invalidate("user1"))
+
+    assert [doc["key"] for doc in shared.docs] == ["k2"]
+    assert asyncio.run(tiered.get("k1")) is None
+    assert asyncio.run(tiered.get("k2")) == "v"
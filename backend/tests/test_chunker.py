@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from src.rag.chunker import TokenChunker, chunk_text_by_tokens, is_heading
+
+WORDS = "the of and to in matrix enzyme orbital lattice vector kernel theorem spectrum polymer tensor".split()
+
+
+def document(paragraphs: int = 120, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for i in range(paragraphs):
+        if i % 15 == 0:
+            parts.append(f"## {i // 15 + 1}. Section")
+        else:
+            sentences = rng.randint(1, 40 if i % 37 == 0 else 6)
+            parts.append(" ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))).capitalize() + "."
+                for _ in range(sentences)
+            ))
+    return "\n\n".join(parts)
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(200, 30), (64, 8), (50, 0)])
+def test_chunks_stay_within_the_token_budget(encoding, max_tokens, overlap):
+    chunks = chunk_text_by_tokens(document(), max_tokens, overlap)
+    sizes = [len(encoding.encode_ordinary(chunk)) for chunk in chunks]
+    assert chunks and max(sizes) <= max_tokens
+    assert all(chunk.strip() == chunk and chunk for chunk in chunks)
+
+
+def test_text_without_natural_boundaries_is_cut_at_token_boundaries(encoding):
+    chunks = chunk_text_by_tokens("x" * 20000, 100, 10)
+    assert len(chunks) > 1
+    assert all(len(encoding.encode_ordinary(chunk)) <= 100 for chunk in chunks)
+
+
+def test_every_word_is_kept(encoding):
+    text = document(40)
+    chunked = " ".join(chunk_text_by_tokens(text, 80, 0)).split()
+    assert chunked == text.split()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streamed_feeding_matches_one_call(encoding, seed):
+    text = document()
+    rng = random.Random(seed)
+    chunker = TokenChunker(120, 20)
+    streamed, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 3000)
+        streamed += chunker.feed(text[start:end])
+        start = end
+    streamed += chunker.close()
+
+    assert streamed == chunk_text_by_tokens(text, 120, 20)
+
+
+def test_headings_start_a_new_chunk_without_overlap(encoding):
+    text = "Intro sentence one. Intro sentence two.\n\n## 2. Results\n\nResults text here."
+    chunks = chunk_text_by_tokens(text, 200, 30)
+    assert chunks == ["Intro sentence one. Intro sentence two.", "## 2. Results\n\nResults text here."]
+
+
+def test_heading_detection():
+    assert is_heading("## Methods")
+    assert is_heading("2.1 Results")
+    assert is_heading("INTRODUCTION")
+    assert not is_heading("This is an ordinary sentence.")
+
+
+def test_overlap_must_be_smaller_than_budget(encoding):
+    with pytest.raises(ValueError):
+        TokenChunker(50, 50)
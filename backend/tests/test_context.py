@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from src.rag.context import (
+    BASELINE_HITS, DUPLICATE_SIMILARITY, MIN_SPAN_TOKENS, Span, build_spans, merge_overlapping, pack_context, select_mmr,
+)
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_merge_overlapping_keeps_shared_text_once():
+    left = "alpha beta gamma delta epsilon zeta eta theta iota kappa"
+    right = "epsilon zeta eta theta iota kappa lambda mu"
+    assert merge_overlapping(left, right) == "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu"
+    assert merge_overlapping("first part", "unrelated second") == "first part\nunrelated second"
+
+
+def test_adjacent_hits_become_one_span_with_their_best_relevance():
+    hits = [("d1", 3), ("d2", 0), ("d1", 2), ("d1", 7)]
+    texts = {hit: f"chunk {hit[0]}-{hit[1]}" for hit in hits}
+    spans = build_spans(hits, texts, {"d1": "a.pdf"})
+
+    assert [(s.doc_id, s.first, s.last) for s in spans] == [("d1", 2, 3), ("d1", 7, 7), ("d2", 0, 0)]
+    assert spans[0].relevance == 1.0
+    assert spans[0].render() == "[a.pdf]\nchunk d1-2\nchunk d1-3"
+    assert spans[2].render() == "chunk d2-0"
+
+
+def test_mmr_prefers_a_diverse_span_over_a_redundant_one():
+    top = Span("d", 0, 0, "top", 1.0, vector=unit(1, 0))
+    similar = Span("d", 2, 2, "similar", 0.9, vector=unit(1, 0.5))
+    different = Span("d", 4, 4, "different", 0.8, vector=unit(0, 1))
+
+    assert [s.text for s in select_mmr([similar, different, top], lambda_=0.5)] == ["top", "different", "similar"]
+    assert [s.text for s in select_mmr([similar, different, top], lambda_=1.0)] == ["top", "similar", "different"]
+
+
+def test_mmr_drops_near_duplicates_and_contained_text():
+    top = Span("d", 0, 0, "the full text", 1.0, vector=unit(1, 0))
+    duplicate = Span("e", 0, 0, "a copy", 0.9, vector=unit(1, 1 - DUPLICATE_SIMILARITY) * 1.0)
+    contained = Span("f", 0, 0, "full text", 0.8)
+    picked = select_mmr([top, duplicate, contained])
+    assert picked == [top]
+
+
+def chunk_hits(n=12, words=60):
+    hits = [(f"doc{i % 3}", i) for i in range(n)]
+    texts = {hit: " ".join(f"word{hit[1]}x{j}" for j in range(words)) + "." for hit in hits}
+    return hits, texts
+
+
+@pytest.mark.parametrize("budget", [100, 333, 700])
+def test_packed_context_fills_the_budget_exactly(encoding, budget):
+    hits, texts = chunk_hits()
+    packed = pack_context(hits, texts, {"doc0": "a.pdf", "doc1": "b.pdf", "doc2": "c.pdf"}, budget=budget)
+
+    assert packed.tokens == len(encoding.encode_ordinary(packed.text))
+    assert budget - 2 <= packed.tokens <= budget
+    assert packed.baseline_tokens > budget
+    assert packed.tokens_saved == packed.baseline_tokens - packed.tokens
+    assert packed.text.startswith("[a.pdf]\nword0x0")
+
+
+def test_no_sliver_is_added_when_too_little_room_is_left(encoding):
+    hits, texts = chunk_hits()
+    labels = {"doc0": "a.pdf", "doc1": "b.pdf", "doc2": "c.pdf"}
+    two_spans = pack_context(hits, texts, labels, budget=10000).spans[:2]
+    used = len(encoding.encode_ordinary("\n\n".join(span.render() for span in two_spans)))
+
+    packed = pack_context(hits, texts, labels, budget=used + MIN_SPAN_TOKENS // 2)
+    assert packed.tokens == used
+    assert packed.spans == two_spans
+
+
+def test_everything_fits_under_a_large_budget(encoding):
+    hits, texts = chunk_hits(n=3, words=10)
+    packed = pack_context(hits, texts, {}, budget=10000)
+    assert len(packed.spans) == 3
+    assert packed.tokens == packed.baseline_tokens
+    assert packed.tokens_saved == 0
+
+
+def test_the_baseline_is_the_old_top_k_context(encoding):
+    hits, texts = chunk_hits()
+    packed = pack_context(hits, texts, {}, budget=10000)
+    old_context = "\n\n".join(texts[hit] for hit in hits[:BASELINE_HITS])
+
+    assert packed.baseline_tokens == len(encoding.encode_ordinary(old_context))
+    # Packing every candidate sends more than the old top five did
+    assert packed.tokens_saved < 0
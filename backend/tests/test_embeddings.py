@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from src.rag import embeddings
+from src.rag.embeddings import HashingEmbedder, OpenAIEmbedder, get_embedder
+
+
+@pytest.fixture(autouse=True)
+def fresh_embedder(monkeypatch):
+    monkeypatch.setattr(embeddings, "_embedder", None)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+def test_openai_is_the_default(monkeypatch):
+    monkeypatch.delenv("RAG_EMBEDDER", raising=False)
+    assert isinstance(get_embedder(), OpenAIEmbedder)
+
+
+def test_hashing_is_opt_in(monkeypatch):
+    monkeypatch.setenv("RAG_EMBEDDER", "Hashing")
+    embedder = get_embedder()
+    assert isinstance(embedder, HashingEmbedder)
+    assert get_embedder() is embedder
+
+
+def test_unknown_embedder_is_rejected(monkeypatch):
+    monkeypatch.setenv("RAG_EMBEDDER", "hashnig")
+    with pytest.raises(ValueError):
+        get_embedder()
+
+
+def test_hashing_vectors_are_normalized():
+    matrix = HashingEmbedder(dim=64).embed_documents(["token budget", "", "stack trace"])
+    assert matrix.shape == (3, 64) and matrix.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(matrix[[0, 2]], axis=1), 1.0, rtol=1e-5)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from tests.fakes import FakeCollection
+from src.rag import bm25, chunk_store, extraction_cache, summaries
+from src.tools import rag_tool
+
+USER = "user-1"
+TEXT = b"The heart pumps blood through the body. " * 40
+
+
+class Recorder(FakeCollection):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def insert_one(self, doc):
+        self.log.append("document")
+        return await super().insert_one(doc)
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                doc.update(update["$set"])
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    log = []
+    documents = Recorder(log)
+    monkeypatch.setattr(rag_tool, "rag_documents_collection", documents)
+    monkeypatch.setattr(summaries, "ENABLED", False)
+
+    async def lookup(*args):
+        return None
+
+    async def ignore(*args, **kwargs):
+        return None
+
+    def step(name):
+        async def write(*args, **kwargs):
+            log.append(name)
+        return write
+
+    async def extract_and_chunk(file_bytes, file_type):
+        text = bytes(file_bytes).decode()
+        return text, [text[i:i + 200] for i in range(0, len(text), 200)]
+
+    # Real chunking needs the tiktoken encoding, which may not be downloadable here
+    monkeypatch.setattr(rag_tool, "extract_and_chunk", extract_and_chunk)
+    monkeypatch.setattr(rag_tool, "chunker_name", lambda: "test-chunker")
+    monkeypatch.setattr(extraction_cache, "lookup", lookup)
+    monkeypatch.setattr(extraction_cache, "store", ignore)
+    monkeypatch.setattr(rag_tool.answer_cache, "invalidate", ignore)
+    monkeypatch.setattr(chunk_store, "store_chunks", step("chunks"))
+    monkeypatch.setattr(rag_tool, "store_vectors", step("vectors"))
+    monkeypatch.setattr(bm25, "store_postings", step("postings"))
+    return log, documents
+
+
+def test_the_document_record_is_written_last(writes):
+    log, documents = writes
+    doc_id = ObjectId()
+    asyncio.run(rag_tool.ingest_document(TEXT, "heart.txt", "text/plain", USER, doc_id=doc_id))
+
+    assert log == ["chunks", "vectors", "postings", "document"]
+    assert documents.docs[0]["_id"] == doc_id and documents.docs[0]["is_latest"]
+
+
+def test_a_failed_write_leaves_no_document(writes, monkeypatch):
+    log, documents = writes
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("mongo went away")
+
+    monkeypatch.setattr(bm25, "store_postings", fail)
+    with pytest.raises(ConnectionError):
+        asyncio.run(rag_tool.ingest_document(TEXT, "heart.txt", "text/plain", USER))
+    assert documents.docs == []
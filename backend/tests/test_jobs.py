@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from src.rag import jobs
+from tests.fakes import FakeBucket, FakeCollection
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(jobs, "rag_ingest_jobs_collection", collection)
+    monkeypatch.setattr(jobs, "rag_uploads_bucket", FakeBucket())
+    return collection
+
+
+def summary_job(queue, **fields):
+    doc_id = ObjectId()
+    asyncio.run(jobs.enqueue_summary("u1", doc_id, "notes.pdf"))
+    job = queue.docs[-1]
+    job.update(fields)
+    return job
+
+
+def expire_lease(job):
+    job["lease_expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+
+def test_claim_takes_queued_jobs_by_priority_then_age(queue):
+    older = summary_job(queue, priority=0, created_at=datetime.utcnow() - timedelta(minutes=1))
+    urgent = summary_job(queue, priority=1)
+
+    first = asyncio.run(jobs._claim("w1"))
+    second = asyncio.run(jobs._claim("w2"))
+
+    assert (first["_id"], second["_id"]) == (urgent["_id"], older["_id"])
+    assert first["status"] == "running" and first["attempts"] == 1
+    assert asyncio.run(jobs._claim("w3")) is None
+
+
+def test_expired_lease_is_reclaimed_and_the_old_holder_is_fenced_out(queue):
+    summary_job(queue)
+    stale = asyncio.run(jobs._claim("w1"))
+    assert asyncio.run(jobs._claim("w2")) is None  # lease still valid
+
+    expire_lease(queue.docs[0])
+    current = asyncio.run(jobs._claim("w2"))
+    assert current["attempts"] == 2
+    assert current["lease_token"] != stale["lease_token"]
+
+    assert asyncio.run(jobs._finish(stale, "done")) is False
+    assert queue.docs[0]["status"] == "running"
+    assert asyncio.run(jobs._finish(current, "done")) is True
+    assert queue.docs[0]["status"] == "done"
+    assert "lease_token" not in queue.docs[0]
+
+
+def test_failed_attempt_is_retried_later_then_failed_for_good(queue, monkeypatch):
+    async def broken(job, on_stage):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(jobs, "_summarize", broken)
+    summary_job(queue)
+
+    for attempt in range(1, jobs.MAX_ATTEMPTS):
+        job = asyncio.run(jobs._claim("w1"))
+        asyncio.run(jobs._run(job))
+        stored = queue.docs[0]
+        assert (stored["status"], stored["attempts"], stored["error"]) == ("queued", attempt, "model unavailable")
+        assert stored["available_at"] > datetime.utcnow()
+        assert "lease_token" not in stored
+        stored["available_at"] = datetime.utcnow()
+
+    asyncio.run(jobs._run(asyncio.run(jobs._claim("w1"))))
+    assert queue.docs[0]["status"] == "failed"
+    assert asyncio.run(jobs._claim("w1")) is None
+
+
+def test_abandoned_last_attempt_is_failed(queue):
+    summary_job(queue)
+    for _ in range(jobs.MAX_ATTEMPTS):
+        asyncio.run(jobs._claim("w1"))
+        expire_lease(queue.docs[0])
+
+    assert asyncio.run(jobs._claim("w2")) is None
+    asyncio.run(jobs._fail_abandoned())
+    assert queue.docs[0]["status"] == "failed"
+
+
+@pytest.mark.parametrize("status, message", [("done", "Document no longer exists."), ("failed", None)])
+def test_enqueue_summary_rearms_an_existing_job(queue, status, message):
+    doc_id = ObjectId()
+    asyncio.run(jobs.enqueue_summary("u1", doc_id, "notes.pdf"))
+    created_at = queue.docs[0]["created_at"]
+    queue.docs[0].update(status=status, attempts=jobs.MAX_ATTEMPTS, message=message, finished_at=datetime.utcnow())
+
+    asyncio.run(jobs.enqueue_summary("u1", doc_id, "notes.pdf"))
+
+    assert len(queue.docs) == 1
+    job = queue.docs[0]
+    assert (job["status"], job["attempts"], job["created_at"]) == ("queued", 0, created_at)
+    assert "finished_at" not in job and "message" not in job
+    assert asyncio.run(jobs._claim("w1"))["_id"] == job["_id"]
+
+
+def test_rearming_a_running_summary_fences_out_its_worker(queue):
+    doc_id = ObjectId()
+    asyncio.run(jobs.enqueue_summary("u1", doc_id, "notes.pdf"))
+    running = asyncio.run(jobs._claim("w1"))
+
+    asyncio.run(jobs.enqueue_summary("u1", doc_id, "notes.pdf"))
+
+    assert asyncio.run(jobs._finish(running, "done")) is False
+    assert queue.docs[0]["status"] == "queued"
+
+
+@pytest.fixture
+def ingest_calls(queue, monkeypatch):
+    from src.tools import rag_tool
+
+    calls = SimpleNamespace(ingested=[], discarded=[], during_write=None)
+
+    async def ingest_document(file_bytes, file_name, file_type, user_id, content_hash=None,
+                              on_stage=None, doc_id=None, fence=None):
+        calls.ingested.append(doc_id)
+        await on_stage("storing")
+        if calls.during_write:
+            calls.during_write()
+        await fence()
+        return "stored"
+
+    async def discard_document(user_id, doc_id):
+        calls.discarded.append(doc_id)
+
+    monkeypatch.setattr(rag_tool, "ingest_document", ingest_document)
+    monkeypatch.setattr(rag_tool, "discard_document", discard_document)
+    payload_id = ObjectId()
+    monkeypatch.setattr(jobs, "rag_uploads_bucket", FakeBucket({payload_id: b"text"}))
+    now = datetime.utcnow()
+    queue.docs.append({
+        "_id": ObjectId(), "kind": jobs.KIND_INGEST, "priority": 1, "user_id": "u1",
+        "file_name": "notes.txt", "file_type": "text/plain", "content_hash": "h",
+        "payload_id": payload_id, "doc_id": ObjectId(), "status": "queued", "stage": "queued",
+        "attempts": 0, "available_at": now, "created_at": now, "updated_at": now,
+    })
+    return calls
+
+
+def test_every_ingest_attempt_writes_under_its_own_doc_id(queue, ingest_calls):
+    first_id = queue.docs[0]["doc_id"]
+    asyncio.run(jobs._run(asyncio.run(jobs._claim("w1"))))
+
+    stored = queue.docs[0]
+    assert stored["status"] == "done"
+    assert ingest_calls.ingested == [stored["doc_id"]] and stored["doc_id"] != first_id
+
+    # A retry discards what the previous attempt stored and starts a new document
+    stored.update(status="queued", attempts=1, available_at=datetime.utcnow())
+    previous = stored["doc_id"]
+    asyncio.run(jobs._run(asyncio.run(jobs._claim("w1"))))
+    assert ingest_calls.discarded == [previous]
+    assert ingest_calls.ingested[-1] == queue.docs[0]["doc_id"] != previous
+
+
+def test_a_worker_that_lost_its_lease_stops_before_writing(queue, ingest_calls):
+    stale = asyncio.run(jobs._claim("w1"))
+
+    # Another worker reclaims the job while this one is writing
+    ingest_calls.during_write = lambda: queue.docs[0].update(lease_token=ObjectId())
+    asyncio.run(jobs._run(stale))
+
+    stored = queue.docs[0]
+    assert stored["status"] == "running" and stored["lease_token"] != stale["lease_token"]
+    assert ingest_calls.discarded == [stale["doc_id"]]
+
+
+def test_stale_doc_is_discarded_when_done_cannot_be_recorded(queue, ingest_calls, monkeypatch):
+    async def lost(job, status, **fields):
+        return False
+
+    monkeypatch.setattr(jobs, "_finish", lost)
+    job = asyncio.run(jobs._claim("w1"))
+    asyncio.run(jobs._run(job))
+    assert ingest_calls.discarded == [job["doc_id"]]
@@ -0,0 +1,62 @@
+from src.memory import SUMMARY_HEADER, TOOL_RESULT_MARKER, build_context
+
+
+def turn(i, tool=False):
+    messages = [{"role": "user", "content": f"question {i}"}]
+    if tool:
+        messages.append({"role": "system", "content": TOOL_RESULT_MARKER})
+    messages.append({"role": "assistant", "content": f"answer {i}"})
+    return messages
+
+
+def test_without_summary_the_whole_history_is_context():
+    history = turn(1) + turn(2)
+    assert build_context(history, None) == history
+
+
+def test_tool_result_markers_are_left_out():
+    history = turn(1, tool=True) + turn(2, tool=True)
+    context = build_context(history, {})
+    assert TOOL_RESULT_MARKER not in [m["content"] for m in context]
+    assert context == turn(1) + turn(2)
+
+
+def test_other_system_messages_are_kept():
+    note = {"role": "system", "content": "Tool result: 42"}
+    assert build_context([note] + turn(1), None) == [note] + turn(1)
+
+
+def test_summary_replaces_the_summarized_turns():
+    history = [m for i in range(4) for m in turn(i, tool=True)]
+    summarized_count = len(turn(0, tool=True)) * 2
+    context = build_context(history, {"summary": "earlier", "summarized_count": summarized_count}, recent_turns=2)
+
+    assert context[0] == {"role": "system", "content": f"{SUMMARY_HEADER}\nearlier"}
+    assert context[1:] == turn(2) + turn(3)
+
+
+def test_unsummarized_turns_outside_the_window_stay_verbatim():
+    history = [m for i in range(4) for m in turn(i, tool=True)]
+    context = build_context(history, {"summary": "earlier", "summarized_count": 0}, recent_turns=1)
+    assert context[1:] == [m for i in range(4) for m in turn(i)]
+
+
+
+def test_token_counts_are_cached_without_keeping_the_text(monkeypatch):
+    from src import memory
+
+    encoded = []
+
+    class Encoding:
+        def encode_ordinary(self, text):
+            encoded.append(text)
+            return text.split()
+
+    monkeypatch.setattr(memory, "get_encoding", lambda: Encoding())
+    monkeypatch.setattr(memory, "_token_counts", memory.LRUCache(max_entries=16, ttl_seconds=60))
+    result = "row " * 10000
+
+    assert memory._text_tokens(result) == 10000
+    assert memory._text_tokens("row " * 10000) == 10000
+    assert len(encoded) == 1
+    assert all(result not in key and len(key[0]) == 16 for key in memory._token_counts._entries)
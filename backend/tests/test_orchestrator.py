@@ -0,0 +1,86 @@
+import pytest
+
+from src import fx_rates
+from src.agents.orchestrator import CALCULATOR, CODE_AGENT, CURRENCY, STUDY_AGENT, TIME, Orchestrator
+
+orchestrator = Orchestrator()
+
+
+@pytest.mark.parametrize("query, expression", [
+    ("what is 6*7", "6*7"),
+    ("10 - 5", "10 - 5"),
+    ("calculate (2 + 3) * 4", "(2 + 3) * 4"),
+    ("2 ** 8 =", "2 ** 8"),
+    ("100/4?", "100/4"),
+])
+def test_arithmetic_is_answered_by_the_calculator(query, expression):
+    assert orchestrator.classify(query) == (CALCULATOR, {"expression": expression})
+
+
+@pytest.mark.parametrize("query", [
+    "2024-01-15",
+    "2024/01/15",
+    "15-01-2024",
+    "1/15/24",
+    "555-1234",
+    "555-123-4567",
+    "(555) 123-4567",
+    "+1 555 123 4567",
+    "42",
+])
+def test_dates_and_phone_numbers_are_not_arithmetic(query):
+    assert orchestrator.route(query) != CALCULATOR
+
+
+def test_direct_routes():
+    assert orchestrator.classify("what time is it?") == (TIME, {})
+    assert orchestrator.classify("convert 10 usd to inr") == (
+        CURRENCY, {"from_currency": "USD", "to_currency": "INR", "amount": 10.0}
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "convert 10 lbs to kgs",
+    "convert 5 abc to xyz",
+    "3 cups in ml",
+])
+def test_only_known_currency_codes_are_converted(query):
+    assert orchestrator.route(query) != CURRENCY
+
+
+def test_currency_codes_come_from_the_rate_table_once_loaded(monkeypatch):
+    table = fx_rates.RateTable("USD", {"USD": 1.0, "INR": 83.0, "XBT": 0.00002}, 0)
+    monkeypatch.setattr(fx_rates, "_table", table)
+    assert orchestrator.route("convert 1 xbt to usd") == CURRENCY
+    assert orchestrator.route("convert 1 eur to usd") != CURRENCY
+
+
+@pytest.mark.parametrize("query", [
+    "write a python function that reverses a list",
+    "fix this bug in my parser",
+    "explain what app.py does",
+    "review this java class for thread safety",
+    "```\nprint('hi')\n```",
+    "def add(a, b): return a + b",
+    "explain what the function parse_args() returns",
+    "refactor this python method",
+    "review the method in utils.py",
+])
+def test_code_tasks_go_to_the_code_agent(query):
+    assert orchestrator.route(query) == CODE_AGENT
+
+
+@pytest.mark.parametrize("query", [
+    "explain the class struggle in marx",
+    "Explain the java island history",
+    "review the rust belt economy",
+    "write a poem about python snakes",
+    "write a python script and save it to a file called a.py",
+    "read the file notes.txt and fix the bug in it",
+    "explain the code in my document",
+    "explain the function of the heart",
+    "explain the scientific method",
+    "review this method for baking bread",
+])
+def test_everyday_words_and_file_requests_stay_with_the_study_agent(query):
+    assert orchestrator.route(query) == STUDY_AGENT
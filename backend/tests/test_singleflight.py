@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from src.metrics import metrics
+from src.singleflight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, result="value", error=None, delay=0.02):
+        self.calls = 0
+        self.result, self.error, self.delay = result, error, delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def counters(name):
+    return metrics.counter(f"singleflight.{name}.leader"), metrics.counter(f"singleflight.{name}.coalesced")
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight("test.share")
+    upstream = Upstream()
+    leaders, coalesced = counters("test.share")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", upstream) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert upstream.calls == 1
+    assert counters("test.share") == (leaders + 1, coalesced + 4)
+    assert len(flight) == 0
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flight = SingleFlight("test.keys")
+    upstream = Upstream()
+
+    async def run():
+        await asyncio.gather(flight.do("a", upstream), flight.do("b", upstream))
+        await flight.do("a", upstream)
+
+    asyncio.run(run())
+    assert upstream.calls == 3
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight("test.errors")
+    failing = Upstream(error=RuntimeError("upstream down"))
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [str(r) for r in results] == ["upstream down"] * 3
+    assert failing.calls == 1
+
+    assert asyncio.run(flight.do("k", Upstream(result="recovered"))) == "recovered"
+
+
+def test_cancelled_leader_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test.cancel")
+    upstream = Upstream(delay=0.05)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "value"
+    assert upstream.calls == 1
+
+
+def test_disabled_single_flight_calls_through(monkeypatch):
+    from src import singleflight
+
+    monkeypatch.setattr(singleflight, "ENABLED", False)
+    flight = SingleFlight("test.disabled")
+    upstream = Upstream()
+
+    async def run():
+        await asyncio.gather(*(flight.do("k", upstream) for _ in range(3)))
+
+    asyncio.run(run())
+    assert upstream.calls == 3
+
+
+def test_cached_tool_coalesces_identical_arguments(monkeypatch):
+    from src import tool_cache
+
+    monkeypatch.setattr(tool_cache, "ENABLED", False)
+    calls = []
+
+    @tool_cache.cached_tool("test_tool")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        await asyncio.sleep(0.02)
+        return f"sunny in {city}"
+
+    async def run():
+        return await asyncio.gather(lookup("Paris"), lookup(" paris "), lookup("Rome"))
+
+    assert asyncio.run(run()) == ["sunny in Paris", "sunny in Paris", "sunny in Rome"]
+    assert calls == ["Paris", "Rome"]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from src import tool_cache
+from src.metrics import metrics
+from src.tool_cache import ToolFailure, cached_tool, normalize_argument
+
+
+@pytest.fixture(autouse=True)
+def in_process_cache(monkeypatch):
+    monkeypatch.setattr(tool_cache, "ENABLED", True)
+    monkeypatch.setattr(tool_cache, "SHARED", False)
+
+
+def test_normalize_argument():
+    assert normalize_argument("  New\tDELHI ") == "new delhi"
+    assert normalize_argument(3) == normalize_argument(3.0)
+    assert normalize_argument(True) is True
+
+
+def test_results_are_reused_for_equivalent_arguments():
+    calls = []
+
+    @cached_tool("test_cache_hit")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        return f"sunny in {city}"
+
+    async def run():
+        return [await lookup("Delhi"), await lookup(" delhi"), await lookup("Mumbai")]
+
+    assert asyncio.run(run()) == ["sunny in Delhi", "sunny in Delhi", "sunny in Mumbai"]
+    assert calls == ["Delhi", "Mumbai"]
+
+
+def test_tool_failures_are_returned_but_not_cached():
+    calls = []
+
+    @cached_tool("test_cache_failure")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        if len(calls) == 1:
+            raise ToolFailure("WEATHERAPI_KEY missing in .env")
+        return f"sunny in {city}"
+
+    failures = metrics.counter("tools.test_cache_failure.failures")
+
+    async def run():
+        return [await lookup("Delhi"), await lookup("Delhi"), await lookup("Delhi")]
+
+    assert asyncio.run(run()) == ["WEATHERAPI_KEY missing in .env", "sunny in Delhi", "sunny in Delhi"]
+    assert len(calls) == 2
+    assert metrics.counter("tools.test_cache_failure.failures") == failures + 1
+
+
+def test_coalesced_callers_all_get_the_failure_message():
+    calls = []
+
+    @cached_tool("test_cache_coalesced_failure")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        await asyncio.sleep(0.02)
+        raise ToolFailure("Failed to fetch weather: timeout")
+
+    async def run():
+        return await asyncio.gather(*(lookup("Delhi") for _ in range(3)))
+
+    assert asyncio.run(run()) == ["Failed to fetch weather: timeout"] * 3
+    assert calls == ["Delhi"]
+
+
+def test_other_exceptions_propagate_uncached():
+    calls = []
+
+    @cached_tool("test_cache_exception")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(lookup("Delhi"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(lookup("Delhi"))
+    assert len(calls) == 2
+
+
+def test_empty_results_are_not_cached():
+    calls = []
+
+    @cached_tool("test_cache_empty")
+    async def lookup(city: str) -> str:
+        calls.append(city)
+        return ""
+
+    asyncio.run(lookup("Delhi"))
+    asyncio.run(lookup("Delhi"))
+    assert len(calls) == 2
@@ -0,0 +1,58 @@
+from langchain_core.tools import tool
+
+from src import tool_selection
+from src.metrics import metrics
+from src.tool_selection import ToolSelector
+
+
+@tool
+def current_time_tool() -> str:
+    """Current time"""
+    return "now"
+
+
+@tool
+def weather_tool(city: str) -> str:
+    """Weather in a city"""
+    return "sunny"
+
+
+class WordEncoding:
+    """Counts words instead of tokens, so the tests need no tiktoken download"""
+
+    @staticmethod
+    def encode_ordinary(text):
+        return text.split()
+
+
+class FakeLLM:
+    def bind_tools(self, tools):
+        return ("bound", tuple(t.name for t in tools))
+
+
+def test_token_accounting_is_lazy_and_never_blocks(monkeypatch):
+    calls = []
+
+    def unavailable():
+        calls.append(1)
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tool_selection, "get_encoding", unavailable)
+    selector = ToolSelector(FakeLLM(), [current_time_tool, weather_tool])
+    assert calls == []
+
+    llm, system_message = selector.bound(("core",))
+    assert llm == ("bound", ("current_time_tool",))
+    assert "current_time_tool" in system_message.content
+    assert calls
+
+
+def test_tokens_saved_by_a_subset_are_recorded_once_per_subset(monkeypatch):
+    monkeypatch.setattr(tool_selection, "get_encoding", WordEncoding)
+    before = metrics.counter("tools.bound_variants")
+    selector = ToolSelector(FakeLLM(), [current_time_tool, weather_tool])
+    selector.bound(("core",))
+    selector.bound(("core",))
+    selector.bound(("core", "weather"))
+    assert metrics.counter("tools.bound_variants") - before == 2
+    assert selector._bound[("core",)][2] > selector._bound[("core", "weather")][2] > 0
@@ -410,27 +410,56 @@ const ChatPage = ({ token, username, onLogout }) => {
     fetchConversations();
   }, []);
 
+  const UPLOAD_STAGES = {
+    queued: "Queued",
+    extracting: "Extracting text",
+    embedding: "Embedding",
+    indexing: "Indexing",
+    storing: "Saving",
+  };
+
+  const waitForUploadJob = async (jobId, fileName, setNotice) => {
+    // Poll the ingestion job until a worker has finished with it
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const res = await fetch(`${API_ROOT}/uploads/${jobId}`, { headers: { "Authorization": `Bearer ${token}` } });
+      const job = await res.json();
+      if (!res.ok) throw new Error(job.detail || "Unknown error");
+      if (job.status === "done") return job;
+      if (job.status === "failed") throw new Error(job.error || "Processing failed");
+      setNotice(`⏳ Processing **${fileName}**: ${UPLOAD_STAGES[job.stage] || job.stage}...`);
+    }
+  };
+
   const handleFileUpload = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
     const formData = new FormData();
     formData.append("file", file);
-    const uploadNotice = { role: "assistant", content: `⏳ Uploading **${file.name}**...` };
+    const uploadId = `${Date.now()}-${file.name}`;
+    const uploadNotice = { role: "assistant", content: `⏳ Uploading **${file.name}**...`, uploadId };
     setMessages(prev => [...prev, uploadNotice]);
+    // The notice may have been replaced by a chat reply in the meantime; re-add it if so
+    const replaceNotice = (message) => setMessages(prev => prev.some(m => m.uploadId === uploadId)
+      ? prev.map(m => m.uploadId === uploadId ? message : m)
+      : [...prev, message]);
+    const setNotice = (content) => replaceNotice({ ...uploadNotice, content });
     try {
       const res = await fetch(`${API_ROOT}/upload`, { method: "POST", headers: { "Authorization": `Bearer ${token}` }, body: formData });
       const data = await res.json();
       if (res.ok) {
-        const successMsg = { role: "assistant", content: data.message || `📄 File **${file.name}** uploaded successfully.\nYou can now ask me anything from this file.` };
-        setMessages(prev => [...prev.slice(0, -1), successMsg]);
+        setNotice(`⏳ Processing **${file.name}**...`);
+        const job = await waitForUploadJob(data.job_id, file.name, setNotice);
+        const successMsg = { role: "assistant", content: job.message || `📄 File **${file.name}** uploaded successfully.\nYou can now ask me anything from this file.` };
+        replaceNotice(successMsg);
       } else {
         const failMsg = { role: "assistant", content: `❌ Upload failed: ${data.detail || "Unknown error"}` };
-        setMessages(prev => [...prev.slice(0, -1), failMsg]);
+        replaceNotice(failMsg);
       }
     } catch (err) {
       console.error(err);
-      const errMsg = { role: "assistant", content: "❌ Error uploading file." };
-      setMessages(prev => [...prev.slice(0, -1), errMsg]);
+      const errMsg = { role: "assistant", content: `❌ Error processing file: ${err.message || "Unknown error"}` };
+      replaceNotice(errMsg);
     }
   };
 
@@ -457,13 +486,13 @@ const ChatPage = ({ token, username, onLogout }) => {
     const val = userInput;
     if (!val) return;
     const userMsg = { role: 'user', content: val };
-    const newMessages = [...messages, userMsg];
-    setMessages(newMessages);
+    setMessages(prev => [...prev, userMsg]);
     setUserInput('');
     if (textareaRef.current) textareaRef.current.style.height = 'auto';
     setLoading(true);
     try {
-      const payload = { messages: newMessages };
+      // History lives on the server; send only the new message
+      const payload = { message: val };
       if (currentConversationId) payload.conversation_id = currentConversationId;
       const res = await fetch(`${API_ROOT}/run`, {
         method: "POST",
@@ -472,18 +501,20 @@ const ChatPage = ({ token, username, onLogout }) => {
       });
       const data = await res.json();
       if (res.ok) {
-        setMessages(data.messages || []);
+        // The response holds only this turn (the user message and the replies);
+        // it replaces the optimistic user message, keeping anything added meanwhile
+        setMessages(prev => [...prev.filter(m => m !== userMsg), ...(data.messages || [userMsg])]);
         if (data.conversation_id && !currentConversationId) setCurrentConversationId(data.conversation_id);
         fetchConversations();
       } else {
         const errorMsg = typeof data.detail === 'string' ? data.detail : Array.isArray(data.detail) ? data.detail.map(err => err.msg || JSON.stringify(err)).join(', ') : "Error from server";
         const errorMsgObj = { role: 'assistant', content: `Error: ${errorMsg}` };
-        setMessages([...newMessages, errorMsgObj]);
+        setMessages(prev => [...prev, errorMsgObj]);
       }
     } catch (err) {
       console.error(err);
       const errorMsg = { role: 'assistant', content: "Error connecting to server" };
-      setMessages([...newMessages, errorMsg]);
+      setMessages(prev => [...prev, errorMsg]);
     } finally {
       setLoading(false);
     }